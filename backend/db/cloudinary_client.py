@@ -1,33 +1,127 @@
-import cloudinary
-import cloudinary.uploader
+import asyncio
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable
+
 import os
+import threading
 from dotenv import load_dotenv
 
+from services import metrics
+
 # Load environment variables from .env
 load_dotenv()
 
-# Configure Cloudinary
-# Configure Cloudinary (values may be None if .env not set)
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True,
-)
+logger = logging.getLogger(__name__)
+
+# Uploads run on a dedicated, bounded pool so slow uploads never occupy the
+# event loop or starve Starlette's shared threadpool
+UPLOAD_CONCURRENCY = int(os.getenv("CLOUDINARY_UPLOAD_CONCURRENCY", "4"))
+UPLOAD_TIMEOUT = float(os.getenv("CLOUDINARY_UPLOAD_TIMEOUT", "30"))
+UPLOAD_RETRIES = int(os.getenv("CLOUDINARY_UPLOAD_RETRIES", "3"))
+UPLOAD_BACKOFF = float(os.getenv("CLOUDINARY_UPLOAD_BACKOFF", "0.5"))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="cloudinary-upload")
+
+# Client errors that will not succeed on retry (filled in by _sdk())
+_NON_RETRYABLE: tuple = (RuntimeError,)
+
+_sdk_module = None
+_sdk_lock = threading.Lock()
+
+
+def _sdk():
+    """The cloudinary package, imported and configured on first use so it
+    stays off the start-up path."""
+    global _sdk_module, _NON_RETRYABLE
+    if _sdk_module is None:
+        with _sdk_lock:
+            if _sdk_module is None:
+                import cloudinary
+                import cloudinary.exceptions
+                import cloudinary.uploader
+
+                # Values may be None if .env is not set; _ensure_configured reports it
+                cloudinary.config(
+                    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+                    api_key=os.getenv("CLOUDINARY_API_KEY"),
+                    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+                    secure=True,
+                )
+                _NON_RETRYABLE = (
+                    RuntimeError,
+                    cloudinary.exceptions.BadRequest,
+                    cloudinary.exceptions.AuthorizationRequired,
+                    cloudinary.exceptions.NotAllowed,
+                    cloudinary.exceptions.NotFound,
+                    cloudinary.exceptions.AlreadyExists,
+                )
+                _sdk_module = cloudinary
+    return _sdk_module
 
 def _ensure_configured():
-    if not cloudinary.config().cloud_name or not cloudinary.config().api_key or not cloudinary.config().api_secret:
+    config = _sdk().config()
+    if not config.cloud_name or not config.api_key or not config.api_secret:
         raise RuntimeError("Missing Cloudinary credentials. Please set CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET in your environment or .env file.")
 
-def upload_file(file_content: bytes, public_id: str, folder: str = "items"):
+def upload_file_sync(file_content: bytes, public_id: str, folder: str = "items"):
     """Upload a file's bytes to Cloudinary under the given folder and public_id.
     Returns Cloudinary's response dict. Raises RuntimeError with a clear message on misconfiguration.
+    Blocking; request handlers should await upload_file instead.
     """
     _ensure_configured()
     # Do not embed folder in public_id; pass folder separately to avoid double paths
-    return cloudinary.uploader.upload(
+    return _sdk().uploader.upload(
         file_content,
         public_id=public_id,
         folder=folder,
         resource_type="image",
-    )
\ No newline at end of file
+        timeout=UPLOAD_TIMEOUT,
+    )
+
+@metrics.timed("cloudinary", "upload")
+async def upload_file(file_content: bytes, public_id: str, folder: str = "items") -> Dict[str, Any]:
+    """Upload on the bounded upload pool, with a per-attempt timeout and retries
+    with exponential backoff (plus jitter) for transient failures."""
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(_executor, upload_file_sync, file_content, public_id, folder),
+                timeout=UPLOAD_TIMEOUT,
+            )
+        except _NON_RETRYABLE:
+            raise
+        except Exception as e:
+            if attempt > UPLOAD_RETRIES:
+                raise
+            delay = UPLOAD_BACKOFF * (2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.warning("Cloudinary upload %s/%s failed (attempt %d): %r; retrying in %.2fs",
+                           folder, public_id, attempt, e, delay)
+            await asyncio.sleep(delay)
+
+async def upload_and_patch(file_content: bytes, public_id: str, folder: str, doc_ref, url_fields: Iterable[str] = ("image_url",)):
+    """Deferred mode: upload, then write the resulting URL into ``url_fields`` of
+    the (async) Firestore document and mark ``image_status`` ready or failed.
+    Meant to run as a background task after the response has been sent."""
+    try:
+        result = await upload_file(file_content, public_id, folder=folder)
+        url = result.get("secure_url")
+        if not url:
+            raise RuntimeError("Cloudinary upload returned no secure_url")
+        update = {field: url for field in url_fields}
+        update["image_status"] = "ready"
+    except Exception as e:
+        logger.error("Deferred Cloudinary upload %s/%s failed: %r", folder, public_id, e)
+        update = {"image_status": "failed"}
+    try:
+        await doc_ref.update(update)
+    except Exception as e:
+        logger.error("Could not record deferred upload result on %s: %r", getattr(doc_ref, "path", doc_ref), e)
+
+def shutdown() -> None:
+    """Stop the upload pool (application shutdown); queued uploads are dropped."""
+    _executor.shutdown(wait=False, cancel_futures=True)
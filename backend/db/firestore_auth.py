@@ -1,18 +1,47 @@
-import firebase_admin
-from firebase_admin import credentials, auth
 import os
 from dotenv import load_dotenv
 
+from db.lazy import Lazy
+
 load_dotenv()
 
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-if not key_path or not os.path.isfile(key_path):
-    raise FileNotFoundError("Service account key not found or not defined in .env")
+# "firebase" (default), or "local" for offline runs with a local STORAGE_BACKEND
+# (unverified local:<uid> tokens, see db/local_auth.py)
+AUTH_BACKEND = os.getenv("AUTH_BACKEND", "firebase").strip().lower()
+
+
+def _create_auth():
+    """firebase_admin.auth with the Admin app initialized (or the local stand-in)."""
+    if AUTH_BACKEND == "local":
+        from db.local_auth import auth
+
+        print("Local auth initialized (AUTH_BACKEND=local): ID tokens are NOT verified")
+        return auth
+
+    import firebase_admin
+    from firebase_admin import credentials, auth
+
+    key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not key_path or not os.path.isfile(key_path):
+        raise FileNotFoundError("Service account key not found or not defined in .env")
+
+    cred = credentials.Certificate(key_path)
+
+    # Initialize Firebase Admin only once
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred)
+
+    print("Firebase Auth client initialized successfully")
+    return auth
+
+
+# Imported by name everywhere; the Admin SDK is imported and initialized on first use
+auth = Lazy(_create_auth, "auth")
+
 
-cred = credentials.Certificate(key_path)
+def initialize() -> None:
+    auth.resolve()
 
-# Initialize Firebase Admin only once
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
 
-print("Firebase Auth client initialized successfully")
+def initialized() -> bool:
+    return auth.initialized
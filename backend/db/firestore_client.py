@@ -1,22 +1,96 @@
 from dotenv import load_dotenv
+import inspect
 import os
+from typing import Any, Tuple
+
 from google.cloud import firestore
 
+from db.lazy import Lazy
+from services import metrics
+
 # Load .env in current folder
 load_dotenv()
 
-# Get the key path
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-if not key_path:
-    raise ValueError("GOOGLE_APPLICATION_CREDENTIALS not found in .env!")
+# Client methods that reach the database (plus their Async* counterparts),
+# timed per request by services.metrics through proxies of db/adb
+INSTRUMENTED_METHODS = {
+    "DocumentReference": ("get", "set", "create", "update", "delete"),
+    "Query": ("get", "stream"),
+    "CollectionReference": ("get", "stream", "add", "list_documents"),
+    "Client": ("get_all",),
+    "WriteBatch": ("commit",),
+    "Transaction": ("get", "get_all", "_commit"),
+}
+
+# Storage backend: "firestore" (default), or "memory" / "sqlite" to run the
+# service offline (load tests, profiling) with the same client API, see db/local_store.py
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+STORAGE_SQLITE_PATH = os.getenv(
+    "STORAGE_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "storage.sqlite3"),
+)
+
+
+def _create_clients() -> Tuple[Any, Any]:
+    """Build the sync and async clients of the configured backend."""
+    if STORAGE_BACKEND == "firestore":
+        # Get the key path
+        key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        if not key_path:
+            raise ValueError("GOOGLE_APPLICATION_CREDENTIALS not found in .env!")
+
+        # Optional: check if the file exists
+        if not os.path.isfile(key_path):
+            raise FileNotFoundError(f"Service account key not found at {key_path}")
+
+        # Set environment variable for Firestore
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = key_path
+
+        # The sync client serves the sync (threadpool) routes, the async client
+        # serves `async def` handlers so they never block the event loop
+        clients = firestore.Client(), firestore.AsyncClient()
+        print("Firestore client initialized successfully")
+    else:
+        clients = local_store.create_clients(STORAGE_BACKEND, STORAGE_SQLITE_PATH)
+        print(f"Local {STORAGE_BACKEND} storage initialized (STORAGE_BACKEND={STORAGE_BACKEND})")
+    return clients
+
+
+if STORAGE_BACKEND == "firestore":
+    # Decorator for functions run in db.transaction()
+    transactional = firestore.transactional
+elif STORAGE_BACKEND in ("memory", "sqlite"):
+    from db import local_store
+
+    transactional = local_store.transactional
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; use firestore, memory or sqlite")
+
+# Both clients are built together on first use (or by the start-up warm-up);
+# the app gets instrumented views of them
+_clients = Lazy(_create_clients, "firestore clients")
+db = Lazy(lambda: metrics.instrument(_clients.resolve()[0], INSTRUMENTED_METHODS, "firestore"), "db")
+adb = Lazy(lambda: metrics.instrument(_clients.resolve()[1], INSTRUMENTED_METHODS, "firestore"), "adb")
+
+
+def initialize() -> None:
+    """Build the clients now instead of on first use."""
+    _clients.resolve()
+
 
-# Optional: check if the file exists
-if not os.path.isfile(key_path):
-    raise FileNotFoundError(f"Service account key not found at {key_path}")
+def initialized() -> bool:
+    return _clients.initialized
 
-# Set environment variable for Firestore
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = key_path
 
-# Initialize Firestore
-db = firestore.Client()
-print("Firestore client initialized successfully")
+async def close() -> None:
+    """Release the clients' channels (application shutdown)."""
+    clients = _clients.peek()
+    if clients is not None:
+        for client in clients:
+            try:
+                # AsyncClient.close() is a coroutine on google-cloud-firestore
+                result = client.close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print("Error closing Firestore client:", e)
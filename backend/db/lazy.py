@@ -0,0 +1,49 @@
+"""Module-level stand-ins for clients that are built on first use.
+
+``db``, ``adb`` and ``auth`` are imported by name all over the code base; a
+``Lazy`` keeps those imports cheap and defers the construction (credentials,
+gRPC channels, Firebase Admin app) to the first attribute access, or to the
+application's start-up warm-up (see services/lifecycle.py).
+"""
+
+import threading
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    def __init__(self, factory: Callable[[], T], name: str):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_value", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def resolve(self) -> T:
+        """The wrapped object, built by the first caller (thread-safe)."""
+        value = self._value
+        if value is None:
+            with self._lock:
+                value = self._value
+                if value is None:
+                    value = self._factory()
+                    object.__setattr__(self, "_value", value)
+        return value
+
+    @property
+    def initialized(self) -> bool:
+        return self._value is not None
+
+    def peek(self) -> Optional[T]:
+        """The wrapped object if already built, without building it."""
+        return self._value
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.resolve(), name, value)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.initialized else "not initialized"
+        return f"<Lazy {self._name} ({state})>"
@@ -0,0 +1,101 @@
+"""In-process stand-in for ``firebase_admin.auth`` (``AUTH_BACKEND=local``).
+
+Lets the service run offline next to the local storage backends, e.g. for
+load tests. Users live in memory; an ID token is simply ``local:<uid>`` and is
+accepted for any uid, with the user's custom claims merged in as Firebase
+would. Never enable it on a deployed service: it performs no verification.
+"""
+
+import threading
+import time
+import types
+import uuid
+from typing import Any, Dict, Iterator, Optional
+
+TOKEN_PREFIX = "local:"
+
+
+class UserNotFoundError(Exception):
+    pass
+
+
+class EmailAlreadyExistsError(Exception):
+    pass
+
+
+class InvalidIdTokenError(Exception):
+    pass
+
+
+class _UserRecord(types.SimpleNamespace):
+    pass
+
+
+class _ListUsersPage:
+    def __init__(self, users):
+        self._users = users
+
+    def iterate_all(self) -> Iterator[_UserRecord]:
+        return iter(self._users)
+
+
+class LocalAuth:
+    UserNotFoundError = UserNotFoundError
+    EmailAlreadyExistsError = EmailAlreadyExistsError
+    InvalidIdTokenError = InvalidIdTokenError
+
+    def __init__(self):
+        self._users: Dict[str, _UserRecord] = {}
+        self._lock = threading.Lock()
+
+    def create_user(self, email: Optional[str] = None, password: Optional[str] = None, display_name: Optional[str] = None, uid: Optional[str] = None, **kwargs) -> _UserRecord:
+        with self._lock:
+            if email and any(user.email == email for user in self._users.values()):
+                raise EmailAlreadyExistsError(f"The user with the provided email already exists ({email})")
+            record = _UserRecord(uid=uid or uuid.uuid4().hex[:28], email=email, display_name=display_name, custom_claims=None, disabled=False)
+            self._users[record.uid] = record
+            return record
+
+    def get_user(self, uid: str) -> _UserRecord:
+        with self._lock:
+            if uid not in self._users:
+                raise UserNotFoundError(f"No user record found for the provided user ID: {uid}")
+            return self._users[uid]
+
+    def get_user_by_email(self, email: str) -> _UserRecord:
+        with self._lock:
+            for user in self._users.values():
+                if user.email == email:
+                    return user
+        raise UserNotFoundError(f"No user record found for the provided email: {email}")
+
+    def delete_user(self, uid: str) -> None:
+        with self._lock:
+            if self._users.pop(uid, None) is None:
+                raise UserNotFoundError(f"No user record found for the provided user ID: {uid}")
+
+    def set_custom_user_claims(self, uid: str, custom_claims: Optional[Dict[str, Any]]) -> None:
+        self.get_user(uid).custom_claims = dict(custom_claims) if custom_claims else None
+
+    def list_users(self, page_token: Optional[str] = None, max_results: int = 1000) -> _ListUsersPage:
+        with self._lock:
+            return _ListUsersPage(list(self._users.values()))
+
+    def create_custom_token(self, uid: str, developer_claims: Optional[Dict[str, Any]] = None) -> bytes:
+        return (TOKEN_PREFIX + uid).encode()
+
+    def verify_id_token(self, id_token: str, check_revoked: bool = False, clock_skew_seconds: int = 0) -> Dict[str, Any]:
+        if not id_token or not id_token.startswith(TOKEN_PREFIX):
+            raise InvalidIdTokenError("Local ID tokens look like 'local:<uid>'")
+        uid = id_token[len(TOKEN_PREFIX):]
+        now = int(time.time())
+        claims: Dict[str, Any] = {"uid": uid, "sub": uid, "user_id": uid, "iat": now, "exp": now + 3600}
+        user = self._users.get(uid)
+        if user is not None:
+            if user.email:
+                claims["email"] = user.email
+            claims.update(user.custom_claims or {})
+        return claims
+
+
+auth = LocalAuth()
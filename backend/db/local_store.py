@@ -0,0 +1,853 @@
+"""Local (in-memory or SQLite) implementation of the Firestore client API.
+
+The routers and services talk to storage through the subset of the
+``google.cloud.firestore`` client they already use: collections and documents,
+``where`` (``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``, ``in``, ``not-in``,
+``array_contains``, ``array_contains_any``), ``order_by``, ``limit``/``offset``,
+cursors (``start_at``/``start_after``/``end_before``/``end_at``), collection
+groups, ``get_all``, write batches, transactions, ``Increment``,
+``SERVER_TIMESTAMP`` and ``DELETE_FIELD``. This module implements that subset
+over a local store, so the service can be run, load-tested and profiled with
+no network or credentials (``STORAGE_BACKEND=memory`` or ``sqlite``, see
+db/firestore_client.py).
+
+Query semantics follow Firestore: documents missing a filtered or ordered
+field are excluded, values of different types order by Firestore's type
+order, range filters only match values of the same type, results are ordered
+by the explicit orderings (or the inequality field) and then by document path,
+and writes in a batch or transaction apply atomically. Both stores share the
+same query evaluation; SQLite only adds persistence and an index on the
+parent path. The async client runs every store access on a worker thread, so
+like the real AsyncClient it never blocks the event loop (and any store access
+made on the loop thread comes from a sync call). Transactions are serialized
+on a process-wide lock, which gives the same outcome as Firestore's optimistic
+retries for a single process.
+Not a Firestore emulator: security rules, index requirements and limits (500
+writes per batch, 30 ``in`` values) are not enforced.
+"""
+
+import asyncio
+import base64
+import copy
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import DELETE_FIELD, SERVER_TIMESTAMP
+from google.cloud.firestore_v1.transforms import Increment
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+_AUTO_ID_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def _auto_id() -> str:
+    raw = uuid.uuid4().int
+    chars = []
+    for _ in range(20):
+        raw, index = divmod(raw, len(_AUTO_ID_ALPHABET))
+        chars.append(_AUTO_ID_ALPHABET[index])
+    return "".join(chars)
+
+
+# ----------------------------
+# Stores
+# ----------------------------
+class MemoryStore:
+    """Documents in a dict keyed by path; data is copied in and out."""
+
+    def __init__(self):
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            data = self._docs.get(path)
+            return copy.deepcopy(data) if data is not None else None
+
+    def put(self, path: str, data: Dict[str, Any]) -> None:
+        with self.lock:
+            self._docs[path] = copy.deepcopy(data)
+
+    def delete(self, path: str) -> None:
+        with self.lock:
+            self._docs.pop(path, None)
+
+    def scan(self, parent: Optional[str], collection_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Documents of one collection (``parent`` document path, "" for root
+        collections) or, with parent None, of every collection with that id
+        (collection group)."""
+        with self.lock:
+            prefix = f"{parent}/{collection_id}/" if parent else f"{collection_id}/"
+            out = []
+            for path, data in self._docs.items():
+                if parent is None:
+                    segments = path.split("/")
+                    if segments[-2] != collection_id:
+                        continue
+                elif not path.startswith(prefix) or "/" in path[len(prefix):]:
+                    continue
+                out.append((path, copy.deepcopy(data)))
+            return out
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+        if len(value) == 1 and "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+class SQLiteStore:
+    """Documents as JSON rows in one SQLite table, indexed by parent collection."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " path TEXT PRIMARY KEY, parent TEXT NOT NULL, collection_id TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_parent ON documents (parent)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_group ON documents (collection_id)")
+        self.lock = threading.RLock()
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self._conn.execute("SELECT data FROM documents WHERE path = ?", (path,)).fetchone()
+        return _decode(json.loads(row[0])) if row else None
+
+    def put(self, path: str, data: Dict[str, Any]) -> None:
+        parent, _, _ = path.rpartition("/")
+        collection_id = parent.rsplit("/", 1)[-1]
+        with self.lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (path, parent, collection_id, data) VALUES (?, ?, ?, ?)",
+                (path, parent, collection_id, json.dumps(_encode(data), separators=(",", ":"))),
+            )
+
+    def delete(self, path: str) -> None:
+        with self.lock:
+            self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+
+    def scan(self, parent: Optional[str], collection_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            if parent is None:
+                rows = self._conn.execute("SELECT path, data FROM documents WHERE collection_id = ?", (collection_id,))
+            else:
+                rows = self._conn.execute(
+                    "SELECT path, data FROM documents WHERE parent = ?", (f"{parent}/{collection_id}" if parent else collection_id,)
+                )
+            rows = rows.fetchall()
+        return [(path, _decode(json.loads(data))) for path, data in rows]
+
+    def atomic(self):
+        return _SQLiteAtomic(self)
+
+
+class _SQLiteAtomic:
+    def __init__(self, store: SQLiteStore):
+        self._store = store
+
+    def __enter__(self):
+        self._store.lock.acquire()
+        self._store._conn.execute("BEGIN")
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._store._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._store.lock.release()
+
+
+# ----------------------------
+# Values, field paths and ordering
+# ----------------------------
+def _split(field_path: str) -> List[str]:
+    return [part.strip("`") for part in field_path.split(".")]
+
+
+_MISSING = object()
+
+
+def _lookup(data: Dict[str, Any], field_path: str) -> Any:
+    value: Any = data
+    for part in _split(field_path):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _type_rank(value: Any) -> int:
+    # Firestore's order of value types
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, DocumentReference):
+        return 6
+    if isinstance(value, (list, tuple)):
+        return 8
+    if isinstance(value, dict):
+        return 9
+    return 10
+
+
+def _sort_key(value: Any) -> Tuple:
+    rank = _type_rank(value)
+    if rank == 0:
+        return (0,)
+    if rank == 3:
+        return (3, value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    if rank == 6:
+        return (6, value.path)
+    if rank == 8:
+        return (8, tuple(_sort_key(v) for v in value))
+    if rank == 9:
+        return (9, tuple((k, _sort_key(v)) for k, v in sorted(value.items())))
+    if rank == 10:
+        return (10, repr(value))
+    return (rank, value)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    return _type_rank(a) == _type_rank(b) and _sort_key(a) == _sort_key(b)
+
+
+def _matches(value: Any, op: str, target: Any) -> bool:
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return _equal(value, target)
+    if op == "!=":
+        return value is not None and not _equal(value, target)
+    if op == "in":
+        return any(_equal(value, t) for t in target)
+    if op == "not-in":
+        return value is not None and not any(_equal(value, t) for t in target)
+    if op == "array_contains":
+        return isinstance(value, list) and any(_equal(v, target) for v in value)
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(_equal(v, t) for v in value for t in target)
+    # Range filters only match values of the same type
+    if _type_rank(value) != _type_rank(target):
+        return False
+    a, b = _sort_key(value), _sort_key(target)
+    if op == "<":
+        return a < b
+    if op == "<=":
+        return a <= b
+    if op == ">":
+        return a > b
+    if op == ">=":
+        return a >= b
+    raise ValueError(f"Unsupported operator {op!r}")
+
+
+_INEQUALITIES = ("<", "<=", ">", ">=", "!=", "not-in")
+
+
+def _resolve_server_values(data: Dict[str, Any], now: datetime) -> None:
+    for key, value in list(data.items()):
+        if value is SERVER_TIMESTAMP:
+            data[key] = now
+        elif isinstance(value, dict):
+            _resolve_server_values(value, now)
+
+
+def _set_path(target: Dict[str, Any], parts: List[str], value: Any, now: datetime) -> None:
+    for part in parts[:-1]:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            child = target[part] = {}
+        target = child
+    leaf = parts[-1]
+    if value is DELETE_FIELD:
+        target.pop(leaf, None)
+    elif value is SERVER_TIMESTAMP:
+        target[leaf] = now
+    elif isinstance(value, Increment):
+        current = target.get(leaf)
+        if isinstance(current, (int, float)) and not isinstance(current, bool):
+            target[leaf] = current + value.value
+        else:
+            target[leaf] = value.value
+    else:
+        value = copy.deepcopy(value)
+        if isinstance(value, dict):
+            _resolve_server_values(value, now)
+        target[leaf] = value
+
+
+def _has_transforms(value: Any) -> bool:
+    if value is SERVER_TIMESTAMP or value is DELETE_FIELD or isinstance(value, Increment):
+        return True
+    return isinstance(value, dict) and any(_has_transforms(v) for v in value.values())
+
+
+def _merge_into(target: Dict[str, Any], data: Dict[str, Any], now: datetime) -> None:
+    """set(..., merge=True): nested maps are merged, other values replaced."""
+    for key, value in data.items():
+        if isinstance(value, dict) and value and isinstance(target.get(key), dict):
+            _merge_into(target[key], value, now)
+        elif isinstance(value, dict) and _has_transforms(value):
+            target[key] = {}
+            _merge_into(target[key], value, now)
+        else:
+            _set_path(target, [key], value, now)
+
+
+# ----------------------------
+# Snapshots and references
+# ----------------------------
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self._data = data
+        self.exists = data is not None
+        self.id = reference.id
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str) -> Any:
+        value = _lookup(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class DocumentReference:
+    def __init__(self, client: "Client", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __repr__(self):
+        return f"<DocumentReference {self.path}>"
+
+    @property
+    def parent(self) -> "CollectionReference":
+        return CollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, collection_id: str) -> "CollectionReference":
+        return CollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        return DocumentSnapshot(self, self._client._store.get(self.path))
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False):
+        batch = self._client.batch()
+        batch.set(self, document_data, merge=merge)
+        return batch.commit()[0]
+
+    def create(self, document_data: Dict[str, Any]):
+        batch = self._client.batch()
+        batch.create(self, document_data)
+        return batch.commit()[0]
+
+    def update(self, field_updates: Dict[str, Any]):
+        batch = self._client.batch()
+        batch.update(self, field_updates)
+        return batch.commit()[0]
+
+    def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        return batch.commit()[0]
+
+
+class Query:
+    def __init__(self, client: "Client", parent: Optional[str], collection_id: str, all_descendants: bool = False):
+        self._client = client
+        self._parent = parent
+        self._collection_id = collection_id
+        self._all_descendants = all_descendants
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._orders: List[Tuple[str, str]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._start: Optional[Tuple[Any, bool]] = None  # (values, inclusive)
+        self._end: Optional[Tuple[Any, bool]] = None
+
+    def _copy(self) -> "Query":
+        query = copy.copy(self)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        return query
+
+    @property
+    def _path(self) -> str:
+        return f"{self._parent}/{self._collection_id}" if self._parent else self._collection_id
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None, filter=None) -> "Query":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        query = self._copy()
+        query._filters.append((field_path, op_string, value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "Query":
+        query = self._copy()
+        query._orders.append((field_path, DESCENDING if str(direction).upper().startswith("DESC") else ASCENDING))
+        return query
+
+    def limit(self, count: int) -> "Query":
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def offset(self, num_to_skip: int) -> "Query":
+        query = self._copy()
+        query._offset = num_to_skip
+        return query
+
+    def select(self, field_paths: Iterable[str]) -> "Query":
+        return self._copy()
+
+    def _cursor(self, attr: str, values: Any, inclusive: bool) -> "Query":
+        query = self._copy()
+        setattr(query, attr, (values, inclusive))
+        return query
+
+    def start_at(self, document_fields_or_snapshot) -> "Query":
+        return self._cursor("_start", document_fields_or_snapshot, True)
+
+    def start_after(self, document_fields_or_snapshot) -> "Query":
+        return self._cursor("_start", document_fields_or_snapshot, False)
+
+    def end_at(self, document_fields_or_snapshot) -> "Query":
+        return self._cursor("_end", document_fields_or_snapshot, True)
+
+    def end_before(self, document_fields_or_snapshot) -> "Query":
+        return self._cursor("_end", document_fields_or_snapshot, False)
+
+    def _orderings(self) -> List[Tuple[str, str]]:
+        orders = list(self._orders)
+        if not orders:
+            # Firestore orders by the inequality field first when none is given
+            for field, op, _ in self._filters:
+                if op in _INEQUALITIES:
+                    orders.append((field, ASCENDING))
+                    break
+        if not any(field == "__name__" for field, _ in orders):
+            orders.append(("__name__", orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _cursor_values(self, cursor: Any, orders: List[Tuple[str, str]]) -> List[Any]:
+        if isinstance(cursor, DocumentSnapshot):
+            data = cursor._data or {}
+            return [cursor.reference.path if f == "__name__" else _lookup(data, f) for f, _ in orders]
+        if isinstance(cursor, dict):
+            values = []
+            for field, _ in orders:
+                if field not in cursor:
+                    break
+                value = cursor[field]
+                if field == "__name__":
+                    if isinstance(value, DocumentReference):
+                        value = value.path
+                    elif "/" not in str(value):
+                        value = f"{self._path}/{value}"
+                values.append(value)
+            return values
+        return list(cursor)
+
+    def _compare(self, key: List[Tuple], cursor_key: List[Tuple], orders: List[Tuple[str, str]]) -> int:
+        for (a, b), (_, direction) in zip(zip(key, cursor_key), orders):
+            if a != b:
+                result = -1 if a < b else 1
+                return -result if direction == DESCENDING else result
+        return 0
+
+    def _run(self) -> List[DocumentSnapshot]:
+        rows = self._client._store.scan(None if self._all_descendants else (self._parent or ""), self._collection_id)
+        orders = self._orderings()
+
+        matched = []
+        for path, data in rows:
+            if not all(_matches(path if field == "__name__" else _lookup(data, field), op, value) for field, op, value in self._filters):
+                continue
+            values = [path if field == "__name__" else _lookup(data, field) for field, _ in orders]
+            if any(value is _MISSING for value in values):
+                continue
+            matched.append(([_sort_key(value) for value in values], path, data))
+
+        def order_key(entry):
+            return _OrderKey(entry[0], orders)
+
+        matched.sort(key=order_key)
+        if self._start is not None:
+            cursor = [_sort_key(v) for v in self._cursor_values(self._start[0], orders)]
+            keep = (lambda c: c >= 0) if self._start[1] else (lambda c: c > 0)
+            matched = [m for m in matched if keep(self._compare(m[0][:len(cursor)], cursor, orders))]
+        if self._end is not None:
+            cursor = [_sort_key(v) for v in self._cursor_values(self._end[0], orders)]
+            keep = (lambda c: c <= 0) if self._end[1] else (lambda c: c < 0)
+            matched = [m for m in matched if keep(self._compare(m[0][:len(cursor)], cursor, orders))]
+        matched = matched[self._offset:]
+        if self._limit is not None:
+            matched = matched[: self._limit]
+        return [DocumentSnapshot(DocumentReference(self._client, path), data) for _, path, data in matched]
+
+    def stream(self, transaction=None) -> Iterator[DocumentSnapshot]:
+        return iter(self._run())
+
+    def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return self._run()
+
+
+class _OrderKey:
+    """Sort key honouring per-field directions."""
+
+    __slots__ = ("key", "orders")
+
+    def __init__(self, key, orders):
+        self.key = key
+        self.orders = orders
+
+    def __lt__(self, other):
+        for a, b, (_, direction) in zip(self.key, other.key, self.orders):
+            if a != b:
+                return (a > b) if direction == DESCENDING else (a < b)
+        return False
+
+
+class CollectionReference(Query):
+    def __init__(self, client: "Client", path: str):
+        parent, _, collection_id = path.rpartition("/")
+        super().__init__(client, parent or None, collection_id)
+        self.id = collection_id
+
+    @property
+    def parent(self) -> Optional[DocumentReference]:
+        return DocumentReference(self._client, self._parent) if self._parent else None
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._client, f"{self._path}/{document_id or _auto_id()}")
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self) -> List[DocumentReference]:
+        return [DocumentReference(self._client, path) for path, _ in self._client._store.scan(self._parent or "", self._collection_id)]
+
+
+# ----------------------------
+# Writes
+# ----------------------------
+class WriteBatch:
+    def __init__(self, client: "Client"):
+        self._client = client
+        self._writes: List[Tuple[str, DocumentReference, Dict[str, Any], bool]] = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data: Dict[str, Any], merge: bool = False):
+        self._writes.append(("set", _unwrap(reference), copy.deepcopy(document_data), merge))
+        return self
+
+    def create(self, reference, document_data: Dict[str, Any]):
+        self._writes.append(("create", _unwrap(reference), copy.deepcopy(document_data), False))
+        return self
+
+    def update(self, reference, field_updates: Dict[str, Any]):
+        self._writes.append(("update", _unwrap(reference), copy.deepcopy(field_updates), False))
+        return self
+
+    def delete(self, reference):
+        self._writes.append(("delete", _unwrap(reference), None, False))
+        return self
+
+    def commit(self) -> List[datetime]:
+        store = self._client._store
+        now = datetime.now(timezone.utc)
+        atomic = store.atomic() if hasattr(store, "atomic") else store.lock
+        with atomic:
+            # Compute every new document first, so a failing write changes nothing
+            staged: Dict[str, Optional[Dict[str, Any]]] = {}
+            for kind, ref, data, merge in self._writes:
+                current = staged[ref.path] if ref.path in staged else store.get(ref.path)
+                if kind == "delete":
+                    staged[ref.path] = None
+                    continue
+                if kind == "create" and current is not None:
+                    raise AlreadyExists(f"Document already exists: {ref.path}")
+                if kind == "update":
+                    if current is None:
+                        raise NotFound(f"No document to update: {ref.path}")
+                    for field_path, value in data.items():
+                        _set_path(current, _split(field_path), value, now)
+                    staged[ref.path] = current
+                    continue
+                document = current if (merge and current is not None) else {}
+                _merge_into(document, data, now)
+                staged[ref.path] = document
+            for path, document in staged.items():
+                if document is None:
+                    store.delete(path)
+                else:
+                    store.put(path, document)
+        results = [now] * len(self._writes)
+        self._writes = []
+        return results
+
+
+class Transaction(WriteBatch):
+    """Writes are buffered and applied on commit; reads see committed data.
+    Use with ``transactional``, which serializes transactions."""
+
+    def __init__(self, client: "Client", **kwargs):
+        super().__init__(client)
+        self.id = uuid.uuid4().hex
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+
+class _Transactional:
+    def __init__(self, to_wrap):
+        self.to_wrap = to_wrap
+
+    def __call__(self, transaction: Transaction, *args, **kwargs):
+        store = transaction._client._store
+        with store.lock:
+            try:
+                result = self.to_wrap(transaction, *args, **kwargs)
+            except BaseException:
+                transaction._writes = []
+                raise
+            transaction.commit()
+            return result
+
+
+def transactional(to_wrap):
+    """Local counterpart of ``firestore.transactional``."""
+    return _Transactional(to_wrap)
+
+
+def _unwrap(reference):
+    return getattr(reference, "_ref", reference)
+
+
+# ----------------------------
+# Clients
+# ----------------------------
+class Client:
+    def __init__(self, store):
+        self._store = store
+
+    def collection(self, *path: str) -> CollectionReference:
+        return CollectionReference(self, "/".join(path))
+
+    def document(self, *path: str) -> DocumentReference:
+        return DocumentReference(self, "/".join(path))
+
+    def collection_group(self, collection_id: str) -> Query:
+        return Query(self, None, collection_id, all_descendants=True)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs) -> Transaction:
+        return Transaction(self, **kwargs)
+
+    def get_all(self, references, field_paths=None, transaction=None) -> Iterator[DocumentSnapshot]:
+        for ref in references:
+            yield _unwrap(ref).get()
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncDocumentReference:
+    def __init__(self, ref: DocumentReference):
+        self._ref = ref
+        self.id = ref.id
+        self.path = ref.path
+
+    @property
+    def parent(self) -> "AsyncCollectionReference":
+        return AsyncCollectionReference(self._ref.parent)
+
+    def collection(self, collection_id: str) -> "AsyncCollectionReference":
+        return AsyncCollectionReference(self._ref.collection(collection_id))
+
+    async def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        return await asyncio.to_thread(self._ref.get)
+
+    async def set(self, document_data: Dict[str, Any], merge: bool = False):
+        return await asyncio.to_thread(self._ref.set, document_data, merge=merge)
+
+    async def create(self, document_data: Dict[str, Any]):
+        return await asyncio.to_thread(self._ref.create, document_data)
+
+    async def update(self, field_updates: Dict[str, Any]):
+        return await asyncio.to_thread(self._ref.update, field_updates)
+
+    async def delete(self):
+        return await asyncio.to_thread(self._ref.delete)
+
+
+class AsyncQuery:
+    def __init__(self, query: Query):
+        self._query = query
+
+    def _wrap(self, query: Query) -> "AsyncQuery":
+        return AsyncQuery(query)
+
+    def where(self, *args, **kwargs) -> "AsyncQuery":
+        return self._wrap(self._query.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs) -> "AsyncQuery":
+        return self._wrap(self._query.order_by(*args, **kwargs))
+
+    def limit(self, count: int) -> "AsyncQuery":
+        return self._wrap(self._query.limit(count))
+
+    def offset(self, num_to_skip: int) -> "AsyncQuery":
+        return self._wrap(self._query.offset(num_to_skip))
+
+    def start_at(self, cursor) -> "AsyncQuery":
+        return self._wrap(self._query.start_at(cursor))
+
+    def start_after(self, cursor) -> "AsyncQuery":
+        return self._wrap(self._query.start_after(cursor))
+
+    def end_at(self, cursor) -> "AsyncQuery":
+        return self._wrap(self._query.end_at(cursor))
+
+    def end_before(self, cursor) -> "AsyncQuery":
+        return self._wrap(self._query.end_before(cursor))
+
+    async def stream(self, transaction=None):
+        for snapshot in await asyncio.to_thread(self._query._run):
+            yield snapshot
+
+    async def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return await asyncio.to_thread(self._query._run)
+
+
+class AsyncCollectionReference(AsyncQuery):
+    def __init__(self, collection: CollectionReference):
+        super().__init__(collection)
+        self.id = collection.id
+
+    def document(self, document_id: Optional[str] = None) -> AsyncDocumentReference:
+        return AsyncDocumentReference(self._query.document(document_id))
+
+    async def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        timestamp, ref = await asyncio.to_thread(self._query.add, document_data, document_id)
+        return timestamp, AsyncDocumentReference(ref)
+
+
+class AsyncWriteBatch:
+    def __init__(self, batch: WriteBatch):
+        self._batch = batch
+
+    def __len__(self):
+        return len(self._batch)
+
+    def set(self, reference, document_data: Dict[str, Any], merge: bool = False):
+        self._batch.set(reference, document_data, merge=merge)
+        return self
+
+    def create(self, reference, document_data: Dict[str, Any]):
+        self._batch.create(reference, document_data)
+        return self
+
+    def update(self, reference, field_updates: Dict[str, Any]):
+        self._batch.update(reference, field_updates)
+        return self
+
+    def delete(self, reference):
+        self._batch.delete(reference)
+        return self
+
+    async def commit(self) -> List[datetime]:
+        return await asyncio.to_thread(self._batch.commit)
+
+
+class AsyncClient:
+    """``firestore.AsyncClient`` counterpart sharing the store of a ``Client``."""
+
+    def __init__(self, client: Client):
+        self._client = client
+
+    def collection(self, *path: str) -> AsyncCollectionReference:
+        return AsyncCollectionReference(self._client.collection(*path))
+
+    def document(self, *path: str) -> AsyncDocumentReference:
+        return AsyncDocumentReference(self._client.document(*path))
+
+    def collection_group(self, collection_id: str) -> AsyncQuery:
+        return AsyncQuery(self._client.collection_group(collection_id))
+
+    def batch(self) -> AsyncWriteBatch:
+        return AsyncWriteBatch(self._client.batch())
+
+    async def get_all(self, references, field_paths=None, transaction=None):
+        refs = [_unwrap(ref) for ref in references]
+        for snapshot in await asyncio.to_thread(lambda: [ref.get() for ref in refs]):
+            yield snapshot
+
+    def close(self) -> None:
+        pass
+
+
+def create_clients(backend: str, sqlite_path: Optional[str] = None) -> Tuple[Client, AsyncClient]:
+    """Sync and async clients over one shared store ("memory" or "sqlite")."""
+    if backend == "memory":
+        store = MemoryStore()
+    elif backend == "sqlite":
+        store = SQLiteStore(sqlite_path or "storage.sqlite3")
+    else:
+        raise ValueError(f"Unknown local storage backend {backend!r}")
+    client = Client(store)
+    return client, AsyncClient(client)
@@ -1,13 +1,14 @@
 from typing import Optional, Dict
 from fastapi import Header, HTTPException
-from db.firestore_auth import auth
+from services.auth_tokens import verify_id_token
 
 
 def verify_firebase_token(authorization: Optional[str] = Header(None)) -> Dict:
     """FastAPI dependency to verify Firebase ID token from Authorization header.
 
     Expects header: Authorization: Bearer <idToken>
-    Returns decoded token dict on success, raises HTTPException(401) on failure.
+    Returns decoded token dict (with "uid") on success, raises HTTPException(401) on failure.
+    Verified tokens are cached until their exp claim (see services.auth_tokens).
     """
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
@@ -18,8 +19,7 @@ def verify_firebase_token(authorization: Optional[str] = Header(None)) -> Dict:
 
     id_token = parts[1]
     try:
-        decoded = auth.verify_id_token(id_token)
-        return decoded
+        return verify_id_token(id_token)
     except Exception as e:
         # Keep error message generic in production; include for debugging here
         raise HTTPException(status_code=401, detail=f"Invalid or expired ID token: {e}")
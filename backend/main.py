@@ -7,20 +7,25 @@ from dotenv import load_dotenv
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
-# 2️⃣ Configure Cloudinary
-import cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routers import tourists, businesses, items, retailers, login
+from services import lifecycle, metrics, query_profiler
+
+
+# 2️⃣ Clients (Firestore, Firebase Auth, Cloudinary) are built on first use;
+# start-up only warms them up in the background (see services/lifecycle.py)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifecycle.start()
+    yield
+    await lifecycle.shutdown()
 
 
-app = FastAPI(title="NewHacks2025 Backend")
+app = FastAPI(title="NewHacks2025 Backend", lifespan=lifespan)
 
 # Include routers
 app.include_router(tourists.router)
@@ -40,11 +45,48 @@ app.add_middleware(
     allow_credentials=True,     # required if your requests use cookies/auth
     allow_methods=["*"],        # allow all HTTP methods
     allow_headers=["*"],        # allow all headers
+    expose_headers=["X-Next-Cursor", "X-Created-Count", "X-Import-Id", "Server-Timing"],  # pagination cursor; bulk label item count; catalog import id; backend timings
 )
 
+# Development only: per-request Firestore call log and N+1 detection (see services/query_profiler.py)
+if query_profiler.QUERY_PROFILING:
+    app.add_middleware(query_profiler.QueryProfilerMiddleware)
+
+# Outermost: route latency histograms, backend call counts and Server-Timing (see services/metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 
 @app.get("/")
 def root():
     return {"message": "Welcome to the NewHacks2025 Backend!"}
 
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    """Readiness: 503 while the storage and auth clients are being built or failed to build."""
+    ready, checks = lifecycle.readiness()
+    return JSONResponse({"status": "ready" if ready else "starting", "checks": checks}, status_code=200 if ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint (this worker's metrics)."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+if query_profiler.QUERY_PROFILING:
+    @app.get("/debug/query-profile", include_in_schema=False)
+    def query_profile(output: str = Query("json", alias="format", pattern="^(json|text)$")):
+        """Per-endpoint backend call counts and N+1 suspects since start-up (or the last reset)."""
+        if output == "text":
+            return PlainTextResponse(query_profiler.format_report())
+        return query_profiler.report()
+
+    @app.delete("/debug/query-profile", include_in_schema=False)
+    def reset_query_profile():
+        query_profiler.reset()
+        return {"message": "Query profile reset"}
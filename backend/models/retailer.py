@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, EmailStr, Field, HttpUrl
 
 class Retailer(BaseModel):
     name: str
@@ -17,4 +19,23 @@ class RetailProfile(BaseModel):
     item_name: str
     description: str
     address: str
-    image_url: str
\ No newline at end of file
+    image_url: str
+
+class BulkRetailItem(BaseModel):
+    name: str
+    description: str = ""
+
+class BulkRetailItemsCreate(BaseModel):
+    retailer_email: str
+    store_id: Optional[str] = None
+    items: List[BulkRetailItem] = Field(..., min_length=1, max_length=1000)
+    format: Literal["pdf", "zip"] = "pdf"  # one multi-page label sheet PDF, or a ZIP of label PNGs
+    idempotency_key: Optional[str] = Field(None, max_length=200)  # retries with the same key rewrite the same items
+
+class CatalogRow(BaseModel):
+    """One product of a bulk catalog import (a CSV row or a JSONL line)."""
+    name: str = Field(..., min_length=1, max_length=200)
+    description: str = Field("", max_length=5000)
+    image_url: Optional[HttpUrl] = None  # fetched by Cloudinary
+    image: Optional[str] = None  # file name inside the uploaded images ZIP
+    sku: Optional[str] = None
@@ -1,16 +1,18 @@
-from fastapi import APIRouter, Query, HTTPException, Depends, status
+from fastapi import APIRouter, Query, HTTPException, Depends, Body, Response, status
 from models.business import Business, BusinessCreate, BusinessTransaction
 from routers.login import verify_token
 from db.firestore_client import db
 from db.firestore_auth import auth
 from typing import List, Dict, Any, Optional
 import logging
-from urllib.parse import unquote
-from geopy.geocoders import Nominatim
-from math import radians, sin, cos, asin, sqrt
 from datetime import datetime
 from fastapi import Depends
 from routers.login import verify_token
+from services import aliases, business_stats, points, spatial_index, transactions
+from services.geocoding import geocode_address, location_fields
+from services.export import ndjson_response
+from services.pagination import NEXT_CURSOR_HEADER, PageParams, paginate
+from services.roles import set_role_claims
 
 
 router = APIRouter(prefix="/businesses", tags=["Businesses"])
@@ -20,60 +22,47 @@ def _resolve_business_doc_ref(identifier: str):
     """
     Resolve a business document reference from a provided identifier.
     The identifier may be the document ID, a uid stored in the 'uid' field,
-    or an email stored in the 'email' field. Return a DocumentReference or None.
+    or an email stored in the 'email' field (URL-encoded or not).
+    Resolved through the identity alias index. Return a DocumentReference or None.
     """
-    logger = logging.getLogger(__name__)
-    logger.debug("Resolving business identifier: %s", identifier)
+    doc_id = aliases.resolve("businesses", identifier)
+    if doc_id is None:
+        logging.getLogger(__name__).debug("No business matched identifier: %s", identifier)
+        return None
+    return db.collection("businesses").document(doc_id)
 
-    # Try direct document lookup first
-    try:
-        doc_ref = db.collection("businesses").document(identifier)
-        doc = doc_ref.get()
-        if doc.exists:
-            logger.debug("Found business by direct document id: %s", identifier)
-            return doc_ref
-    except Exception as e:
-        logger.exception("Error during direct document lookup for %s: %s", identifier, e)
 
-    # Try queries against known fields
-    for field in ("uid", "email"):
-        try:
-            query = db.collection("businesses").where(field, "==", identifier).limit(1)
-            docs = list(query.stream())
-            if docs:
-                logger.debug("Found business by %s == %s -> doc id %s", field, identifier, docs[0].id)
-                return db.collection("businesses").document(docs[0].id)
-        except Exception as e:
-            logger.exception("Error querying businesses by %s for %s: %s", field, identifier, e)
-
-    # If identifier looks URL-encoded, try decoded version
-    try:
-        decoded = unquote(identifier)
-        if decoded and decoded != identifier:
-            logger.debug("Trying URL-decoded identifier: %s", decoded)
-            for field in ("uid", "email"):
-                try:
-                    query = db.collection("businesses").where(field, "==", decoded).limit(1)
-                    docs = list(query.stream())
-                    if docs:
-                        logger.debug("Found business by %s == %s -> doc id %s", field, decoded, docs[0].id)
-                        return db.collection("businesses").document(docs[0].id)
-                except Exception as e:
-                    logger.exception("Error querying businesses by %s for decoded %s: %s", field, decoded, e)
-    except Exception:
-        pass
-
-    logger.debug("No business matched identifier: %s", identifier)
-    return None
+def _resolve_business_doc(identifier: str):
+    """
+    Like _resolve_business_doc_ref, but read the document too, for write paths:
+    an alias may outlive its business (cached on another worker), and writes
+    must not land under a deleted document. Return (DocumentReference, snapshot)
+    or None; a stale alias is dropped.
+    """
+    doc_ref = _resolve_business_doc_ref(identifier)
+    if doc_ref is None:
+        return None
+    doc = doc_ref.get()
+    if not doc.exists:
+        aliases.drop_alias("businesses", identifier)
+        return None
+    return doc_ref, doc
 
 @router.get("/transactions")
 def list_business_transactions(
+    response: Response,
     identifier: str = Query(..., description="Business identifier (doc id, uid or email)"),
+    start: Optional[str] = Query(None, description="Earliest scheduled_time (ISO date or datetime, inclusive)"),
+    end: Optional[str] = Query(None, description="Latest scheduled_time (ISO date or datetime, exclusive)"),
+    page: PageParams = Depends(),
     uid: str = Depends(verify_token),
 ):
-    """Return transactions scheduled at the business location.
+    """Return the caller's transactions scheduled at the business location, one
+    page at a time, ordered by scheduled_time.
 
-    Requires a verified Firebase ID token.
+    Filtering, ordering and the date range run in Firestore (actor_uid +
+    scheduled_time composite index), so a page costs one query regardless of
+    the business's history. Requires a verified Firebase ID token.
     """
     # Ensure business exists (resolve tolerant identifier)
     doc_ref = _resolve_business_doc_ref(identifier)
@@ -81,87 +70,103 @@ def list_business_transactions(
         raise HTTPException(status_code=404, detail="Business not found")
 
     try:
-        coll = doc_ref.collection("transactions")
-        docs = coll.stream()
+        query = doc_ref.collection(transactions.COLLECTION).where(transactions.ACTOR_FIELD, "==", uid)
+        if start:
+            query = query.where(transactions.SCHEDULED_FIELD, ">=", start)
+        if end:
+            query = query.where(transactions.SCHEDULED_FIELD, "<", end)
         res = []
-
-        # Determine current user's display name (fallback to email)
-        try:
-            user_record = auth.get_user(uid)
-            current_name = (user_record.display_name or user_record.email or "").strip()
-        except Exception:
-            current_name = ""
-
-        for d in docs:
+        for d in paginate(query, response, page, order_field=transactions.SCHEDULED_FIELD):
             item = d.to_dict() or {}
             item["id"] = d.id
-            # Include only transactions where the 'name' equals the current user's name
-            tx_name = str(item.get("name") or "").strip()
-            if current_name and tx_name == current_name:
-                res.append(item)
-        # Optionally sort by scheduled_time if present
-        try:
-            res.sort(key=lambda x: x.get("scheduled_time") or "")
-        except Exception:
-            pass
+            res.append(item)
         return res
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.get("/transactions/export")
+def export_business_transactions(uid: str = Depends(verify_token)):
+    """Stream every business transaction as NDJSON (back-office export).
+
+    Each line carries the transaction fields plus its id and the owning business_id.
+    Requires a verified Firebase ID token.
+    """
+    def to_line(doc):
+        data = doc.to_dict() or {}
+        data["id"] = doc.id
+        data["business_id"] = doc.reference.parent.parent.id
+        return data
+
+    return ndjson_response(db.collection_group("transactions").stream(), "transactions.ndjson", transform=to_line)
+
 # Create a business
 @router.post("/")
 def create_business(business: Business):
     doc_ref = db.collection("businesses").document(business.email)  # UID = email
-    doc_ref.set(business.model_dump())
+    data = business.model_dump()
+    data.update(location_fields(business.address))
+    doc_ref.set(data)
+    spatial_index.index_owner("businesses", doc_ref.id, data)
+    aliases.register_aliases("businesses", doc_ref.id, data)
     return {"message": "Business created", "business": business}
 
 # List all businesses
 @router.get("/")
-def list_businesses():
-    docs = db.collection("businesses").stream()
-    return [doc.to_dict() for doc in docs]
+def list_businesses(response: Response, page: PageParams = Depends(), output: str = Query("json", alias="format", pattern="^(json|ndjson)$")):
+    """List businesses one page at a time; format=ndjson streams the whole collection.
+    Balances include unfolded point shards."""
+    if output == "ndjson":
+        totals = points.shard_totals("businesses")
+
+        def to_line(doc):
+            data = doc.to_dict() or {}
+            points.include_shards("businesses", {doc.id: data}, totals)
+            data["id"] = doc.id
+            return data
+
+        return ndjson_response(db.collection("businesses").stream(), "businesses.ndjson", transform=to_line)
+    profiles = {doc.id: doc.to_dict() for doc in paginate(db.collection("businesses"), response, page)}
+    points.include_shards("businesses", profiles)
+    return list(profiles.values())
 
 @router.get("/nearby")
-def businesses_nearby(address: str = Query(..., description="User's address to compute proximity"), limit: int = Query(20, ge=1, le=100)) -> List[Dict[str, Any]]:
+def businesses_nearby(
+    response: Response,
+    address: str = Query(..., description="User's address to compute proximity"),
+    limit: int = Query(20, ge=1, le=100),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only return businesses within this distance"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+) -> List[Dict[str, Any]]:
     """
     Return businesses sorted by distance to the given address.
     Response items include name, email, address, and distance_km.
+    When more results are available the next page cursor is sent in X-Next-Cursor.
     """
-    origin = _geocode_address(address)
+    origin = geocode_address(address)
     if not origin:
         # Could not geocode the user's address; return empty list so frontend shows no locations
         return []
 
-    results: List[Dict[str, Any]] = []
-
-    # Iterate documents and compute distance. If a business document already contains
-    # cached coordinates ('lat' and 'lng'), use them. Otherwise attempt to geocode
-    # the business address and write the coords back to Firestore for future calls.
-    for doc in db.collection("businesses").stream():
-        business = doc.to_dict()
-        addr = business.get("address")
-        name = business.get("name")
-        email = business.get("email")
-        if not addr or not name or not email:
-            continue
-
-        # Geocode the business address (Business model does not include lat/lng)
-        coords = _geocode_address(addr)
-        if not coords:
-            # Skip businesses we can't obtain coordinates for
-            continue
-
-        dist_km = _haversine_km(origin["lat"], origin["lng"], coords["lat"], coords["lng"])
-        results.append({
-            "id": doc.id,
-            "name": name,
-            "email": email,
-            "address": addr,
-            "distance_km": round(dist_km, 2),
-        })
-
-    results.sort(key=lambda x: x["distance_km"])  # nearest first
-    return results[:limit]
+    # Coordinates are stored on the business document at registration (and by
+    # scripts/backfill_locations.py for older documents); the index only holds businesses with them.
+    hits = spatial_index.get_index("businesses").nearest(
+        origin["lat"], origin["lng"], limit, radius_km=radius_km, after=spatial_index.parse_hit_cursor(cursor)
+    )
+    if len(hits) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = spatial_index.hit_cursor(hits[-1])
+
+    return [
+        {
+            "id": hit.key,
+            "name": hit.payload["name"],
+            "email": hit.payload["email"],
+            "address": hit.payload["address"],
+            "distance_km": round(hit.distance_km, 2),
+        }
+        for hit in hits
+    ]
 
 
 
@@ -202,7 +207,11 @@ def register_business(business: BusinessCreate):
             "uid": user_record.uid,
             "role": "business",
         }
+        business_doc.update(location_fields(business.address))
         db.collection("businesses").document(user_record.uid).set(business_doc)
+        spatial_index.index_owner("businesses", user_record.uid, business_doc)
+        aliases.register_aliases("businesses", user_record.uid, business_doc)
+        set_role_claims(user_record.uid, "business", user_record.uid)
         return {"message": "Business account created", "uid": user_record.uid}
     except Exception as e:
         # Log to server console for debugging and return clear reason to client
@@ -212,11 +221,35 @@ def register_business(business: BusinessCreate):
 @router.delete("/business/{uid}")
 def delete_business(uid: str, logged_in_uid: str = Depends(verify_token)):
     doc_ref = db.collection("businesses").document(uid)
-    if not doc_ref.get().exists:
+    doc = doc_ref.get()
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Business not found")
     doc_ref.delete()
+    aliases.unregister_aliases("businesses", uid, doc.to_dict())
+    spatial_index.remove_owner("businesses", uid)
+    spatial_index.invalidate("items")
     return {"message": f"Business {uid} deleted successfully"}
 
+@router.patch("/{uid}/address")
+def update_business_address(
+    uid: str,
+    address: str = Body(..., embed=True),
+    logged_in_uid: str = Depends(verify_token),
+):
+    """Change a business address and re-geocode its stored coordinates."""
+    doc_ref = db.collection("businesses").document(uid)
+    if not doc_ref.get().exists:
+        raise HTTPException(status_code=404, detail="Business not found")
+    update = {"address": address, "lat": None, "lng": None, "geohash": None, "geocoded_address": None}
+    update.update(location_fields(address))
+    doc_ref.update(update)
+    profile = doc_ref.get().to_dict()
+    points.include_shards("businesses", {uid: profile})
+    spatial_index.index_owner("businesses", uid, profile)
+    # Items are located at their owning business; reload them with the new coordinates
+    spatial_index.invalidate("items")
+    return {"message": "Business address updated", "uid": uid, "location": update}
+
 # Add a transaction for a business (pickup/dropoff scheduled at the business location)
 @router.post("/transactions", status_code=status.HTTP_201_CREATED)
 def add_business_transaction(payload: Dict[str, Any], identifier: str = Query(..., description="Business identifier (doc id, uid or email)")):
@@ -226,9 +259,10 @@ def add_business_transaction(payload: Dict[str, Any], identifier: str = Query(..
     then normalizes and persists a BusinessTransaction (name, item_name, qr_code_id, date, time, transaction_type).
     """
     # Ensure business exists (resolve tolerant identifier)
-    doc_ref = _resolve_business_doc_ref(identifier)
-    if not doc_ref:
+    resolved = _resolve_business_doc(identifier)
+    if not resolved:
         raise HTTPException(status_code=404, detail="Business not found")
+    doc_ref, biz_doc = resolved
 
         # Persist the transaction under a subcollection 'transactions'
     try:
@@ -237,10 +271,10 @@ def add_business_transaction(payload: Dict[str, Any], identifier: str = Query(..
 
         # Resolve business name
         try:
-            biz_doc = doc_ref.get()
-            biz = biz_doc.to_dict() if biz_doc and biz_doc.exists else {}
+            biz = biz_doc.to_dict() or {}
             business_name = (biz.get("name") or biz.get("business_name") or biz.get("email") or "").strip()
         except Exception:
+            biz = {}
             business_name = ""
 
         # Normalize incoming payload
@@ -272,22 +306,15 @@ def add_business_transaction(payload: Dict[str, Any], identifier: str = Query(..
 
         data = tx_obj.model_dump()
 
-        # If date and time are provided, try to build an ISO scheduled_time
-        date_str = data.get("date")
-        time_str = data.get("time")
-        if date_str and time_str:
-            try:
-                combined = f"{date_str} {time_str}"
-                try:
-                    dt = datetime.fromisoformat(f"{date_str}T{time_str}")
-                except Exception:
-                    dt = datetime.strptime(combined, "%Y-%m-%d %H:%M")
-                data["scheduled_time"] = dt.isoformat()
-            except Exception:
-                data["scheduled_time"] = None
+        # Indexed fields for the server-side filtered list (actor_uid, ISO scheduled_time)
+        data.update(transactions.query_fields(doc_ref.id, biz, data.get("date"), data.get("time")))
 
         data["created_at"] = datetime.utcnow().isoformat() + "Z"
-        tx_ref.set(data)
+        # The record and the dashboard counter commit together
+        batch = db.batch()
+        batch.set(tx_ref, data)
+        business_stats.stage(batch, db, doc_ref.id, transaction_type=data["transaction_type"], transaction_delta=1)
+        batch.commit()
         return {"message": "Transaction created", "id": tx_ref.id, "transaction": data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -302,52 +329,51 @@ def delete_business_transaction(
 
     Requires a verified Firebase ID token.
     """
-    doc_ref = _resolve_business_doc_ref(identifier)
-    if not doc_ref:
+    resolved = _resolve_business_doc(identifier)
+    if not resolved:
         raise HTTPException(status_code=404, detail="Business not found")
+    doc_ref, _ = resolved
 
     try:
         tx_ref = doc_ref.collection("transactions").document(transaction_id)
-        if not tx_ref.get().exists:
+        tx_doc = tx_ref.get()
+        if not tx_doc.exists:
             raise HTTPException(status_code=404, detail="Transaction not found")
-        tx_ref.delete()
+        batch = db.batch()
+        batch.delete(tx_ref)
+        business_stats.stage(batch, db, doc_ref.id, transaction_type=(tx_doc.to_dict() or {}).get("transaction_type"), transaction_delta=-1)
+        batch.commit()
         return {"message": "Transaction deleted", "id": transaction_id}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Great-circle distance between two points (in kilometers)."""
-    # convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    # haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    r = 6371  # Radius of earth in kilometers
-    return r * c
+@router.get("/{identifier}/stats")
+def get_business_stats(
+    identifier: str,
+    days: int = Query(14, ge=1, le=business_stats.RETENTION_DAYS),
+    weeks: int = Query(8, ge=1, le=business_stats.RETENTION_DAYS // 7 + 1),
+):
+    """Dashboard aggregates in one query: items held/available, pickups and
+    dropoffs per day and ISO week (oldest first), points earned and scheduled
+    transactions. Counters are maintained on every write, spread over a few
+    shards (services.business_stats)."""
+    doc_ref = _resolve_business_doc_ref(identifier)
+    if not doc_ref:
+        raise HTTPException(status_code=404, detail="Business not found")
+    data = business_stats.merge_shards(business_stats.shards(db, doc_ref.id).stream())
+    return business_stats.summarize(doc_ref.id, data, days, weeks)
 
 @router.get("/{uid}")
 def get_business(uid: str):
     doc = db.collection("businesses").document(uid).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Business not found")
-    return doc.to_dict()
-
-_geocoder = Nominatim(user_agent="newhacks2025-backend")
-
+    data = doc.to_dict()
+    points.include_shards("businesses", {doc.id: data})
+    return data
 
-def _geocode_address(address: str) -> Optional[Dict[str, float]]:
-    try:
-        loc = _geocoder.geocode(address, timeout=10)
-        if not loc:
-            return None
-        return {"lat": loc.latitude, "lng": loc.longitude}
-    except Exception:
-        return None
-    
 @router.get("/items/{email}")
 def get_held_items(email: str):
     """
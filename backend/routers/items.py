@@ -1,65 +1,113 @@
-from fastapi import APIRouter, Query, UploadFile, File, HTTPException, Form, Depends
+from fastapi import APIRouter, Query, UploadFile, File, HTTPException, Form, Depends, Request, Response, BackgroundTasks
 from models.item import Item
 from models.business import BusinessTransaction
 from routers.login import verify_token
-from db.firestore_client import db
-from typing import List, Dict, Any, Optional
-from geopy.geocoders import Nominatim
-from math import radians, sin, cos, asin, sqrt
+from db.firestore_client import db, adb
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+from datetime import datetime
 import requests
 import os
 from dotenv import load_dotenv
 from db import cloudinary_client
 import uuid
-from db.cloudinary_client import upload_file
-import qrcode
-import io
-import base64
+from db.cloudinary_client import upload_file, upload_and_patch
+from services import aliases, business_stats, item_events, points, spatial_index, transactions
+from services.geo import haversine_km
+from services.export import ndjson_response
+from services.pagination import NEXT_CURSOR_HEADER, PageParams, decode_cursor, encode_cursor, paginate
+from services.qr import png_response, qr_url
 from pydantic import BaseModel
 
 
 router = APIRouter(prefix="/items", tags=["Items"])
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Great-circle distance between two points (in kilometers)."""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    r = 6371
-    return r * c
+# Firestore caps the number of values in an "in" filter
+_IN_QUERY_LIMIT = 30
 
-_geocoder = Nominatim(user_agent="newhacks2025-backend")
 
+def _resolve_owners(emails, known: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Fetch business documents for many owner emails at once.
 
-def _geocode_address(address: str) -> Optional[Dict[str, float]]:
+    Each distinct email not already in ``known`` is fetched exactly once, using
+    chunked ``email in [...]`` queries, so resolving N items costs
+    ceil(distinct owners / 30) queries instead of one query per item.
+    Returns ``known`` updated with the newly found owners (email -> document).
+    """
+    owners = known if known is not None else {}
+    missing = sorted({e for e in emails if e and e not in owners})
+    for i in range(0, len(missing), _IN_QUERY_LIMIT):
+        chunk = missing[i:i + _IN_QUERY_LIMIT]
+        for doc in db.collection("businesses").where("email", "in", chunk).stream():
+            data = doc.to_dict() or {}
+            owners.setdefault(data.get("email"), data)
+    return owners
+
+
+async def _resolve_doc(collection: str, identifier: Optional[str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(document id, data) in the collection for a document id, 'email' or 'uid'.
+    Resolved through the identity alias index, then read: an alias cached here
+    may outlive its document (deleted on another worker), so a missing
+    document drops the alias and counts as not found.
+    """
+    if not identifier:
+        return None
     try:
-        loc = _geocoder.geocode(address, timeout=10)
-        if not loc:
+        doc_id = await aliases.resolve_async(collection, identifier)
+        if not doc_id:
             return None
-        return {"lat": loc.latitude, "lng": loc.longitude}
-    except Exception:
+        snap = await adb.collection(collection).document(doc_id).get()
+        if not snap.exists:
+            await aliases.drop_alias_async(collection, identifier)
+            return None
+        return doc_id, snap.to_dict() or {}
+    except Exception as e:
+        print(f"Resolve {collection} {identifier} failed:", e)
         return None
 
 
-def _exists_by_id_or_email(collection: str, identifier: str) -> bool:
-    """Return True if a document exists in the collection either with the given
-    document id or where the field 'email' equals the identifier.
-    """
+async def _resolve_donor(donor_uid: Optional[str], donor_email: Optional[str]) -> Optional[str]:
+    """Tourist document id of the donor, by uid or email; both lookups run concurrently."""
+    by_uid, by_email = await asyncio.gather(
+        _resolve_doc("tourists", donor_uid),
+        _resolve_doc("tourists", donor_email),
+    )
+    found = by_uid or by_email
+    return found[0] if found else None
+
+
+async def _get_item(qr_code_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Existing item document for a client-supplied id (None for new ids)."""
+    if not qr_code_id:
+        return None
+    snap = await adb.collection("items").document(qr_code_id).get()
+    return (snap.to_dict() or {}) if snap.exists else None
+
+
+async def _read_image(file: Optional[UploadFile], defer_upload: bool):
+    """Upload the item image, or with defer_upload only read it.
+    Returns (image_url, pending_upload)."""
+    if not file:
+        return None, None
     try:
-        # Try direct document id
-        if db.collection(collection).document(identifier).get().exists:
-            return True
-        # Try query by email field
-        try:
-            matches = list(db.collection(collection).where("email", "==", identifier).limit(1).stream())
-            return len(matches) > 0
-        except Exception:
-            return False
-    except Exception:
-        return False
+        file_content = await file.read()
+        public_id = str(uuid.uuid4())
+        if defer_upload:
+            return None, (file_content, public_id)
+        result = await upload_file(file_content, public_id, folder="items")
+        image_url = result.get("secure_url")
+        if not image_url:
+            raise Exception("Cloudinary upload failed")
+        return image_url, None
+    except Exception as e:
+        print("Cloudinary upload failed:", e)
+        raise HTTPException(status_code=400, detail=str(e) if isinstance(e, RuntimeError) else "Image upload failed")
+
+
+def _qr_payload(qr_code_id: str, owner_email: Optional[str]) -> Dict[str, Any]:
+    """Content encoded in an item's QR code."""
+    return {"qr_code_id": qr_code_id, "owner_email": owner_email}
 
 @router.post("/cloudinary")
 @router.post("/cloudinary/")
@@ -75,33 +123,24 @@ async def create_item(
     donor_email: Optional[str] = Form(None),
     date: Optional[str] = Form(None),
     time: Optional[str] = Form(None),
+    defer_upload: bool = Form(False),
+    background_tasks: BackgroundTasks = None,
 ):
     """
     Creates an item and uploads image to Cloudinary (if provided).
-    Returns QR code + item info.
+    With defer_upload, returns immediately with image_status "pending" and the
+    image URL is written to the item once the upload finishes.
+    Returns item info and the URL of the item's QR code image.
     """
 
-    # ✅ Verify owner (tourist or business) by id or by email field
-    owner_ok = _exists_by_id_or_email("tourists", owner_email) or _exists_by_id_or_email("businesses", owner_email)
-    if not owner_ok:
-        # Some deployments may also use retailers; include as a fallback
-        owner_ok = _exists_by_id_or_email("retailers", owner_email)
-    if not owner_ok:
+    # ✅ Resolve the owner (tourist, business or retailer by id or email field) and the donor, all lookups in parallel
+    (tourist, owner_business, retailer), donor_id = await asyncio.gather(
+        asyncio.gather(*(_resolve_doc(collection, owner_email) for collection in ("tourists", "businesses", "retailers"))),
+        _resolve_donor(donor_uid, donor_email),
+    )
+    if not (tourist or owner_business or retailer):
         raise HTTPException(status_code=404, detail="Owner not found")
-
-    # ✅ Upload image to Cloudinary (if provided)
-    image_url = None
-    if file:
-        try:
-            file_content = await file.read()
-            public_id = str(uuid.uuid4())
-            result = upload_file(file_content, public_id, folder="items")
-            image_url = result.get("secure_url")
-            if not image_url:
-                raise Exception("Cloudinary upload failed")
-        except Exception as e:
-            print("Cloudinary upload failed:", e)
-            raise HTTPException(status_code=400, detail=str(e) if isinstance(e, RuntimeError) else "Image upload failed")
+    business_id, business = owner_business or (None, None)
 
     # ✅ Determine QR code ID (allow override from client to align with scanned QR)
     if qr_code_id:
@@ -110,104 +149,92 @@ async def create_item(
         # to avoid duplicate IDs across collections, else we'll create a new doc with this ID.
         qr_code_id = provided_id
     else:
+        provided_id = None
         qr_code_id = str(uuid.uuid4())
 
+    # ✅ Upload image to Cloudinary (if provided) while a re-used item is fetched
+    (image_url, pending_upload), existing = await asyncio.gather(
+        _read_image(file, defer_upload),
+        _get_item(provided_id),
+    )
+    # A re-used id moves the item out of its previous holder's counts
+    holders = await business_stats.item_holders_async(existing)
+    if business is not None:
+        holders[owner_email] = business_id
+
     # ✅ Create Firestore item
     item_data = {
         "name": name,
         "description": description,
         "qr_code_id": qr_code_id,
         "owner_email": owner_email,
+        business_stats.OWNER_BUSINESS_FIELD: business_id if business is not None else None,
         # When a donation is submitted, the listing should be initially unavailable
         "status": "unavailable",
         "image_url": image_url,
         "created_by": "user"
     }
-    db.collection("items").document(qr_code_id).set(item_data)
-
-    # ✅ Award points to donor (if provided)
-    try:
-        donor_identifier = (donor_uid or donor_email)
-        if donor_identifier:
-            # Try by document id (uid or email)
-            t_ref = db.collection("tourists").document(donor_identifier)
-            t_doc = t_ref.get()
-            if not t_doc.exists and donor_email:
-                # Fallback: query by email field
-                q = db.collection("tourists").where("email", "==", donor_email).limit(1)
-                matches = list(q.stream())
-                if matches:
-                    t_ref = db.collection("tourists").document(matches[0].id)
-                    t_doc = matches[0]
-
-            if t_doc.exists:
-                t_data = t_doc.to_dict() or {}
-                current = int(t_data.get("points", 0) or 0)
-                t_ref.update({"points": current + 20})
-    except Exception as e:
-        # Log but don't fail donation on points award issues
-        print("Award points failed:", e)
-
-    # ✅ Create a BusinessTransaction (Dropoff) under the business doc
-    try:
-        # Resolve business document by id or email field
-        biz_ref = db.collection("businesses").document(owner_email)
-        biz_doc = biz_ref.get()
-        if not biz_doc.exists:
-            matches = list(db.collection("businesses").where("email", "==", owner_email).limit(1).stream())
-            if matches:
-                biz_ref = db.collection("businesses").document(matches[0].id)
-                biz_doc = matches[0]
-
-        if biz_doc and biz_doc.exists:
-            biz = biz_doc.to_dict() or {}
-            business_name = (biz.get("name") or biz.get("business_name") or biz.get("email") or "").strip()
-            tx = BusinessTransaction(
-                name=business_name or owner_email,
-                item_name=name,
-                qr_code_id=qr_code_id,
-                date=str(date or ""),
-                time=str(time or ""),
-                transaction_type="Dropoff",
-            )
-            biz_ref.collection("transactions").document().set(tx.model_dump())
-    except Exception as e:
-        print("Create transaction failed:", e)
-
-    # ✅ Generate QR code image
-    try:
-        import json
-        qr_payload = {"qr_code_id": qr_code_id, "owner_email": owner_email}
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        # Ensure QR encodes valid JSON
-        qr.add_data(json.dumps(qr_payload))
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffered = io.BytesIO()
-        img.save(buffered, format="PNG")
-        qr_base64 = base64.b64encode(buffered.getvalue()).decode()
-    except Exception as e:
-        print("QR code generation failed:", e)
-        qr_base64 = None
+    if pending_upload:
+        item_data["image_status"] = "pending"
+    item_ref = adb.collection("items").document(qr_code_id)
+
+    # ✅ Item, its created event, donor points and the business Dropoff transaction commit together
+    batch = adb.batch()
+    batch.set(item_ref, item_data)
+    item_events.record(batch, adb, item_events.CREATED, qr_code_id, owner_email, item_data["status"],
+                       previous=existing, actor=donor_uid or donor_email, businesses=holders)
+    if donor_id:
+        points.add_credit(batch, adb, "tourists", donor_id, 20, "donation", qr_code_id)
+    if business is not None:
+        business_name = (business.get("name") or business.get("business_name") or business.get("email") or "").strip()
+        tx = BusinessTransaction(
+            name=business_name or owner_email,
+            item_name=name,
+            qr_code_id=qr_code_id,
+            date=str(date or ""),
+            time=str(time or ""),
+            transaction_type="Dropoff",
+        )
+        tx_data = tx.model_dump()
+        tx_data.update(transactions.query_fields(business_id, business, tx.date, tx.time))
+        tx_data["created_at"] = datetime.utcnow().isoformat() + "Z"
+        batch.set(adb.collection("businesses").document(business_id).collection(transactions.COLLECTION).document(), tx_data)
+        business_stats.stage(batch, adb, business_id, transaction_type=tx.transaction_type, transaction_delta=1)
+    await batch.commit()
+
+    if business is not None:
+        spatial_index.index_item(qr_code_id, business)
+    else:
+        spatial_index.remove_item(qr_code_id)
+    if pending_upload:
+        background_tasks.add_task(upload_and_patch, *pending_upload, "items", item_ref)
 
-    return {
+    response = {
         "message": "Item created successfully",
         "qr_code_id": qr_code_id,
-        "qr_code_base64": qr_base64,
+        "qr_code_url": qr_url(f"/items/{qr_code_id}/qr.png", _qr_payload(qr_code_id, owner_email)),
         "image_url": image_url,
     }
+    if pending_upload:
+        response["image_status"] = "pending"
+    return response
 
 @router.get("/")
-def list_items():
-    return [doc.to_dict() for doc in db.collection("items").stream()]
+def list_items(response: Response, page: PageParams = Depends(), output: str = Query("json", alias="format", pattern="^(json|ndjson)$")):
+    """List items one page at a time; format=ndjson streams the whole collection."""
+    if output == "ndjson":
+        return ndjson_response(db.collection("items").stream(), "items.ndjson")
+    return [doc.to_dict() for doc in paginate(db.collection("items"), response, page)]
 
 
 @router.get("/nearby")
 def items_nearby(
+    response: Response,
     lat: float = Query(..., description="Origin latitude"),
     lng: float = Query(..., description="Origin longitude"),
     limit: int = Query(20, ge=1, le=100),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only return items within this distance"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
 ) -> List[Dict[str, Any]]:
     """
     Return items whose owners are businesses with known addresses, sorted by distance to the given coordinates.
@@ -216,51 +243,137 @@ def items_nearby(
       - lat, lng (of the owner's business address)
       - distance_km
       - owner_name, owner_address, owner_email
+    When more results are available the next page cursor is sent in X-Next-Cursor.
     """
     origin = {"lat": float(lat), "lng": float(lng)}
-
-    # Collect tuples of (distance, enriched_item_dict) so we can sort by proximity
-    distance_items: List[tuple[float, Dict[str, Any]]] = []
-    for doc in db.collection("items").stream():
-        raw = doc.to_dict() or {}
-        owner_email = raw.get("owner_email")
-        if not owner_email:
-            continue
-        
-        owner_query = db.collection("businesses").where("email", "==", owner_email).limit(1).stream()
-        owner_doc = next(owner_query, None)
-        if not owner_doc:
-            continue
-        owner = owner_doc.to_dict() or {}
-        # Owner must be a business with an address to compute location
-        addr = owner.get("address")
-        if not addr:
-            continue
-
-        coords = _geocode_address(addr)
-        if not coords:
-            # Skip owners we cannot geocode
-            continue
-
-        dist_km = _haversine_km(origin["lat"], origin["lng"], coords["lat"], coords["lng"])
-
-        # Build enriched item payload
-        item: Dict[str, Any] = dict(raw)
-        item["id"] = raw.get("qr_code_id") or doc.id
-        item["lat"] = coords["lat"]
-        item["lng"] = coords["lng"]
-        item["distance_km"] = round(dist_km, 3)
-        item["owner_email"] = owner_email
-        item["owner_address"] = addr
-        item["owner_name"] = owner.get("name") or owner.get("business_name") or owner_email
-
-        distance_items.append((dist_km, item))
-
-    # Sort by distance and return the enriched dicts for the closest `limit` items
-    distance_items.sort(key=lambda x: x[0])
-    closest = [itm for _, itm in distance_items[:limit]]
+    index = spatial_index.get_index("items")
+
+    # The index yields candidate ids nearest first; documents are re-read so the
+    # response reflects current ownership, and stale candidates are skipped.
+    # Per batch of candidates this costs one get_all plus ceil(new owners / 30)
+    # owner queries; each owner is fetched at most once per request.
+    closest: List[Dict[str, Any]] = []
+    owners: Dict[str, Dict[str, Any]] = {}
+    after = spatial_index.parse_hit_cursor(cursor)
+    last_hit = None
+    while len(closest) < limit:
+        wanted = limit - len(closest)
+        hits = index.nearest(origin["lat"], origin["lng"], wanted, radius_km=radius_km, after=after)
+        if not hits:
+            break
+        refs = [db.collection("items").document(hit.key) for hit in hits]
+        docs = {doc.id: doc for doc in db.get_all(refs) if doc.exists}
+        _resolve_owners(((doc.to_dict() or {}).get("owner_email") for doc in docs.values()), owners)
+
+        for hit in hits:
+            last_hit = hit
+            doc = docs.get(hit.key)
+            if doc is None:
+                continue
+            raw = doc.to_dict() or {}
+            owner_email = raw.get("owner_email")
+            if not owner_email:
+                continue
+            owner = owners.get(owner_email)
+            if not owner:
+                continue
+            # Owner must be a business with an address and stored coordinates
+            addr = owner.get("address")
+            if not addr or owner.get("lat") is None or owner.get("lng") is None:
+                continue
+
+            dist_km = haversine_km(origin["lat"], origin["lng"], owner["lat"], owner["lng"])
+
+            # Build enriched item payload
+            item: Dict[str, Any] = dict(raw)
+            item["id"] = raw.get("qr_code_id") or doc.id
+            item["lat"] = owner["lat"]
+            item["lng"] = owner["lng"]
+            item["distance_km"] = round(dist_km, 3)
+            item["owner_email"] = owner_email
+            item["owner_address"] = addr
+            item["owner_name"] = owner.get("name") or owner.get("business_name") or owner_email
+            closest.append(item)
+
+        after = (last_hit.distance_km, last_hit.key)
+        if len(hits) < wanted:
+            break
+
+    if len(closest) == limit and last_hit is not None:
+        response.headers[NEXT_CURSOR_HEADER] = spatial_index.hit_cursor(last_hit)
     return closest
 
+# ----------------------------
+# Lifecycle views (precomputed by services.item_events)
+# ----------------------------
+@router.get("/throughput")
+def item_throughput(
+    response: Response,
+    start: Optional[str] = Query(None, description="First day (YYYY-MM-DD, inclusive)"),
+    end: Optional[str] = Query(None, description="Last day (YYYY-MM-DD, inclusive)"),
+    page: PageParams = Depends(),
+):
+    """Item events per UTC day (created, pickups, dropoffs, scans), oldest first.
+
+    Each day is summed from its counter shards (see services.item_events); a
+    page holds ``page_size`` days and the cursor is the last day returned.
+    """
+    query = db.collection(item_events.THROUGHPUT_COLLECTION)
+    if start:
+        query = query.where("day", ">=", start)
+    if end:
+        query = query.where("day", "<=", end)
+    query = query.order_by("day")
+    if page.unpaginated:
+        return item_events.daily_throughput(query.stream())
+    if page.cursor:
+        last = decode_cursor(page.cursor)
+        if not isinstance(last, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where("day", ">", last)
+    # A day has at most THROUGHPUT_SHARDS documents, so this spans more than a page
+    limit = (page.page_size + 1) * item_events.THROUGHPUT_SHARDS
+    shards = list(query.limit(limit).stream())
+    days = item_events.daily_throughput(shards)
+    if len(shards) == limit and 1 < len(days) <= page.page_size:
+        # The last day may continue past the limit (shard count was lowered)
+        days = days[:-1]
+    if len(days) > page.page_size or len(shards) == limit:
+        days = days[:page.page_size]
+        if days:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(days[-1]["day"])
+    return days
+
+@router.get("/inventory/{holder}")
+def item_inventory(holder: str):
+    """Items currently held by an owner (e.g. a business email) and how many are available."""
+    doc = db.collection(item_events.INVENTORY_COLLECTION).document(item_events.holder_key(holder)).get()
+    data = doc.to_dict() if doc.exists else {}
+    return {"holder": holder, "items": data.get("items", 0), "available": data.get("available", 0)}
+
+@router.get("/{qr_code_id}/stats")
+def item_stats(qr_code_id: str):
+    """Circulation count and event counts of one item."""
+    doc = db.collection(item_events.STATS_COLLECTION).document(qr_code_id).get()
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="No events recorded for this item")
+    return doc.to_dict()
+
+@router.get("/{qr_code_id}/events")
+def item_event_history(qr_code_id: str, response: Response, page: PageParams = Depends()):
+    """Lifecycle events of one item, oldest first."""
+    query = db.collection(item_events.EVENTS_COLLECTION).where("qr_code_id", "==", qr_code_id)
+    return [doc.to_dict() for doc in paginate(query, response, page, order_field="created_at")]
+
+@router.get("/{qr_code_id}/qr.png")
+def get_item_qr(qr_code_id: str, request: Request, v: Optional[str] = None):
+    """QR code PNG for an item. Served with an ETag; versioned URLs (``?v=``,
+    as returned by create) are cached as immutable."""
+    doc = db.collection("items").document(qr_code_id).get()
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return png_response(request, _qr_payload(qr_code_id, doc.to_dict().get("owner_email")), v)
+
 @router.get("/{qr_code_id}")
 def get_item(qr_code_id: str):
     doc = db.collection("items").document(qr_code_id).get()
@@ -276,38 +389,61 @@ class ItemStatusUpdate(BaseModel):
 @router.patch("/status")
 def update_item_status(payload: ItemStatusUpdate):
     ref = db.collection("items").document(payload.qr_code_id)
-    if not ref.get().exists:
+    doc = ref.get()
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Item not found")
     try:
-        ref.update({"status": payload.status})
+        item = doc.to_dict() or {}
+        owner = item.get("owner_email")
+        batch = db.batch()
+        batch.update(ref, {"status": payload.status})
+        item_events.record(batch, db, item_events.STATUS, payload.qr_code_id, owner, payload.status,
+                           previous=item, businesses=business_stats.item_holders(item))
+        batch.commit()
         return {"message": "Status updated", "qr_code_id": payload.qr_code_id, "status": payload.status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Pickup/Dropoff endpoints ---
 
-@router.post("/pickup/{qr_code_id}/{tourist_email}")
-def pickup_item(qr_code_id: str, tourist_email: str):
-    tourist_doc = db.collection("tourists").document(tourist_email).get()
-    if not tourist_doc.exists:
-        return {"error": "Tourist not found"}
-    tourist = tourist_doc.to_dict()
+class _PickupRejected(Exception):
+    """The item cannot be claimed; aborts the pickup transaction."""
 
-    item_doc = db.collection("items").document(qr_code_id).get()
-    if not item_doc.exists:
-        return {"error": "Item not found"}
-    item = item_doc.to_dict()
 
+@router.post("/pickup/{qr_code_id}/{tourist_email}")
+def pickup_item(qr_code_id: str, tourist_email: str):
+    item_ref = db.collection("items").document(qr_code_id)
     cost = 5
-    if tourist["points"] < cost:
+    # Business holder per previous owner; only items older than owner_business_id need a lookup, done once across retries
+    holders: Dict[str, Dict[str, str]] = {}
+
+    def _claim_item(transaction):
+        # Read through the transaction: a concurrent pickup of the same item retries and sees it taken
+        item_doc = item_ref.get(transaction=transaction)
+        if not item_doc.exists:
+            raise _PickupRejected("Item not found")
+        item = item_doc.to_dict() or {}
+        if item.get("status") != "available":
+            raise _PickupRejected("Item is not available")
+        owner = item.get("owner_email")
+        if owner not in holders:
+            holders[owner] = business_stats.item_holders(item, available_only=True)
+        transaction.update(item_ref, {"status": "unavailable", "owner_email": tourist_email, business_stats.OWNER_BUSINESS_FIELD: None})
+        item_events.record(transaction, db, item_events.PICKUP, qr_code_id, tourist_email, "unavailable",
+                           previous=item, actor=tourist_email, businesses=holders[owner])
+
+    # Item check, balance check, debit, ledger entry, item hand-over and its event commit in one transaction
+    try:
+        remaining = points.debit("tourists", tourist_email, cost, "pickup", qr_code_id, also=_claim_item)
+    except _PickupRejected as e:
+        return {"error": str(e)}
+    except LookupError:
+        return {"error": "Tourist not found"}
+    except points.InsufficientPoints:
         return {"error": "Not enough points to pick up item"}
+    spatial_index.remove_item(qr_code_id)
 
-    db.collection("tourists").document(tourist_email).update({"points": tourist["points"] - cost})
-    db.collection("items").document(qr_code_id).update({"status": "unavailable", "owner_email": tourist_email})
-
-    return {"message": f"{tourist_email} picked up {qr_code_id}", "remaining_points": tourist["points"] - cost}
-
-
+    return {"message": f"{tourist_email} picked up {qr_code_id}", "remaining_points": remaining}
 
 
 @router.post("/dropoff/{qr_code_id}/{business_email}")
@@ -322,15 +458,23 @@ def dropoff_item(qr_code_id: str, business_email: str):
         return {"error": "Item not found"}
     item = item_doc.to_dict()
 
+    batch = db.batch()
     owner_email = item.get("owner_email")
     if owner_email:
         owner_doc = db.collection("tourists").document(owner_email).get()
         if owner_doc.exists:
-            points_awarded = 10
-            new_points = owner_doc.to_dict()["points"] + points_awarded
-            db.collection("tourists").document(owner_email).update({"points": new_points})
-
-    db.collection("items").document(qr_code_id).update({"status": "available", "owner_email": business_email})
+            points.add_credit(batch, db, "tourists", owner_email, 10, "dropoff", qr_code_id)
+
+    batch.update(db.collection("items").document(qr_code_id), {
+        "status": "available", "owner_email": business_email, business_stats.OWNER_BUSINESS_FIELD: business_email,
+    })
+    # Usually held by a tourist: no business lookup unless the item was available
+    holders = business_stats.item_holders(item, available_only=True)
+    holders[business_email] = business_email
+    item_events.record(batch, db, item_events.DROPOFF, qr_code_id, business_email, "available",
+                       previous=item, actor=business_email, businesses=holders)
+    batch.commit()
+    spatial_index.index_item(qr_code_id, business)
 
     return {"message": f"{qr_code_id} dropped off at {business_email}"}
 
@@ -338,9 +482,17 @@ def dropoff_item(qr_code_id: str, business_email: str):
 @router.delete("/item/{qr_code_id}")
 def delete_item(qr_code_id: str, logged_in_uid: str = Depends(verify_token)):
     doc_ref = db.collection("items").document(qr_code_id)
-    if not doc_ref.get().exists:
+    doc = doc_ref.get()
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Item not found")
-    doc_ref.delete()
+    item = doc.to_dict() or {}
+    # The delete and its event (which takes the item out of its holder's counts) commit together
+    batch = db.batch()
+    batch.delete(doc_ref)
+    item_events.record(batch, db, item_events.DELETED, qr_code_id, None, item_events.DELETED_STATUS,
+                       previous=item, actor=logged_in_uid, businesses=business_stats.item_holders(item))
+    batch.commit()
+    spatial_index.remove_item(qr_code_id)
     return {"message": f"Item {qr_code_id} deleted successfully"}
 
 @router.patch("/")
@@ -349,43 +501,47 @@ async def update_item_details(
     description: str = Form(...),
     owner_email: str = Form(...),
     file: Optional[UploadFile] = File(None),
+    defer_upload: bool = Form(False),
+    background_tasks: BackgroundTasks = None,
 ):
     """
     Update an existing item (matched by qr_code_id):
     - Set description to provided description
     - Upload provided image file to Cloudinary and store its URL
+      (with defer_upload, in the background after responding; image_status tracks it)
     - Set owner_email to the selected business' email
     Returns updated fields.
     """
 
-    # Ensure the item exists
-    item_ref = db.collection("items").document(qr_code_id)
-    item_doc = item_ref.get()
+    # Ensure the item exists and the new owner is a known business (independent reads, run concurrently)
+    item_ref = adb.collection("items").document(qr_code_id)
+
+    async def _business_doc():
+        # Doc id may be the UID with the email stored in the field; the alias index knows both
+        doc_id = await aliases.resolve_async("businesses", owner_email)
+        return await adb.collection("businesses").document(doc_id).get() if doc_id else None
+
+    item_doc, biz_doc = await asyncio.gather(item_ref.get(), _business_doc())
     if not item_doc.exists:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    # Ensure the new owner is a known business
-    biz_doc = db.collection("businesses").document(owner_email).get()
-    if not biz_doc.exists:
-        # Also support lookups where the Firestore doc id is UID and email is stored in the field
-        q = db.collection("businesses").where("email", "==", owner_email).limit(1)
-        matches = list(q.stream())
-        if matches:
-            # Use the matched document reference as owner
-            pass
-        else:
-            raise HTTPException(status_code=404, detail="Selected business not found")
+    if biz_doc is None or not biz_doc.exists:
+        raise HTTPException(status_code=404, detail="Selected business not found")
 
     image_url: Optional[str] = None
+    pending_upload = None
     if file is not None:
         try:
             file_content = await file.read()
             # Prefer a deterministic public_id so subsequent updates replace the old asset
             public_id = qr_code_id
-            result = upload_file(file_content, public_id, folder="items")
-            image_url = result.get("secure_url")
-            if not image_url:
-                raise Exception("Cloudinary upload returned no secure_url")
+            if defer_upload:
+                pending_upload = (file_content, public_id)
+            else:
+                result = await upload_file(file_content, public_id, folder="items")
+                image_url = result.get("secure_url")
+                if not image_url:
+                    raise Exception("Cloudinary upload returned no secure_url")
         except Exception as e:
             print("Cloudinary upload failed:", e)
             raise HTTPException(status_code=400, detail=str(e) if isinstance(e, RuntimeError) else "Image upload failed")
@@ -393,15 +549,30 @@ async def update_item_details(
     update_data: Dict[str, Any] = {
         "description": description,
         "owner_email": owner_email,
+        business_stats.OWNER_BUSINESS_FIELD: biz_doc.id,
     }
     # For compatibility with different consumers, store under both keys
     if image_url:
         update_data["image_url"] = image_url
         update_data["image_link"] = image_url
+    if pending_upload:
+        update_data["image_status"] = "pending"
 
     try:
-        item_ref.update(update_data)
-        updated = item_ref.get().to_dict()
+        item = item_doc.to_dict() or {}
+        batch = adb.batch()
+        batch.update(item_ref, update_data)
+        if item.get("owner_email") != owner_email:
+            # Reassigned without a pickup/dropoff: move it between the holders' counts
+            holders = await business_stats.item_holders_async(item)
+            holders[owner_email] = biz_doc.id
+            item_events.record(batch, adb, item_events.TRANSFER, qr_code_id, owner_email, item.get("status"),
+                               previous=item, businesses=holders)
+        await batch.commit()
+        if pending_upload:
+            background_tasks.add_task(upload_and_patch, *pending_upload, "items", item_ref, ("image_url", "image_link"))
+        spatial_index.index_item(qr_code_id, biz_doc.to_dict())
+        updated = (await item_ref.get()).to_dict()
         return {
             "message": "Item updated successfully",
             "qr_code_id": qr_code_id,
@@ -1,53 +1,77 @@
-from fastapi import APIRouter, HTTPException, Header, Depends
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 from db.firestore_auth import auth
 from db.firestore_client import db
+from deps import verify_firebase_token
+from services import points
+from services.roles import role_from_claims, set_role_claims
 
 router = APIRouter(prefix="/login", tags=["Login"])
 
-# Dependency to verify Firebase ID token
-def verify_token(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid token format")
-    token = authorization.split(" ")[1]
+# Dependency returning the caller's uid from a verified Firebase ID token
+def verify_token(decoded_token: Dict = Depends(verify_firebase_token)) -> str:
+    return decoded_token["uid"]
 
-    try:
-        decoded_token = auth.verify_id_token(token)
-        uid = decoded_token["uid"]
-        return uid
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+def _profile_data(doc):
+    """Profile dict with the full points balance (unfolded shards included)."""
+    data = doc.to_dict()
+    points.include_shards(doc.reference.parent.id, {doc.id: data})
+    return data
 
-@router.get("/profile")
-def get_profile(uid: str = Depends(verify_token)):
-    """Return the caller's role and profile.
+def _probe_profile(uid: str, email: Optional[str]):
+    """Find the caller's profile document without role claims.
     Preference: business > retailer > tourist when multiple exist.
-    """
+    Returns (role, document snapshot) or (None, None)."""
     # Business (by uid doc id)
     doc = db.collection("businesses").document(uid).get()
     if doc.exists:
-        return {"role": "business", "profile": doc.to_dict()}
+        return "business", doc
 
-    # Retailer (by email)
-    try:
-        user_record = auth.get_user(uid)
-        email = user_record.email if user_record else None
-        if email:
-            # Some older business docs may be keyed by email — prefer business role if found
-            legacy_biz = db.collection("businesses").document(email).get()
-            if legacy_biz.exists:
-                return {"role": "business", "profile": legacy_biz.to_dict()}
-
-            q = db.collection("retailers").where("email", "==", email).limit(1)
-            results = list(q.stream())
-            if results:
-                return {"role": "retailer", "profile": results[0].to_dict()}
-    except Exception:
-        pass
+    if email:
+        # Some older business docs may be keyed by email — prefer business role if found
+        legacy_biz = db.collection("businesses").document(email).get()
+        if legacy_biz.exists:
+            return "business", legacy_biz
+
+        # Retailer (by email)
+        results = list(db.collection("retailers").where("email", "==", email).limit(1).stream())
+        if results:
+            return "retailer", results[0]
 
     # Tourist (by uid)
     doc = db.collection("tourists").document(uid).get()
     if doc.exists:
-        return {"role": "tourist", "profile": doc.to_dict()}
+        return "tourist", doc
 
-    raise HTTPException(status_code=404, detail="User not found")
+    return None, None
 
+@router.get("/profile")
+def get_profile(
+    decoded_token: Dict = Depends(verify_firebase_token),
+    include_profile: bool = Query(True, description="false: return only the role (no Firestore read when the token carries role claims)"),
+):
+    """Return the caller's role and profile.
+    Tokens carrying role claims are answered with one document read (none with
+    include_profile=false). Older tokens fall back to probing the profile
+    collections, and the claims are then stored so the next token has them.
+    """
+    uid = decoded_token["uid"]
+    claimed = role_from_claims(decoded_token)
+    if claimed:
+        if not include_profile:
+            return {"role": claimed["role"]}
+        doc = db.document(claimed["profile_path"]).get()
+        if doc.exists:
+            return {"role": claimed["role"], "profile": _profile_data(doc)}
+
+    role, doc = _probe_profile(uid, decoded_token.get("email"))
+    if role is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        existing = auth.get_user(uid).custom_claims
+    except Exception:
+        existing = None
+    set_role_claims(uid, role, doc.id, existing)
+    if not include_profile:
+        return {"role": role}
+    return {"role": role, "profile": _profile_data(doc)}
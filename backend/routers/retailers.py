@@ -1,46 +1,56 @@
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form, Depends
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form, Depends, Body, Request, Response, BackgroundTasks
 from typing import List, Dict, Any, Optional
-from models.retailer import Retailer, RetailerCreate
+from models.retailer import Retailer, RetailerCreate, BulkRetailItemsCreate
 from routers.login import verify_token
-from db.firestore_client import db
+from db.firestore_client import db, adb, transactional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from db.firestore_auth import auth
-from passlib.context import CryptContext
-from geopy.geocoders import Nominatim
-from math import radians, sin, cos, asin, sqrt
-import io
-import qrcode
-import base64
+import asyncio
+import json
+import shutil
+import tempfile
 import uuid
-from db.cloudinary_client import upload_file
+from db.cloudinary_client import upload_file, upload_and_patch
+from services import aliases, business_stats, catalog_import, item_events, points, spatial_index
+from services.geocoding import geocode_address, location_fields
+from services.pagination import NEXT_CURSOR_HEADER, PageParams, paginate
+from services.labels import label_sheet_pdf, label_zip_stream
+from services.qr import png_response, qr_url
+from services.roles import set_role_claims
 
 router = APIRouter(prefix="/retailers", tags=["Retailers"])
 
-pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
-_geocoder = Nominatim(user_agent="newhacks2025-backend")
+_pwd_context = None
+
+
+def _get_pwd_context():
+    """The password hasher; passlib (and bcrypt) load on the first login or signup."""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
+    return _pwd_context
+
+# Firestore allows at most 500 writes per batch
+_BATCH_WRITE_LIMIT = 500
+# Namespace of the item ids derived from a bulk create idempotency key
+_BULK_ID_NAMESPACE = uuid.UUID("2b7d4b8e-6f0c-4a57-9d1e-3c5a8e2f7b64")
+# Catalog uploads larger than this are spooled to disk
+_IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
 
 # ----------------------------
 # Helper functions
 # ----------------------------
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _get_pwd_context().verify(plain_password, hashed_password)
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon, dlat = lon2 - lon1, lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
-    return 2 * 6371 * asin(sqrt(a))
-
-def _geocode_address(address: str) -> Optional[Dict[str, float]]:
-    try:
-        loc = _geocoder.geocode(address, timeout=10)
-        if not loc:
-            return None
-        return {"lat": loc.latitude, "lng": loc.longitude}
-    except Exception:
-        return None
+def _qr_url(qr_code_id: str) -> str:
+    return qr_url(f"/retailers/item/{qr_code_id}/qr.png", {"qr_code_id": qr_code_id})
 
 # ----------------------------
 # Registration & Login
@@ -73,14 +83,19 @@ def register_retailer(retailer: RetailerCreate):
 
     # Save retailer profile document (keyed by email; include uid and role for consistency)
     try:
-        doc_ref.set({
+        retailer_doc = {
             "name": retailer.name,
             "email": retailer.email,
             "address": retailer.address,
             "points": 0,
             "uid": user_record.uid,
             "role": "retailer",
-        })
+        }
+        retailer_doc.update(location_fields(retailer.address))
+        doc_ref.set(retailer_doc)
+        spatial_index.index_owner("retailers", retailer.email, retailer_doc)
+        aliases.register_aliases("retailers", retailer.email, retailer_doc)
+        set_role_claims(user_record.uid, "retailer", retailer.email)
     except Exception:
         # Best-effort rollback of the auth user if Firestore write fails
         try:
@@ -94,37 +109,62 @@ def register_retailer(retailer: RetailerCreate):
 @router.delete("/{retailer_email}")
 def delete_retailer(retailer_email: str, logged_in_uid: str = Depends(verify_token)):
     doc_ref = db.collection("retailers").document(retailer_email)
-    if not doc_ref.get().exists:
+    doc = doc_ref.get()
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Retailer not found")
     doc_ref.delete()
+    aliases.unregister_aliases("retailers", retailer_email, doc.to_dict())
+    spatial_index.remove_owner("retailers", retailer_email)
     return {"message": f"Retailer {retailer_email} deleted successfully"}
 
+@router.patch("/{retailer_email}/address")
+def update_retailer_address(
+    retailer_email: str,
+    address: str = Body(..., embed=True),
+    logged_in_uid: str = Depends(verify_token),
+):
+    """Change a retailer address and re-geocode its stored coordinates."""
+    doc_ref = db.collection("retailers").document(retailer_email)
+    if not doc_ref.get().exists:
+        raise HTTPException(status_code=404, detail="Retailer not found")
+    update = {"address": address, "lat": None, "lng": None, "geohash": None, "geocoded_address": None}
+    update.update(location_fields(address))
+    doc_ref.update(update)
+    spatial_index.index_owner("retailers", retailer_email, doc_ref.get().to_dict())
+    return {"message": "Retailer address updated", "retailer_email": retailer_email, "location": update}
+
 # ----------------------------
 # Nearby retailers
 # ----------------------------
 @router.get("/nearby")
-def retailers_nearby(address: str = Query(...), limit: int = Query(20, ge=1, le=100)) -> List[Dict[str, Any]]:
-    origin = _geocode_address(address)
+def retailers_nearby(
+    response: Response,
+    address: str = Query(...),
+    limit: int = Query(20, ge=1, le=100),
+    radius_km: Optional[float] = Query(None, gt=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+) -> List[Dict[str, Any]]:
+    origin = geocode_address(address)
     if not origin:
         return []
 
-    results = []
-    for doc in db.collection("retailers").stream():
-        r = doc.to_dict()
-        coords = _geocode_address(r["address"])
-        if not coords:
-            continue
-        dist_km = _haversine_km(origin["lat"], origin["lng"], coords["lat"], coords["lng"])
-        results.append({
-            "id": r["email"],
-            "name": r["name"],
-            "address": r["address"],
-            "points": r["points"],
-            "distance_km": round(dist_km, 2)
-        })
-
-    results.sort(key=lambda x: x["distance_km"])
-    return results[:limit]
+    # Coordinates are written at registration / by the backfill job; never geocode here
+    hits = spatial_index.get_index("retailers").nearest(
+        origin["lat"], origin["lng"], limit, radius_km=radius_km, after=spatial_index.parse_hit_cursor(cursor)
+    )
+    if len(hits) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = spatial_index.hit_cursor(hits[-1])
+
+    return [
+        {
+            "id": hit.payload["email"],
+            "name": hit.payload["name"],
+            "address": hit.payload["address"],
+            "points": hit.payload["points"],
+            "distance_km": round(hit.distance_km, 2),
+        }
+        for hit in hits
+    ]
 
 # ----------------------------
 # Create item for retailer (QR + item record)
@@ -135,28 +175,34 @@ async def create_item_for_retailer(
     description: str = Form(...),
     retailer_email: str = Form(...),
     store_id: Optional[str] = Form(None),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    defer_upload: bool = Form(False),
+    background_tasks: BackgroundTasks = None,
 ):
     """
     Allows a retailer to create a product listing.
-    - Uploads image to Cloudinary
+    - Uploads image to Cloudinary (with defer_upload, after responding; image_status tracks it)
     - Generates QR code
     - Stores in Firestore under 'retailer_items'
     """
 
     # ✅ Check retailer exists
-    retailer_doc = db.collection("retailers").document(retailer_email).get()
+    retailer_doc = await adb.collection("retailers").document(retailer_email).get()
     if not retailer_doc.exists:
         raise HTTPException(status_code=404, detail="Retailer not found")
 
     # ✅ Upload image to Cloudinary (if provided)
     image_url = None
+    pending_upload = None
     if file:
         try:
             file_content = await file.read()
             public_id = str(uuid.uuid4())
-            upload_result = upload_file(file_content, public_id, folder="retailer_items")
-            image_url = upload_result.get("secure_url")
+            if defer_upload:
+                pending_upload = (file_content, public_id)
+            else:
+                upload_result = await upload_file(file_content, public_id, folder="retailer_items")
+                image_url = upload_result.get("secure_url")
         except Exception as e:
             print("Cloudinary upload failed:", e)
             raise HTTPException(status_code=400, detail=str(e) if isinstance(e, RuntimeError) else "Image upload failed")
@@ -177,31 +223,153 @@ async def create_item_for_retailer(
     # Link this item back to the originating retail profile if provided
     if store_id:
         item_data["store_id"] = store_id
-    db.collection("retailer_items").document(qr_code_id).set(item_data)
-
-    # ✅ Generate QR code with embedded data
-    import json
-    qr_payload = {"qr_code_id": qr_code_id}
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    # Ensure valid JSON content inside QR
-    qr.add_data(json.dumps(qr_payload))
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-
-    # ✅ Convert QR code image to Base64 for frontend display
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    qr_base64 = base64.b64encode(buffered.getvalue()).decode()
-
-    return {
+    if pending_upload:
+        item_data["image_status"] = "pending"
+    # ✅ Store the item; its QR code is served from the image route
+    item_ref = adb.collection("retailer_items").document(qr_code_id)
+    await item_ref.set(item_data)
+    if pending_upload:
+        background_tasks.add_task(upload_and_patch, *pending_upload, "retailer_items", item_ref)
+
+    response = {
         "message": "Retail item created successfully",
         "qr_code_id": qr_code_id,
-        "qr_code_base64": qr_base64,
+        "qr_code_url": _qr_url(qr_code_id),
         "image_url": image_url
     }
+    if pending_upload:
+        response["image_status"] = "pending"
+    return response
+
+# ----------------------------
+# Bulk create items for retailer (printable QR labels)
+# ----------------------------
+def _bulk_item_id(payload: BulkRetailItemsCreate, number: int) -> str:
+    """Random id, or with an idempotency key one that is stable across retries."""
+    if not payload.idempotency_key:
+        return str(uuid.uuid4())
+    return str(uuid.uuid5(_BULK_ID_NAMESPACE, f"{payload.retailer_email}:{payload.idempotency_key}:{number}"))
+
+@router.post("/items/bulk")
+async def bulk_create_items_for_retailer(payload: BulkRetailItemsCreate):
+    """
+    Creates many retailer_items at once and returns their QR labels.
+    - Writes the items with batched Firestore commits (500 writes per batch), in order
+    - Renders labels on the label process pool
+    - format=pdf: one multi-page label sheet; format=zip: one PNG per label, streamed
+    The number of created items is returned in the X-Created-Count header.
+    With an idempotency_key the item ids are derived from it, so retrying a
+    failed request rewrites the same items instead of duplicating them. If a
+    batch fails, the 500 response lists the ids of the batches already written.
+    """
+    retailer_doc = await adb.collection("retailers").document(payload.retailer_email).get()
+    if not retailer_doc.exists:
+        raise HTTPException(status_code=404, detail="Retailer not found")
+
+    labels = []
+    batches = []
+    for start in range(0, len(payload.items), _BATCH_WRITE_LIMIT):
+        batch = adb.batch()
+        for number, entry in enumerate(payload.items[start:start + _BATCH_WRITE_LIMIT], start=start):
+            qr_code_id = _bulk_item_id(payload, number)
+            item_data = {
+                "name": entry.name,
+                "description": entry.description,
+                "qr_code_id": qr_code_id,
+                "owner_email": payload.retailer_email,
+                "status": "available",
+                "image_url": None,
+                "created_by": "retailer",
+            }
+            if payload.store_id:
+                item_data["store_id"] = payload.store_id
+            batch.set(adb.collection("retailer_items").document(qr_code_id), item_data)
+            labels.append((qr_code_id, entry.name))
+        batches.append((batch, len(labels)))
+
+    # Sequential commits: a failure leaves a known prefix of the items written
+    written = 0
+    for batch, end in batches:
+        try:
+            await batch.commit()
+        except Exception as e:
+            print("Bulk item batch commit failed:", e)
+            raise HTTPException(status_code=500, detail={
+                "message": "Bulk create failed; only the listed items were created",
+                "created": [qr_code_id for qr_code_id, _ in labels[:written]],
+                "idempotency_key": payload.idempotency_key,
+            })
+        written = end
+
+    headers = {"X-Created-Count": str(len(labels))}
+    if payload.format == "zip":
+        headers["Content-Disposition"] = 'attachment; filename="qr-labels.zip"'
+        return StreamingResponse(label_zip_stream(labels), media_type="application/zip", headers=headers)
+    pdf = await label_sheet_pdf(labels)
+    headers["Content-Disposition"] = 'attachment; filename="qr-labels.pdf"'
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+# ----------------------------
+# Bulk catalog import (CSV / JSONL)
+# ----------------------------
+def _spool(upload: UploadFile):
+    """Copy an upload to a temp file owned by the import, so it outlives the
+    request body while results are streamed."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=_IMPORT_SPOOL_BYTES)
+    shutil.copyfileobj(upload.file, spooled)
+    spooled.seek(0)
+    return spooled
+
+@router.post("/items/import")
+async def import_retailer_catalog(
+    retailer_email: str = Form(...),
+    file: UploadFile = File(..., description="CSV with a header row, or JSONL; columns name, description, image_url, image, sku"),
+    images: Optional[UploadFile] = File(None, description="ZIP with the files named in the 'image' column"),
+    store_id: Optional[str] = Form(None),
+    import_id: Optional[str] = Form(None, description="Resume a previous import"),
+    format: Optional[str] = Form(None, pattern="^(csv|jsonl)$"),
+):
+    """
+    Imports a retailer catalog into retailer_items.
+    - Rows are validated and written in chunks (one 500-write batch each)
+    - Images are fetched from image_url or read from the ZIP and uploaded with bounded concurrency
+    - Responds with NDJSON: one result per row (created / invalid / skipped), then a summary
+    - Re-posting the same file with the X-Import-Id of an interrupted import resumes it
+    """
+    retailer_doc = await adb.collection("retailers").document(retailer_email).get()
+    if not retailer_doc.exists:
+        raise HTTPException(status_code=404, detail="Retailer not found")
+
+    import_id = import_id or str(uuid.uuid4())
+    try:
+        state = await catalog_import.start(import_id, retailer_email, store_id, file.filename)
+    except catalog_import.ImportConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    source = await run_in_threadpool(_spool, file)
+    archive = await run_in_threadpool(_spool, images) if images else None
+
+    async def _lines():
+        try:
+            async for result in catalog_import.run(state, source, catalog_import.detect_format(file.filename, format), archive):
+                yield json.dumps(result, separators=(",", ":")) + "\n"
+        finally:
+            source.close()
+            if archive is not None:
+                archive.close()
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson", headers={"X-Import-Id": import_id})
+
+@router.get("/items/import/{import_id}")
+def get_catalog_import(import_id: str):
+    """Progress of a catalog import (rows_committed is the resume point)."""
+    doc = db.collection(catalog_import.IMPORT_COLLECTION).document(import_id).get()
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return doc.to_dict()
 
 # ----------------------------
-# Get a retail item by QR and include QR image (base64)
+# Get a retail item by QR and the URL of its QR image
 # ----------------------------
 @router.get("/item/{qr_code_id}")
 def get_retail_item(qr_code_id: str):
@@ -210,37 +378,30 @@ def get_retail_item(qr_code_id: str):
         raise HTTPException(status_code=404, detail="Retail item not found")
     item = doc.to_dict()
 
-    # Generate QR image (base64) on the fly for re-display/printing
-    try:
-        import json
-        qr_payload = {"qr_code_id": qr_code_id}
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(json.dumps(qr_payload))
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        qr_base64 = base64.b64encode(buf.getvalue()).decode()
-    except Exception as e:
-        print("QR generation failed:", e)
-        qr_base64 = None
-
     return {
         "item": item,
         "qr_code_id": qr_code_id,
-        "qr_code_base64": qr_base64,
+        "qr_code_url": _qr_url(qr_code_id),
     }
 
+@router.get("/item/{qr_code_id}/qr.png")
+def get_retail_item_qr(qr_code_id: str, request: Request, v: Optional[str] = None):
+    """QR code PNG for re-display/printing. The payload only depends on the id,
+    so no Firestore read is needed; versioned URLs are cached as immutable."""
+    return png_response(request, {"qr_code_id": qr_code_id}, v)
+
 # ----------------------------
 # List items created from a retail profile
 # ----------------------------
 @router.get("/profile/{store_id}/items")
-def list_items_for_profile(store_id: str):
-    """List all retailer_items that were created from the given retail profile (by store_id)."""
+def list_items_for_profile(store_id: str, response: Response, page: PageParams = Depends()):
+    """List retailer_items that were created from the given retail profile (by store_id), one page at a time."""
     try:
         q = db.collection("retailer_items").where("store_id", "==", store_id)
-        items = [doc.to_dict() for doc in q.stream()]
+        items = [doc.to_dict() for doc in paginate(q, response, page)]
         return items
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 # ----------------------------
@@ -248,30 +409,50 @@ def list_items_for_profile(store_id: str):
 # ----------------------------
 @router.post("/scan_item_qr")
 def scan_item_qr(qr_code_id: str, scanner_email: str):
-    item_doc = db.collection("items").document(qr_code_id).get()
-    if not item_doc.exists:
-        raise HTTPException(status_code=404, detail="Item not found")
-    item = item_doc.to_dict()
-    if item["status"] != "available":
-        raise HTTPException(status_code=400, detail="Item not available")
-
-    # Award points to original business
-    business_email = item.get("original_business_email")
-    if business_email:
-        business_doc = db.collection("businesses").document(business_email).get()
-        if business_doc.exists:
-            new_points = business_doc.to_dict()["points"] + 1
-            db.collection("businesses").document(business_email).update({"points": new_points})
-
-    # Award points to scanner retailer
+    item_ref = db.collection("items").document(qr_code_id)
+    # The scanner is only credited (an increment), so it is read outside the transaction
     scanner_doc = db.collection("retailers").document(scanner_email).get()
     if not scanner_doc.exists:
         raise HTTPException(status_code=404, detail="Retailer not found")
-    scanner_points = scanner_doc.to_dict()["points"] + 1
-    db.collection("retailers").document(scanner_email).update({"points": scanner_points})
+    # Looked up once across transaction retries
+    businesses: Dict[str, bool] = {}
+    holders: Dict[str, Dict[str, str]] = {}
+
+    @transactional
+    def _scan(transaction):
+        # Read through the transaction: a concurrent scan of the same item retries and sees it taken
+        item_doc = item_ref.get(transaction=transaction)
+        if not item_doc.exists:
+            raise HTTPException(status_code=404, detail="Item not found")
+        item = item_doc.to_dict()
+        if item["status"] != "available":
+            raise HTTPException(status_code=400, detail="Item not available")
+        business_email = item.get("original_business_email")
+        if business_email and business_email not in businesses:
+            businesses[business_email] = db.collection("businesses").document(business_email).get().exists
+        owner = item.get("owner_email")
+        if owner not in holders:
+            holders[owner] = business_stats.item_holders(item, available_only=True)
+
+        # Award points to scanner retailer
+        points.add_credit(transaction, db, "retailers", scanner_email, 1, "scan", qr_code_id)
+        # Award points to original business (a hot account: credited through sharded counters)
+        if businesses.get(business_email):
+            points.add_credit(transaction, db, "businesses", business_email, 1, "scan", qr_code_id)
+            business_stats.stage(transaction, db, business_email, points=1)
+
+        # Update item ownership; points, ledger entries, ownership and the scan event commit together
+        transaction.update(item_ref, {
+            "owner_email": scanner_email, "status": "unavailable", business_stats.OWNER_BUSINESS_FIELD: None,
+        })
+        item_events.record(transaction, db, item_events.SCAN, qr_code_id, scanner_email, "unavailable",
+                           previous=item, actor=scanner_email, businesses=holders[owner])
 
-    # Update item ownership
-    db.collection("items").document(qr_code_id).update({"owner_email": scanner_email, "status": "unavailable"})
+    # Item check, credits, hand-over and its event commit in one transaction
+    _scan(db.transaction())
+    spatial_index.remove_item(qr_code_id)
+    # Balance as of this scan (the increment itself is applied server-side)
+    scanner_points = int(scanner_doc.to_dict().get("points", 0) or 0) + 1
 
     # Return QR code ID so frontend can display it
     return {
@@ -291,48 +472,61 @@ def delete_retail_item(qr_code_id: str, logged_in_uid: str = Depends(verify_toke
 
 
 @router.get("/profiles")
-def list_retail_profiles(email: str = Query(...)):
-    """List retail profiles owned by the given retailer email."""
+def list_retail_profiles(response: Response, email: str = Query(...), page: PageParams = Depends()):
+    """List retail profiles owned by the given retailer email, one page at a time."""
     q = db.collection("retail_profiles").where("retailer_email", "==", email)
-    return [doc.to_dict() for doc in q.stream()]
+    return [doc.to_dict() for doc in paginate(q, response, page)]
 
 @router.post("/profiles")
 async def create_retail_profile(
     name: str = Form(...),
     description: str = Form(...),
     image: Optional[UploadFile] = File(None),
+    defer_upload: bool = Form(False),
+    background_tasks: BackgroundTasks = None,
     uid: str = Depends(verify_token),
 ):
     """Create a retail profile for the logged-in retailer.
     - Derives retailer email from Firebase uid
     - Uploads image to Cloudinary and stores the URL
+      (with defer_upload, after responding; image_status tracks it)
     - Stores profile under 'retail_profiles'
     """
-    # Resolve caller's email from uid
-    try:
-        user_record = auth.get_user(uid)
-        retailer_email = user_record.email
-    except Exception:
-        retailer_email = None
+    # Resolve caller's email from uid (firebase_admin is blocking, keep it off the event loop);
+    # the uid-field fallback lookup does not depend on it and runs concurrently
+    async def _caller_email() -> Optional[str]:
+        try:
+            user_record = await run_in_threadpool(auth.get_user, uid)
+            return user_record.email
+        except Exception:
+            return None
+
+    retailer_email, uid_matches = await asyncio.gather(
+        _caller_email(),
+        adb.collection("retailers").where("uid", "==", uid).limit(1).get(),
+    )
     if not retailer_email:
         raise HTTPException(status_code=400, detail="Could not resolve retailer email")
 
     # Ensure retailer exists
-    retailer_doc = db.collection("retailers").document(retailer_email).get()
+    retailer_doc = await adb.collection("retailers").document(retailer_email).get()
     if not retailer_doc.exists:
-        # Fallback: try lookup by uid field
-        matches = list(db.collection("retailers").where("uid", "==", uid).limit(1).stream())
-        if not matches:
+        # Fallback: lookup by uid field
+        if not uid_matches:
             raise HTTPException(status_code=404, detail="Retailer not found")
 
     # Upload image (optional)
     image_url = None
+    pending_upload = None
     if image is not None:
         try:
             content = await image.read()
             public_id = str(uuid.uuid4())
-            result = upload_file(content, public_id, folder="retail_profiles")
-            image_url = result.get("secure_url")
+            if defer_upload:
+                pending_upload = (content, public_id)
+            else:
+                result = await upload_file(content, public_id, folder="retail_profiles")
+                image_url = result.get("secure_url")
         except Exception as e:
             print("Cloudinary upload failed:", e)
             raise HTTPException(status_code=400, detail=str(e) if isinstance(e, RuntimeError) else "Image upload failed")
@@ -346,7 +540,12 @@ async def create_retail_profile(
         "image_url": image_url,
         "points": 0,
     }
-    db.collection("retail_profiles").document(store_id).set(data)
+    if pending_upload:
+        data["image_status"] = "pending"
+    profile_ref = adb.collection("retail_profiles").document(store_id)
+    await profile_ref.set(data)
+    if pending_upload:
+        background_tasks.add_task(upload_and_patch, *pending_upload, "retail_profiles", profile_ref)
     return {"message": "Retail profile created successfully", "store_id": store_id, "profile": data}
 
 @router.delete("/profile/{store_id}")
@@ -1,43 +1,41 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from models.tourist import Tourist
 from models.tourist import TouristCreate
 from routers.login import verify_token
 from db.firestore_client import db
 from db.firestore_auth import auth
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from firebase_admin import auth as firebase_auth
+from services.export import ndjson_response
+from services.pagination import PageParams, paginate
+from services import aliases
+from services.roles import set_role_claims
 
 router = APIRouter(prefix="/tourists", tags=["Tourists"])
 
-security = HTTPBearer()
-
 # Create a tourist
 @router.post("/")
 def create_tourist(tourist: Tourist):
     doc_ref = db.collection("tourists").document(tourist.email)  # UID = email
     doc_ref.set(tourist.model_dump())
+    aliases.register_aliases("tourists", doc_ref.id, tourist.model_dump())
     return {"message": "Tourist created", "tourist": tourist}
 
 @router.get("/profile")
-def get_my_profile(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def get_my_profile(uid: str = Depends(verify_token)):
     """
-    Verify Firebase ID token and return the logged-in tourist's Firestore profile.
+    Return the logged-in tourist's Firestore profile (token verified by verify_token).
     """
-    id_token = credentials.credentials
-    try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
-        uid = decoded_token["uid"]
-        doc = db.collection("tourists").document(uid).get()
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Tourist not found")
-        return doc.to_dict()
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
-    
+    doc = db.collection("tourists").document(uid).get()
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Tourist not found")
+    return doc.to_dict()
+
 # List all tourists
 @router.get("/")
-def list_tourists():
-    docs = db.collection("tourists").stream()
+def list_tourists(response: Response, page: PageParams = Depends(), output: str = Query("json", alias="format", pattern="^(json|ndjson)$")):
+    """List tourists one page at a time; format=ndjson streams the whole collection."""
+    if output == "ndjson":
+        return ndjson_response(db.collection("tourists").stream(), "tourists.ndjson")
+    docs = paginate(db.collection("tourists"), response, page)
     return [doc.to_dict() for doc in docs]
 
 # Get by UID (document ID)
@@ -66,12 +64,15 @@ def register_tourist(tourist: TouristCreate):
             display_name=tourist.username
         )
         # Save additional info to Firestore
-        db.collection("tourists").document(user_record.uid).set({
+        tourist_doc = {
             "email": tourist.email,
             "name": tourist.username,
             "uid": user_record.uid,
             "points": 10
-        })
+        }
+        db.collection("tourists").document(user_record.uid).set(tourist_doc)
+        aliases.register_aliases("tourists", user_record.uid, tourist_doc)
+        set_role_claims(user_record.uid, "tourist", user_record.uid)
         return {"message": "Tourist account created", "uid": user_record.uid}
     except Exception as e:
         print("Error creating tourist:", e)
@@ -97,7 +98,9 @@ def check_login(uid: str = Depends(verify_token)):
 @router.delete("/tourist/{uid}")
 def delete_tourist(uid: str, logged_in_uid: str = Depends(verify_token)):
     doc_ref = db.collection("tourists").document(uid)
-    if not doc_ref.get().exists:
+    doc = doc_ref.get()
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Tourist not found")
     doc_ref.delete()
+    aliases.unregister_aliases("tourists", uid, doc.to_dict())
     return {"message": f"Tourist {uid} deleted successfully"}
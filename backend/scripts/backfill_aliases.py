@@ -0,0 +1,61 @@
+"""Build the identity_aliases index for existing profile documents.
+
+Streams businesses, retailers and tourists once and writes an alias for each
+document id and each uid/email field, in batched writes. Lookups of
+identifiers that are not indexed yet still fall back to probing (and record
+the alias), so running this is an optimization, not a requirement. Safe to
+re-run: alias documents are overwritten with the same content.
+
+Usage (from the backend directory):
+    python scripts/backfill_aliases.py [--collections businesses retailers tourists]
+                                       [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_client import db  # noqa: E402
+from services.aliases import ALIAS_COLLECTION, alias_document, alias_key, profile_identifiers  # noqa: E402
+
+# Firestore allows at most 500 writes per batch
+BATCH_WRITE_LIMIT = 500
+
+
+def backfill(collection: str, dry_run: bool = False) -> None:
+    # Two documents can claim the same identifier; resolve like the old probing:
+    # a document id beats a uid field, which beats an email field
+    best = {}
+    scanned = 0
+    for doc in db.collection(collection).order_by("__name__").stream():
+        scanned += 1
+        for rank, identifier in enumerate(profile_identifiers(doc.id, doc.to_dict())):
+            key = alias_key(collection, identifier)
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, doc.id)
+
+    if not dry_run:
+        keys = list(best)
+        for i in range(0, len(keys), BATCH_WRITE_LIMIT):
+            batch = db.batch()
+            for key in keys[i:i + BATCH_WRITE_LIMIT]:
+                batch.set(db.collection(ALIAS_COLLECTION).document(key), alias_document(collection, best[key][1]))
+            batch.commit()
+    print(f"[{collection}] scanned={scanned} aliases={len(best)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", nargs="+", default=["businesses", "retailers", "tourists"])
+    parser.add_argument("--dry-run", action="store_true", help="count aliases but do not write")
+    args = parser.parse_args()
+
+    for collection in args.collections:
+        backfill(collection, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Backfill lat/lng/geohash on existing business and retailer documents.
+
+Walks each collection in document-id order and geocodes any document whose
+address has no stored coordinates (or whose address changed since it was
+geocoded). Progress is checkpointed after every batch, so an interrupted run
+picks up where it stopped.
+
+Usage (from the backend directory):
+    python scripts/backfill_locations.py [--collections businesses retailers]
+                                         [--batch-size 100] [--reset] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_client import db  # noqa: E402
+from services.geocoding import location_fields, needs_geocoding  # noqa: E402
+
+CHECKPOINT_DIR = os.path.join(BASE_DIR, ".cache")
+
+
+def _checkpoint_path(collection: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"backfill_locations_{collection}.json")
+
+
+def _load_checkpoint(collection: str):
+    try:
+        with open(_checkpoint_path(collection)) as f:
+            return json.load(f).get("last_doc_id")
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(collection: str, last_doc_id: str) -> None:
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    tmp = _checkpoint_path(collection) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_doc_id": last_doc_id}, f)
+    os.replace(tmp, _checkpoint_path(collection))
+
+
+def backfill(collection: str, batch_size: int, dry_run: bool = False) -> None:
+    last_doc_id = _load_checkpoint(collection)
+    if last_doc_id:
+        print(f"[{collection}] resuming after {last_doc_id}")
+
+    scanned = updated = failed = 0
+    while True:
+        query = db.collection(collection).order_by("__name__").limit(batch_size)
+        if last_doc_id:
+            query = query.start_after({"__name__": last_doc_id})
+        docs = list(query.stream())
+        if not docs:
+            break
+
+        batch = db.batch()
+        pending = 0
+        for doc in docs:
+            scanned += 1
+            data = doc.to_dict() or {}
+            if not needs_geocoding(data):
+                continue
+            fields = location_fields(data["address"])
+            if not fields:
+                failed += 1
+                print(f"[{collection}] could not geocode {doc.id}: {data['address']!r}")
+                continue
+            batch.update(doc.reference, fields)
+            pending += 1
+
+        if pending and not dry_run:
+            batch.commit()
+        updated += pending
+        last_doc_id = docs[-1].id
+        if not dry_run:
+            _save_checkpoint(collection, last_doc_id)
+        print(f"[{collection}] scanned={scanned} updated={updated} failed={failed}")
+
+    if not dry_run:
+        # Finished cleanly: the next run starts from the beginning again
+        try:
+            os.remove(_checkpoint_path(collection))
+        except OSError:
+            pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collections", nargs="+", default=["businesses", "retailers"])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--reset", action="store_true", help="ignore saved checkpoints")
+    parser.add_argument("--dry-run", action="store_true", help="geocode but do not write")
+    args = parser.parse_args()
+
+    for collection in args.collections:
+        if args.reset:
+            try:
+                os.remove(_checkpoint_path(collection))
+            except OSError:
+                pass
+        backfill(collection, args.batch_size, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Add actor_uid / scheduled_time to existing business transactions.
+
+``GET /businesses/transactions`` filters on ``actor_uid`` and orders by
+``scheduled_time`` in Firestore; documents missing either field are not
+returned. For every business this script records the account ``uid`` on
+legacy email-keyed business documents (looked up in Firebase Auth), then fills
+both fields on its transactions in batched writes. Safe to re-run: documents
+that already have both fields are skipped.
+
+Deploy the composite index first (from the backend directory):
+    firebase deploy --only firestore:indexes   (firestore.indexes.json)
+
+Usage (from the backend directory):
+    python scripts/backfill_transaction_fields.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_auth import auth  # noqa: E402
+from db.firestore_client import db  # noqa: E402
+from services.transactions import ACTOR_FIELD, COLLECTION, SCHEDULED_FIELD, business_uid, scheduled_time  # noqa: E402
+
+# Firestore allows at most 500 writes per batch
+BATCH_WRITE_LIMIT = 500
+
+
+def _account_uid(doc) -> str:
+    data = doc.to_dict() or {}
+    uid = business_uid(doc.id, data)
+    if uid or not data.get("email"):
+        return uid
+    try:
+        return auth.get_user_by_email(data["email"]).uid
+    except Exception as e:
+        print(f"[{doc.id}] no Firebase account for {data['email']}: {e}")
+        return None
+
+
+def backfill(dry_run: bool = False) -> None:
+    businesses = updated = scanned = 0
+    batch, pending = db.batch(), 0
+    for biz in db.collection("businesses").stream():
+        businesses += 1
+        uid = _account_uid(biz)
+        if uid and not (biz.to_dict() or {}).get("uid"):
+            batch.update(biz.reference, {"uid": uid})
+            pending += 1
+        for tx in biz.reference.collection(COLLECTION).stream():
+            scanned += 1
+            data = tx.to_dict() or {}
+            if ACTOR_FIELD in data and SCHEDULED_FIELD in data:
+                continue
+            batch.update(tx.reference, {
+                ACTOR_FIELD: data.get(ACTOR_FIELD) or uid,
+                SCHEDULED_FIELD: data.get(SCHEDULED_FIELD) or scheduled_time(data.get("date"), data.get("time")),
+            })
+            pending += 1
+            updated += 1
+            if pending >= BATCH_WRITE_LIMIT - 1:
+                if not dry_run:
+                    batch.commit()
+                batch, pending = db.batch(), 0
+    if pending and not dry_run:
+        batch.commit()
+    print(f"businesses={businesses} transactions scanned={scanned} updated={updated}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count documents but do not write")
+    args = parser.parse_args()
+    backfill(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Micro-benchmark: scalar haversine loop + full sort vs. NumPy batch + argpartition.
+
+Usage (from the backend directory):
+    python scripts/bench_geo.py [--sizes 10000 100000 1000000] [--k 20] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.geo import haversine_km, haversine_km_many, k_smallest  # noqa: E402
+
+
+def _best_of(repeat, fn):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(2025)
+    origin = (43.6532, -79.3832)
+    print(f"{'points':>10} {'scalar (ms)':>12} {'numpy (ms)':>11} {'speedup':>8}")
+    for n in args.sizes:
+        lats = rng.uniform(42.0, 45.0, n)
+        lngs = rng.uniform(-81.0, -77.0, n)
+        lat_list, lng_list = lats.tolist(), lngs.tolist()
+
+        def scalar():
+            dists = [(haversine_km(origin[0], origin[1], la, ln), i) for i, (la, ln) in enumerate(zip(lat_list, lng_list))]
+            dists.sort()
+            return [i for _, i in dists[: args.k]]
+
+        def vectorized():
+            return k_smallest(haversine_km_many(origin[0], origin[1], lats, lngs), args.k).tolist()
+
+        t_scalar, top_scalar = _best_of(args.repeat, scalar)
+        t_numpy, top_numpy = _best_of(args.repeat, vectorized)
+        if top_scalar != top_numpy:
+            print(f"warning: top-{args.k} differs at n={n} (floating point ties)")
+        print(f"{n:>10} {t_scalar * 1000:>12.1f} {t_numpy * 1000:>11.1f} {t_scalar / t_numpy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""Load test of the hot endpoints against local stand-ins, with regression checks.
+
+The app runs on the in-memory (or SQLite) storage backend with local auth,
+a deterministic fake geocoder and a fake Cloudinary upload, so runs are
+repeatable and need no network or credentials. Each dataset size is seeded
+into a fresh process; every scenario is then driven at each concurrency level
+and reported as throughput and p50/p95/p99 latency.
+
+Scenarios: items_nearby (GET /items/nearby), businesses_nearby
+(GET /businesses/nearby), items_create (POST /items/create), items_pickup
+(POST /items/pickup), login_profile (GET /login/profile) and
+business_transactions (GET /businesses/transactions).
+
+Dataset size N means N items and N business transactions, spread over
+max(5, N // 50) businesses; there are as many tourists as businesses.
+A pickup takes an item out of circulation, so every items_pickup run starts
+from restocked items and picks each one up once (keep --requests <= N).
+
+Usage (from the backend directory):
+    python scripts/benchmark.py run [--sizes 1000 10000] [--concurrency 1 8 32]
+                                    [--requests 300] [--scenarios items_nearby ...]
+                                    [--storage memory|sqlite] [--transport asgi|http]
+                                    [--upload-latency-ms 50] [--output results.json]
+    python scripts/benchmark.py compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+
+``--transport asgi`` calls the app in-process (no sockets, measures the app);
+``--transport http`` serves it with uvicorn on localhost. ``compare`` exits 1
+when a scenario's throughput dropped or its p50/p95 latency grew by more than
+the threshold (latency changes under ``--min-delta-ms`` are treated as noise).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from testing.fakes import LAT_RANGE, LNG_RANGE, configure_environment, install_fakes
+
+SCENARIOS = (
+    "items_nearby",
+    "businesses_nearby",
+    "items_create",
+    "items_pickup",
+    "login_profile",
+    "business_transactions",
+)
+ADDRESS_POOL = 200
+BATCH_WRITE_LIMIT = 500
+PNG_1PX = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+# ----------------------------
+# Dataset
+# ----------------------------
+def _address(n: int) -> str:
+    return f"{n} Bench Street, Toronto"
+
+
+def seed(size: int, seed_value: int) -> Dict[str, Any]:
+    """Write the dataset through the local client, the way the registration
+    and create routes shape their documents. Returns the ids the scenarios use."""
+    from db.firestore_auth import auth
+    from db.firestore_client import db
+    from services import aliases, business_stats, transactions
+    from services.geocoding import location_fields
+    from services.roles import set_role_claims
+
+    rng = random.Random(seed_value)
+    owners = max(5, size // 50)
+    writes: List[Tuple[Any, Dict[str, Any]]] = []
+
+    businesses = []
+    for n in range(owners):
+        email = f"business{n}@bench.local"
+        user = auth.create_user(email=email, password="benchmark", display_name=f"Business {n}")
+        doc = {"name": f"Business {n}", "email": email, "points": 0, "address": _address(n), "uid": user.uid, "role": "business"}
+        doc.update(location_fields(doc["address"]))
+        writes.append((db.collection("businesses").document(user.uid), doc))
+        aliases.register_aliases("businesses", user.uid, doc)
+        set_role_claims(user.uid, "business", user.uid)
+        businesses.append({"uid": user.uid, "email": email, "doc": doc})
+
+    tourists = []
+    for n in range(owners):
+        email = f"tourist{n}@bench.local"
+        user = auth.create_user(email=email, password="benchmark", display_name=f"tourist{n}")
+        # Enough points that pickups never run dry during a run
+        doc = {"email": email, "name": f"tourist{n}", "uid": user.uid, "points": 10**9}
+        writes.append((db.collection("tourists").document(user.uid), doc))
+        aliases.register_aliases("tourists", user.uid, doc)
+        set_role_claims(user.uid, "tourist", user.uid)
+        tourists.append({"uid": user.uid, "email": email})
+
+    items = []
+    for n in range(size):
+        owner = businesses[n % owners]
+        qr_code_id = f"bench-item-{n:07d}"
+        writes.append((db.collection("items").document(qr_code_id), {
+            "name": f"Item {n}",
+            "description": "Benchmark item",
+            "qr_code_id": qr_code_id,
+            "owner_email": owner["email"],
+            business_stats.OWNER_BUSINESS_FIELD: owner["uid"],
+            "status": "available",
+            "image_url": None,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }))
+        items.append(qr_code_id)
+
+    start = datetime(2025, 1, 1, 9, 0)
+    for n in range(size):
+        owner = businesses[n % owners]
+        when = start + timedelta(minutes=37 * n + rng.randrange(30))
+        data = {
+            "name": owner["doc"]["name"],
+            "item_name": f"Item {n}",
+            "qr_code_id": items[n] if items else "",
+            "date": when.strftime("%Y-%m-%d"),
+            "time": when.strftime("%H:%M"),
+            "transaction_type": rng.choice(("Pickup", "Dropoff")),
+        }
+        data.update(transactions.query_fields(owner["uid"], owner["doc"], data["date"], data["time"]))
+        data["created_at"] = datetime.utcnow().isoformat() + "Z"
+        ref = db.collection("businesses").document(owner["uid"]).collection(transactions.COLLECTION).document()
+        writes.append((ref, data))
+
+    for offset in range(0, len(writes), BATCH_WRITE_LIMIT):
+        batch = db.batch()
+        for ref, data in writes[offset:offset + BATCH_WRITE_LIMIT]:
+            batch.set(ref, data)
+        batch.commit()
+
+    return {"businesses": businesses, "tourists": tourists, "items": items}
+
+
+def restock(data: Dict[str, Any]) -> None:
+    """Put every seeded item back on offer at its business (outside the measurement)."""
+    from db.firestore_client import db
+    from services import business_stats, spatial_index
+
+    businesses = data["businesses"]
+    for offset in range(0, len(data["items"]), BATCH_WRITE_LIMIT):
+        batch = db.batch()
+        for n, qr_code_id in enumerate(data["items"][offset:offset + BATCH_WRITE_LIMIT], start=offset):
+            owner = businesses[n % len(businesses)]
+            batch.update(db.collection("items").document(qr_code_id), {
+                "status": "available", "owner_email": owner["email"], business_stats.OWNER_BUSINESS_FIELD: owner["uid"],
+            })
+        batch.commit()
+    spatial_index.invalidate("items")
+
+
+# ----------------------------
+# Scenarios: (rng, n, dataset) -> (method, url, httpx keyword arguments)
+# ----------------------------
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+def _items_nearby(rng: random.Random, n: int, data: Dict[str, Any]) -> Request:
+    lat = rng.uniform(*LAT_RANGE)
+    lng = rng.uniform(*LNG_RANGE)
+    return "GET", "/items/nearby", {"params": {"lat": lat, "lng": lng, "limit": 20}}
+
+
+def _businesses_nearby(rng: random.Random, n: int, data: Dict[str, Any]) -> Request:
+    # A bounded pool of user addresses, as real traffic repeats; the geocode cache warms up
+    return "GET", "/businesses/nearby", {"params": {"address": f"{rng.randrange(ADDRESS_POOL)} Visitor Road, Toronto", "limit": 20}}
+
+
+def _items_create(rng: random.Random, n: int, data: Dict[str, Any]) -> Request:
+    owner = rng.choice(data["businesses"])
+    donor = rng.choice(data["tourists"])
+    form = {"name": f"Donated {n}", "description": "Benchmark donation", "owner_email": owner["email"], "donor_email": donor["email"]}
+    return "POST", "/items/create", {"data": form, "files": {"file": ("item.png", PNG_1PX, "image/png")}}
+
+
+def _items_pickup(rng: random.Random, n: int, data: Dict[str, Any]) -> Request:
+    # Tourist profiles are keyed by uid, which is what the route looks the account up by
+    item = data["items"][n % len(data["items"])]
+    tourist = rng.choice(data["tourists"])
+    return "POST", f"/items/pickup/{item}/{tourist['uid']}", {}
+
+
+def _login_profile(rng: random.Random, n: int, data: Dict[str, Any]) -> Request:
+    user = rng.choice(data["tourists"] if n % 2 else data["businesses"])
+    return "GET", "/login/profile", {"headers": {"Authorization": f"Bearer local:{user['uid']}"}}
+
+
+def _business_transactions(rng: random.Random, n: int, data: Dict[str, Any]) -> Request:
+    business = rng.choice(data["businesses"])
+    return "GET", "/businesses/transactions", {
+        "params": {"identifier": business["email"], "page_size": 20},
+        "headers": {"Authorization": f"Bearer local:{business['uid']}"},
+    }
+
+
+SCENARIO_REQUESTS: Dict[str, Callable[[random.Random, int, Dict[str, Any]], Request]] = {
+    "items_nearby": _items_nearby,
+    "businesses_nearby": _businesses_nearby,
+    "items_create": _items_create,
+    "items_pickup": _items_pickup,
+    "login_profile": _login_profile,
+    "business_transactions": _business_transactions,
+}
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), int(round(pct / 100 * len(sorted_values) + 0.5))))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    values = sorted(v * 1000 for v in latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "duration_s": round(duration, 4),
+        "throughput_rps": round(count / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(sum(values) / count, 3) if count else 0.0,
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "p99": round(percentile(values, 99), 3),
+            "max": round(values[-1], 3) if values else 0.0,
+        },
+    }
+
+
+async def drive(client, scenario: str, data: Dict[str, Any], total: int, concurrency: int, seed_value: int) -> Dict[str, Any]:
+    """Issue ``total`` requests from ``concurrency`` workers; a request counts
+    as an error on a transport failure, a 4xx/5xx status or an {"error": ...} body."""
+    make = SCENARIO_REQUESTS[scenario]
+    rng = random.Random(f"{seed_value}:{scenario}:{concurrency}")
+    requests = [make(rng, n, data) for n in range(total)]
+    latencies: List[float] = []
+    errors = 0
+    first_error: Optional[str] = None
+    cursor = iter(requests)
+
+    async def worker():
+        nonlocal errors, first_error
+        for method, url, kwargs in cursor:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+                if not failed and response.headers.get("content-type", "").startswith("application/json"):
+                    body = response.json()
+                    failed = isinstance(body, dict) and "error" in body
+                detail = f"{response.status_code} {response.text[:200]}"
+            except Exception as e:
+                failed, detail = True, repr(e)
+            latencies.append(time.perf_counter() - started)
+            if failed:
+                errors += 1
+                first_error = first_error or f"{method} {url}: {detail}"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, errors, time.perf_counter() - started)
+    if first_error:
+        result["first_error"] = first_error
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(app) -> Tuple[Any, threading.Thread, str]:
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 15
+    while not server.started:
+        if time.time() > deadline or not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def run_size(args, size: int) -> List[Dict[str, Any]]:
+    """Seed one dataset and run every scenario at every concurrency level
+    (called in a fresh process per size)."""
+    import httpx
+
+    install_fakes(args.upload_latency_ms)
+    dataset = seed(size, args.seed)
+
+    import main  # only after the environment and fakes are in place
+
+    results = []
+    server = thread = None
+    if args.transport == "http":
+        server, thread, base_url = _start_server(main.app)
+        transport = None
+    else:
+        base_url = "http://benchmark"
+        transport = httpx.ASGITransport(app=main.app)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    try:
+        async with main.app.router.lifespan_context(main.app) if transport else _nullcontext():
+            async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=60) as client:
+                for scenario in args.scenarios:
+                    for concurrency in args.concurrency:
+                        if args.warmup:
+                            if scenario == "items_pickup":
+                                restock(dataset)
+                            await drive(client, scenario, dataset, args.warmup, concurrency, args.seed + 1)
+                        if scenario == "items_pickup":
+                            restock(dataset)
+                        result = await drive(client, scenario, dataset, args.requests, concurrency, args.seed)
+                        result.update(scenario=scenario, size=size, concurrency=concurrency)
+                        results.append(result)
+                        _print_result(result)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+    return results
+
+
+class _nullcontext:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+# ----------------------------
+# Reporting
+# ----------------------------
+HEADER = f"{'scenario':<22} {'size':>7} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario']:<22} {result['size']:>7} {result['concurrency']:>5} {result['throughput_rps']:>9.1f} "
+        f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f} {result['errors']:>7}",
+        flush=True,
+    )
+    if result.get("first_error"):
+        print(f"    first error: {result['first_error']}", flush=True)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _meta(args) -> Dict[str, Any]:
+    return {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "storage": args.storage,
+        "transport": args.transport,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "upload_latency_ms": args.upload_latency_ms,
+        "seed": args.seed,
+    }
+
+
+def cmd_run(args) -> int:
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+        return 2
+
+    if args.worker:
+        # Child process: one dataset size, results as JSON on the given path
+        with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+            configure_environment(args.storage, workdir)
+            results = asyncio.run(run_size(args, args.sizes[0]))
+        with open(args.output, "w") as f:
+            json.dump(results, f)
+        return 0
+
+    print(HEADER, flush=True)
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            partial = tmp.name
+        command = [sys.executable, os.path.abspath(__file__), "run", "--worker", "--sizes", str(size), "--output", partial]
+        command += ["--concurrency", *map(str, args.concurrency), "--scenarios", *args.scenarios]
+        command += ["--requests", str(args.requests), "--warmup", str(args.warmup), "--storage", args.storage]
+        command += ["--transport", args.transport, "--upload-latency-ms", str(args.upload_latency_ms), "--seed", str(args.seed)]
+        try:
+            # Seeding and app start-up are noisy; only the result table is printed
+            completed = subprocess.run(command, cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            for line in completed.stdout.splitlines():
+                if line.startswith(SCENARIOS):
+                    print(line, flush=True)
+                elif line.startswith("    first error"):
+                    print(line, flush=True)
+            if completed.returncode != 0:
+                print(completed.stderr[-4000:])
+                print(f"Benchmark of size {size} failed (exit {completed.returncode})")
+                return completed.returncode
+            with open(partial) as f:
+                results.extend(json.load(f))
+        finally:
+            os.unlink(partial)
+
+    report = {"meta": _meta(args), "results": results}
+    output = args.output or os.path.join(BASE_DIR, ".cache", "benchmarks", f"benchmark-{datetime.utcnow():%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float, min_delta_ms: float) -> Tuple[List[str], List[str]]:
+    """Returns (report lines, regressions) for results present in both runs."""
+    def key(result):
+        return result["scenario"], result["size"], result["concurrency"]
+
+    base = {key(r): r for r in baseline["results"]}
+    lines, regressions = [], []
+    lines.append(f"{'scenario':<22} {'size':>7} {'conc':>5} {'req/s':>18} {'p50 ms':>18} {'p95 ms':>18}")
+    for result in candidate["results"]:
+        old = base.get(key(result))
+        if old is None:
+            continue
+        problems = []
+        if old["throughput_rps"] and result["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+            problems.append("throughput")
+        for pct in ("p50", "p95"):
+            before, after = old["latency_ms"][pct], result["latency_ms"][pct]
+            if after > before * (1 + threshold) and after - before >= min_delta_ms:
+                problems.append(pct)
+        if result["errors"] > old["errors"]:
+            problems.append("errors")
+
+        def change(before, after):
+            pct = (after - before) / before * 100 if before else 0.0
+            return f"{after:>8.1f} ({pct:+5.1f}%)"
+
+        line = (
+            f"{result['scenario']:<22} {result['size']:>7} {result['concurrency']:>5} "
+            f"{change(old['throughput_rps'], result['throughput_rps'])} "
+            f"{change(old['latency_ms']['p50'], result['latency_ms']['p50'])} "
+            f"{change(old['latency_ms']['p95'], result['latency_ms']['p95'])}"
+        )
+        if problems:
+            line += "  REGRESSION: " + ", ".join(problems)
+            regressions.append(f"{result['scenario']} size={result['size']} concurrency={result['concurrency']}: {', '.join(problems)}")
+        lines.append(line)
+    return lines, regressions
+
+
+def cmd_compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    for label, report in (("baseline", baseline), ("candidate", candidate)):
+        meta = report.get("meta", {})
+        print(f"{label}: {meta.get('git_revision')} {meta.get('created_at')} storage={meta.get('storage')} transport={meta.get('transport')}")
+    lines, regressions = compare(baseline, candidate, args.threshold, args.min_delta_ms)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions over {args.threshold:.0%}.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmark and write JSON results")
+    run.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000], help="Dataset sizes (items)")
+    run.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    run.add_argument("--requests", type=int, default=300, help="Measured requests per scenario and concurrency")
+    run.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before each measurement")
+    run.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    run.add_argument("--storage", choices=("memory", "sqlite"), default="memory")
+    run.add_argument("--transport", choices=("asgi", "http"), default="asgi")
+    run.add_argument("--upload-latency-ms", type=float, default=0.0, help="Simulated Cloudinary upload time")
+    run.add_argument("--seed", type=int, default=2025)
+    run.add_argument("--output", help="JSON results path (default .cache/benchmarks/benchmark-<time>.json)")
+    run.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    cmp = commands.add_parser("compare", help="Flag regressions between two result files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("candidate")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change (0.10 = 10%%)")
+    cmp.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+
+    args = parser.parse_args()
+    sys.exit(cmd_run(args) if args.command == "run" else cmd_compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Check that importing the app stays fast and lazy.
+
+Runs ``python -X importtime -c "import main"`` in fresh processes and fails
+(exit 1) when:
+
+- the best cumulative import time of ``main`` is over the budget
+  (``--budget-ms``, or ``IMPORT_TIME_BUDGET_MS``);
+- a module that must only load on first use was imported
+  (qrcode, PIL, geopy, passlib, cloudinary, firebase_admin);
+- importing ``main`` built the Firestore clients or the Firebase Admin app.
+
+The app's direct imports and the slowest modules (self time) of the best run
+are printed, so a regression points at its cause.
+
+Usage (from the backend directory):
+    python scripts/check_import_time.py [--budget-ms 2000] [--runs 5] [--top 10]
+
+The test suite runs the same check (tests/test_import_time.py).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+# Imported on first use only (see services/lifecycle.py)
+DEFERRED_MODULES = ("qrcode", "PIL", "geopy", "passlib", "cloudinary", "firebase_admin")
+
+_PROBE = """
+import json
+import main
+from db import firestore_auth, firestore_client
+print(json.dumps({"firestore": firestore_client.initialized(), "auth": firestore_auth.initialized()}))
+"""
+
+# (self us, cumulative us, depth, module)
+Entry = Tuple[int, int, int, str]
+
+
+def parse_importtime(output: str) -> List[Entry]:
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((int(fields[0]), int(fields[1]), depth, name.strip()))
+    return entries
+
+
+def measure() -> Tuple[List[Entry], Dict[str, bool]]:
+    """One import of ``main`` in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"import main failed (exit {proc.returncode})")
+    built = json.loads(proc.stdout.strip().splitlines()[-1])
+    return parse_importtime(proc.stderr), built
+
+
+def main_children(entries: List[Entry]) -> List[Entry]:
+    """Direct imports of ``main`` (they are listed before it, one level deeper)."""
+    children: List[Entry] = []
+    for entry in entries:
+        if entry[2] == 0:
+            if entry[3] == "main":
+                return children
+            children = []
+        elif entry[2] == 1:
+            children.append(entry)
+    return []
+
+
+def check(budget_ms: float = DEFAULT_BUDGET_MS, runs: int = 5) -> Tuple[float, List[Entry], List[str]]:
+    """(best cumulative ms of ``main``, entries of that run, failures) over
+    ``runs`` fresh imports; tests/test_import_time.py asserts no failures."""
+    best_ms, best_entries, built = None, [], {}
+    for _ in range(max(runs, 1)):
+        entries, built = measure()
+        total = next((cumulative for _, cumulative, depth, name in entries if depth == 0 and name == "main"), None)
+        if total is None:
+            raise SystemExit("main not found in -X importtime output")
+        if best_ms is None or total / 1000 < best_ms:
+            best_ms, best_entries = total / 1000, entries
+
+    failures = []
+    if best_ms > budget_ms:
+        failures.append(f"import main took {best_ms:.0f} ms, over the {budget_ms:.0f} ms budget")
+    loaded = {name for _, _, _, name in best_entries}
+    for module in DEFERRED_MODULES:
+        eager = sorted(name for name in loaded if name == module or name.startswith(module + "."))
+        if eager:
+            failures.append(f"{module} is imported at start-up ({eager[0]}); import it on first use")
+    for component, initialized in built.items():
+        if initialized:
+            failures.append(f"importing main built the {component} client; it must stay lazy")
+    return best_ms, best_entries, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Allowed cumulative import time of main")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh imports to take the best of")
+    parser.add_argument("--top", type=int, default=10, help="Modules to list")
+    args = parser.parse_args()
+
+    best_ms, best_entries, failures = check(args.budget_ms, args.runs)
+
+    print(f"import main: {best_ms:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print("\nDirect imports of main:")
+    for _, cumulative, _, name in sorted(main_children(best_entries), key=lambda e: -e[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print("\nSlowest modules (self time):")
+    for self_us, _, _, name in sorted(best_entries, key=lambda e: -e[0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    if failures:
+        print()
+        for failure in failures:
+            print("FAIL:", failure)
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Fold sharded point counters back into each account's ``points`` field.
+
+Credits to hot accounts (see services/points.py) land in
+``<profile>/points_shards`` documents, which every route returning a profile
+adds up on read. Run this periodically (e.g. from cron) to keep those reads
+to a few shards per account. Each account is folded in its own transaction, so the
+job is safe to run while credits keep arriving.
+
+Usage (from the backend directory):
+    python scripts/fold_point_shards.py
+"""
+
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_client import db  # noqa: E402
+from services.points import SHARDS_SUBCOLLECTION, fold_shards  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    accounts = set()
+    for shard in db.collection_group(SHARDS_SUBCOLLECTION).stream():
+        profile = shard.reference.parent.parent
+        accounts.add((profile.parent.id, profile.id))
+
+    total = 0
+    for collection, doc_id in sorted(accounts):
+        moved = fold_shards(collection, doc_id)
+        total += moved
+        if moved:
+            print(f"{collection}/{doc_id}: +{moved}")
+    print(f"accounts={len(accounts)} points_folded={total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Set role / profile_path custom claims on existing Firebase users.
+
+Accounts created before registration started writing role claims are
+resolved the same way ``/login/profile`` used to probe them (business by uid,
+business keyed by email, retailer by email, then tourist by uid), but in bulk:
+each profile collection is streamed once and every Firebase user is matched
+against the resulting maps. Users whose claims already match are skipped, so
+the script can be re-run safely. Users see the new claims once their ID token
+is refreshed (at the latest, within an hour).
+
+Usage (from the backend directory):
+    python scripts/migrate_role_claims.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_auth import auth  # noqa: E402
+from db.firestore_client import db  # noqa: E402
+from services.roles import PROFILE_PATH_CLAIM, ROLE_CLAIM, profile_path, set_role_claims  # noqa: E402
+
+
+def _index(collection: str):
+    """Document ids of one profile collection, and email -> doc id."""
+    ids, by_email = set(), {}
+    for doc in db.collection(collection).stream():
+        ids.add(doc.id)
+        email = (doc.to_dict() or {}).get("email")
+        if email:
+            by_email.setdefault(email, doc.id)
+    return ids, by_email
+
+
+def _resolve(user, businesses, retailers, tourists):
+    """Same precedence as the old get_profile probing: business > retailer > tourist."""
+    if user.uid in businesses[0]:
+        return "business", user.uid
+    if user.email and user.email in businesses[0]:
+        return "business", user.email
+    if user.email and user.email in retailers[1]:
+        return "retailer", retailers[1][user.email]
+    if user.uid in tourists[0]:
+        return "tourist", user.uid
+    return None, None
+
+
+def migrate(dry_run: bool = False) -> None:
+    businesses = _index("businesses")
+    retailers = _index("retailers")
+    tourists = _index("tourists")
+
+    scanned = updated = unchanged = unmatched = 0
+    for user in auth.list_users().iterate_all():
+        scanned += 1
+        role, doc_id = _resolve(user, businesses, retailers, tourists)
+        if role is None:
+            unmatched += 1
+            continue
+        claims = user.custom_claims or {}
+        if claims.get(ROLE_CLAIM) == role and claims.get(PROFILE_PATH_CLAIM) == profile_path(role, doc_id):
+            unchanged += 1
+            continue
+        print(f"{user.uid} ({user.email}): {role} -> {profile_path(role, doc_id)}")
+        if dry_run or set_role_claims(user.uid, role, doc_id, claims):
+            updated += 1
+
+    print(f"scanned={scanned} updated={updated} unchanged={unchanged} unmatched={unmatched}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report the claims that would be set")
+    args = parser.parse_args()
+    migrate(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
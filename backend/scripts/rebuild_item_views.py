@@ -0,0 +1,109 @@
+"""Recompute the item lifecycle views from their sources of truth.
+
+The views are normally maintained incrementally by services.item_events. This
+script rebuilds them from scratch, e.g. after items created before the event
+log existed or after manual edits:
+
+- item_stats and item_throughput_daily are replayed from item_events;
+- item_inventory is counted from the current owner/status of every item.
+
+View documents that no longer have a source are deleted. Events recorded while
+the script runs may be lost from the rebuilt views, so run it at low traffic.
+
+Usage (from the backend directory):
+    python scripts/rebuild_item_views.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from collections import Counter, defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_client import db  # noqa: E402
+from services.item_events import (  # noqa: E402
+    CIRCULATION_EVENTS,
+    COUNT_FIELDS,
+    EVENTS_COLLECTION,
+    INVENTORY_COLLECTION,
+    STATS_COLLECTION,
+    THROUGHPUT_COLLECTION,
+    holder_key,
+    throughput_doc_id,
+)
+
+# Firestore allows at most 500 writes per batch
+BATCH_WRITE_LIMIT = 500
+
+
+def _replay_events():
+    stats, throughput = {}, defaultdict(Counter)
+    for doc in db.collection(EVENTS_COLLECTION).order_by("created_at").stream():
+        event = doc.to_dict() or {}
+        event_type, qr_code_id, day = event.get("type"), event.get("qr_code_id"), event.get("day")
+        if event_type not in COUNT_FIELDS or not qr_code_id:
+            continue
+        count_field = COUNT_FIELDS[event_type]
+        row = stats.setdefault(qr_code_id, {"qr_code_id": qr_code_id, "events": 0, "circulation_count": 0})
+        row["events"] += 1
+        row[count_field] = row.get(count_field, 0) + 1
+        if event_type in CIRCULATION_EVENTS:
+            row["circulation_count"] += 1
+        row.update(holder=event.get("to_holder"), status=event.get("status"),
+                   last_event=event_type, last_event_at=event.get("created_at"))
+        if day:
+            throughput[day]["events"] += 1
+            throughput[day][count_field] += 1
+    # One shard per day; new events spread over the others again
+    days = {throughput_doc_id(day, 0): {"day": day, "shard": 0, **counts} for day, counts in throughput.items()}
+    return stats, days
+
+
+def _count_inventory():
+    inventory = {}
+    for doc in db.collection("items").stream():
+        item = doc.to_dict() or {}
+        holder = item.get("owner_email")
+        if not holder:
+            continue
+        row = inventory.setdefault(holder_key(holder), {"holder": holder, "items": 0, "available": 0})
+        row["items"] += 1
+        if item.get("status") == "available":
+            row["available"] += 1
+    return inventory
+
+
+def _write(collection: str, rows, dry_run: bool) -> None:
+    stale = [doc.reference for doc in db.collection(collection).stream() if doc.id not in rows]
+    writes = [(db.collection(collection).document(key), row) for key, row in rows.items()]
+    writes += [(ref, None) for ref in stale]
+    if not dry_run:
+        for i in range(0, len(writes), BATCH_WRITE_LIMIT):
+            batch = db.batch()
+            for ref, row in writes[i:i + BATCH_WRITE_LIMIT]:
+                if row is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, row)
+            batch.commit()
+    print(f"[{collection}] rows={len(rows)} deleted={len(stale)}")
+
+
+def rebuild(dry_run: bool = False) -> None:
+    stats, days = _replay_events()
+    _write(STATS_COLLECTION, stats, dry_run)
+    _write(THROUGHPUT_COLLECTION, days, dry_run)
+    _write(INVENTORY_COLLECTION, _count_inventory(), dry_run)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="compute the views but do not write")
+    args = parser.parse_args()
+    rebuild(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Recompute business_stats counter documents from source data.
+
+The counters are maintained incrementally on every write (services.business_stats).
+This job rebuilds them for every business, e.g. for data that predates the
+counters or after manual edits:
+
+- items_held / items_available from the current owner and status of items;
+- per-day / per-week pickups and dropoffs replayed from item_events, keeping
+  the last BUSINESS_STATS_RETENTION_DAYS;
+- transactions / transactions_by_type from each business's transactions;
+- points_earned from business credits in points_ledger.
+
+Each business is written to a single counter shard and its other shards (and
+any unsharded business_stats document) are deleted. Writes made while the job
+runs may be lost from the rebuilt counters, so run it at low traffic. Safe to
+re-run.
+
+Usage (from the backend directory):
+    python scripts/repair_business_stats.py [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from db.firestore_client import db  # noqa: E402
+from services.aliases import profile_identifiers  # noqa: E402
+from services.business_stats import RETENTION_DAYS, SHARDS_SUBCOLLECTION, STATS_COLLECTION, day_key, shards, week_key  # noqa: E402
+from services.item_events import EVENTS_COLLECTION, business_deltas  # noqa: E402
+from services.points import LEDGER_COLLECTION  # noqa: E402
+from services.transactions import COLLECTION as TRANSACTIONS_COLLECTION  # noqa: E402
+
+# Firestore allows at most 500 writes per batch
+BATCH_WRITE_LIMIT = 500
+
+
+def _business_index():
+    """Business document ids, and every identifier (id, uid, email) -> doc id,
+    with the alias index precedence (a document id beats a uid or email)."""
+    ids, best = [], {}
+    for doc in db.collection("businesses").stream():
+        ids.append(doc.id)
+        for rank, identifier in enumerate(profile_identifiers(doc.id, doc.to_dict())):
+            if identifier not in best or rank < best[identifier][0]:
+                best[identifier] = (rank, doc.id)
+    return ids, {identifier: doc_id for identifier, (_, doc_id) in best.items()}
+
+
+def recompute(dry_run: bool = False) -> None:
+    business_ids, holders = _business_index()
+    stats = {
+        business_id: {
+            "business_id": business_id, "items_held": 0, "items_available": 0, "points_earned": 0,
+            "transactions": 0, "transactions_by_type": Counter(),
+            "days": defaultdict(Counter), "weeks": defaultdict(Counter),
+        }
+        for business_id in business_ids
+    }
+
+    for doc in db.collection("items").stream():
+        item = doc.to_dict() or {}
+        business_id = holders.get(item.get("owner_email"))
+        if business_id:
+            stats[business_id]["items_held"] += 1
+            if item.get("status") == "available":
+                stats[business_id]["items_available"] += 1
+
+    oldest = datetime.utcnow().date() - timedelta(days=RETENTION_DAYS - 1)
+    for doc in db.collection(EVENTS_COLLECTION).where("day", ">=", day_key(oldest)).stream():
+        event = doc.to_dict() or {}
+        when = date.fromisoformat(event["day"])
+        previous = {"owner_email": event.get("from_holder"), "status": event.get("from_status")}
+        deltas = business_deltas(event.get("type"), previous, event.get("to_holder"), event.get("status"), holders)
+        for business_id, counts in deltas.items():
+            for field in ("pickups", "dropoffs"):
+                if counts[field]:
+                    stats[business_id]["days"][day_key(when)][field] += counts[field]
+                    stats[business_id]["weeks"][week_key(when)][field] += counts[field]
+
+    for doc in db.collection_group(TRANSACTIONS_COLLECTION).stream():
+        business_id = doc.reference.parent.parent.id
+        if business_id in stats:
+            stats[business_id]["transactions"] += 1
+            tx_type = (doc.to_dict() or {}).get("transaction_type")
+            if tx_type:
+                stats[business_id]["transactions_by_type"][tx_type] += 1
+
+    for doc in db.collection(LEDGER_COLLECTION).where("collection", "==", "businesses").stream():
+        entry = doc.to_dict() or {}
+        delta = int(entry.get("delta", 0) or 0)
+        if delta > 0 and entry.get("doc_id") in stats:
+            stats[entry["doc_id"]]["points_earned"] += delta
+
+    rows = []
+    for business_id, row in stats.items():
+        for field in ("transactions_by_type", "days", "weeks"):
+            row[field] = {key: (dict(value) if isinstance(value, Counter) else value) for key, value in row[field].items()}
+        rows.append((shards(db, business_id).document("0"), row))
+    # Other shards and pre-sharding documents; their counts are in the rows above
+    kept = {ref.path for ref, _ in rows}
+    stale = [doc.reference for doc in db.collection_group(SHARDS_SUBCOLLECTION).stream() if doc.reference.path not in kept]
+    stale += [doc.reference for doc in db.collection(STATS_COLLECTION).stream()]
+    writes = rows + [(ref, None) for ref in stale]
+    if not dry_run:
+        for i in range(0, len(writes), BATCH_WRITE_LIMIT):
+            batch = db.batch()
+            for ref, row in writes[i:i + BATCH_WRITE_LIMIT]:
+                if row is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, row)
+            batch.commit()
+    print(f"businesses={len(rows)} deleted={len(stale)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="compute the counters but do not write")
+    args = parser.parse_args()
+    recompute(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
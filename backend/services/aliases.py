@@ -0,0 +1,213 @@
+"""Identity alias index: any email, uid or legacy document id -> profile document.
+
+Profile documents are keyed inconsistently (businesses by uid or, for older
+accounts, by email; retailers by email; tourists by uid), so callers used to
+probe: document id, then ``uid ==``, then ``email ==``, then the same with the
+URL-decoded identifier. The ``identity_aliases`` collection maps each known
+identifier straight to the canonical document::
+
+    identity_aliases/{collection}:{identifier} -> {"path": "businesses/<id>", ...}
+
+Aliases are written on registration and removed on deletion
+(``register_aliases`` / ``unregister_aliases``) and backfilled by
+``scripts/backfill_aliases.py``. Resolved aliases are cached in-process, so a
+warm lookup costs no Firestore call at all. A miss falls back to the old
+probing once and records the alias it finds, so legacy data heals itself.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from db.firestore_client import adb, db
+from services import metrics
+
+ALIAS_COLLECTION = "identity_aliases"
+# Fields of a profile document that clients use as identifiers
+ALIAS_FIELDS = ("uid", "email")
+
+CACHE_SIZE = int(os.getenv("ALIAS_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("ALIAS_CACHE_TTL_SECONDS", "300"))
+# Misses are remembered briefly, so registrations on other workers show up quickly
+NEGATIVE_TTL_SECONDS = float(os.getenv("ALIAS_NEGATIVE_TTL_SECONDS", "30"))
+
+# (canonical document id or None for a remembered miss, absolute expiry timestamp)
+_Entry = Tuple[Optional[str], float]
+
+
+class _LRU:
+    """Small thread-safe LRU of resolved aliases."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, key: str, doc_id: Optional[str]) -> None:
+        ttl = CACHE_TTL_SECONDS if doc_id is not None else NEGATIVE_TTL_SECONDS
+        with self._lock:
+            self._data[key] = (doc_id, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _LRU(CACHE_SIZE)
+
+
+def alias_key(collection: str, identifier: str) -> str:
+    """Alias document id; identifiers are URL-decoded first and escaped so they
+    are valid Firestore ids."""
+    return f"{collection}:{quote(unquote(identifier), safe='@.+-_')}"
+
+
+def alias_document(collection: str, doc_id: str) -> Dict[str, Any]:
+    return {"collection": collection, "doc_id": doc_id, "path": f"{collection}/{doc_id}"}
+
+
+def profile_identifiers(doc_id: str, data: Optional[Dict[str, Any]]) -> List[str]:
+    """Identifiers of a profile document, in lookup precedence order
+    (document id, then the ALIAS_FIELDS)."""
+    values = [doc_id]
+    for field in ALIAS_FIELDS:
+        value = (data or {}).get(field)
+        if isinstance(value, str) and value and value not in values:
+            values.append(value)
+    return values
+
+
+# ----------------------------
+# Maintenance
+# ----------------------------
+def register_aliases(collection: str, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """Point the document id and its uid/email fields at ``collection/doc_id``."""
+    batch = db.batch()
+    for identifier in profile_identifiers(doc_id, data):
+        key = alias_key(collection, identifier)
+        batch.set(db.collection(ALIAS_COLLECTION).document(key), alias_document(collection, doc_id))
+        _cache.put(key, doc_id)
+    batch.commit()
+
+
+def unregister_aliases(collection: str, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """Drop the aliases of a deleted profile document."""
+    batch = db.batch()
+    for identifier in profile_identifiers(doc_id, data):
+        key = alias_key(collection, identifier)
+        batch.delete(db.collection(ALIAS_COLLECTION).document(key))
+        _cache.put(key, None)
+    batch.commit()
+
+
+def drop_alias(collection: str, identifier: str) -> None:
+    """Forget an alias whose document turned out to be gone (deleted on
+    another worker, or by a path that did not unregister it)."""
+    key = alias_key(collection, identifier)
+    db.collection(ALIAS_COLLECTION).document(key).delete()
+    _cache.put(key, None)
+
+
+async def drop_alias_async(collection: str, identifier: str) -> None:
+    """``drop_alias`` for async handlers."""
+    key = alias_key(collection, identifier)
+    await adb.collection(ALIAS_COLLECTION).document(key).delete()
+    _cache.put(key, None)
+
+
+# ----------------------------
+# Lookup
+# ----------------------------
+def _candidates(identifier: str) -> List[str]:
+    """The raw identifier, then its URL-decoded form when that differs."""
+    decoded = unquote(identifier)
+    return [identifier] if decoded == identifier else [identifier, decoded]
+
+
+def _probe(collection: str, identifier: str) -> Optional[str]:
+    """Legacy resolution: document id, then each alias field, for the raw and
+    then the URL-decoded identifier."""
+    coll = db.collection(collection)
+    for candidate in _candidates(identifier):
+        if coll.document(candidate).get().exists:
+            return candidate
+        for field in ALIAS_FIELDS:
+            docs = list(coll.where(field, "==", candidate).limit(1).stream())
+            if docs:
+                return docs[0].id
+    return None
+
+
+async def _probe_async(collection: str, identifier: str) -> Optional[str]:
+    coll = adb.collection(collection)
+    for candidate in _candidates(identifier):
+        doc, *matches = await asyncio.gather(
+            coll.document(candidate).get(),
+            *(coll.where(field, "==", candidate).limit(1).get() for field in ALIAS_FIELDS),
+        )
+        if doc.exists:
+            return candidate
+        for found in matches:
+            if found:
+                return found[0].id
+    return None
+
+
+def resolve(collection: str, identifier: str) -> Optional[str]:
+    """Canonical document id in ``collection`` for an email, uid or document id."""
+    if not identifier:
+        return None
+    key = alias_key(collection, identifier)
+    entry = _cache.get(key)
+    metrics.record_cache("aliases", entry is not None)
+    if entry is not None:
+        return entry[0]
+    snap = db.collection(ALIAS_COLLECTION).document(key).get()
+    if snap.exists:
+        doc_id = (snap.to_dict() or {}).get("doc_id")
+        _cache.put(key, doc_id)
+        return doc_id
+    doc_id = _probe(collection, identifier)
+    if doc_id is not None:
+        db.collection(ALIAS_COLLECTION).document(key).set(alias_document(collection, doc_id))
+    _cache.put(key, doc_id)
+    return doc_id
+
+
+async def resolve_async(collection: str, identifier: str) -> Optional[str]:
+    """``resolve`` for async handlers (AsyncClient reads)."""
+    if not identifier:
+        return None
+    key = alias_key(collection, identifier)
+    entry = _cache.get(key)
+    metrics.record_cache("aliases", entry is not None)
+    if entry is not None:
+        return entry[0]
+    snap = await adb.collection(ALIAS_COLLECTION).document(key).get()
+    if snap.exists:
+        doc_id = (snap.to_dict() or {}).get("doc_id")
+        _cache.put(key, doc_id)
+        return doc_id
+    doc_id = await _probe_async(collection, identifier)
+    if doc_id is not None:
+        await adb.collection(ALIAS_COLLECTION).document(key).set(alias_document(collection, doc_id))
+    _cache.put(key, doc_id)
+    return doc_id
@@ -0,0 +1,250 @@
+"""Firebase ID token verification with a verified-token cache.
+
+``auth.verify_id_token`` re-verifies the RSA signature on every call and
+periodically blocks a request on a certificate download. Here:
+
+- verified claims are cached in a bounded LRU keyed by the SHA-256 of the
+  token, and each entry expires at the token's own ``exp`` claim;
+- Google's signing certificates are parsed once and refreshed by a daemon
+  thread before their ``Cache-Control: max-age`` runs out (and at most once
+  per ``CERT_MIN_REFRESH_SECONDS`` when a token names an unknown key id).
+
+``TokenVerifier`` takes the certificate source as a callable, so tests can
+sign tokens with a local key pair and hand the verifier a fake key set.
+With ``FIREBASE_AUTH_EMULATOR_HOST`` set, verification is delegated to the
+Admin SDK, which accepts the emulator's unsigned tokens.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+import jwt
+import requests
+from cryptography import x509
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+CLOCK_SKEW_SECONDS = int(os.getenv("AUTH_CLOCK_SKEW_SECONDS", "5"))
+CERT_REFRESH_MARGIN_SECONDS = 300
+CERT_RETRY_SECONDS = 30
+CERT_MIN_REFRESH_SECONDS = 60
+CERT_FETCH_TIMEOUT = 10
+# "local" routes every token to db.local_auth (see db/firestore_auth.py)
+AUTH_BACKEND = os.getenv("AUTH_BACKEND", "firebase").strip().lower()
+
+# kid -> PEM certificate, and how long Google says they stay valid
+CertSource = Callable[[], Tuple[Mapping[str, str], float]]
+
+
+class InvalidTokenError(ValueError):
+    pass
+
+
+def fetch_google_certs() -> Tuple[Dict[str, str], float]:
+    """Download the current ID token signing certificates."""
+    resp = requests.get(ID_TOKEN_CERT_URL, timeout=CERT_FETCH_TIMEOUT)
+    resp.raise_for_status()
+    match = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+    return resp.json(), float(match.group(1)) if match else 3600.0
+
+
+class KeySet:
+    """Parsed signing keys, refreshed ahead of expiry in the background."""
+
+    def __init__(self, source: CertSource):
+        self._source = source
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+    def _refresh(self) -> None:
+        with self._lock:
+            self._attempted_at = time.time()
+        certs, max_age = self._source()
+        keys = {
+            kid: x509.load_pem_x509_certificate(pem.encode()).public_key()
+            for kid, pem in certs.items()
+        }
+        with self._lock:
+            self._keys = keys
+            self._expires_at = time.time() + max_age
+
+    def get(self, kid: str):
+        with self._lock:
+            key = self._keys.get(kid)
+            fresh = time.time() < self._expires_at
+            may_refetch = not self._keys or time.time() - self._attempted_at >= CERT_MIN_REFRESH_SECONDS
+        if key is not None and fresh:
+            return key
+        # First use, expired keys, or a key rotation we have not seen yet
+        if may_refetch:
+            try:
+                self._refresh()
+            except Exception as e:
+                # Keep serving with the previous keys if Google is unreachable
+                logger.warning("Firebase signing certificate fetch failed: %s", e)
+                return key
+            with self._lock:
+                key = self._keys.get(kid)
+        return key
+
+    def start_background_refresh(self) -> None:
+        if self._refresher is not None:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="firebase-cert-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            try:
+                if time.time() >= self._expires_at - CERT_REFRESH_MARGIN_SECONDS:
+                    self._refresh()
+                delay = max(self._expires_at - CERT_REFRESH_MARGIN_SECONDS - time.time(), CERT_RETRY_SECONDS)
+            except Exception as e:
+                logger.warning("Firebase signing certificate refresh failed: %s", e)
+                delay = CERT_RETRY_SECONDS
+            time.sleep(delay)
+
+
+class _TokenCache:
+    """Thread-safe LRU of verified claims; entries expire with the token."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._data.get(key)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return claims
+
+    def put(self, key: str, claims: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = claims
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens for one project, caching verified claims."""
+
+    def __init__(self, project_id: str, keys: KeySet, cache_size: int = CACHE_SIZE):
+        self.project_id = project_id
+        self.issuer = ID_TOKEN_ISSUER_PREFIX + project_id
+        self.keys = keys
+        self.cache = _TokenCache(cache_size)
+
+    def _verify_signed(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise InvalidTokenError(f"Malformed ID token: {e}")
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise InvalidTokenError("ID token must be RS256-signed with a key id")
+        key = self.keys.get(header["kid"])
+        if key is None:
+            raise InvalidTokenError("ID token signed with an unknown key")
+        try:
+            claims = jwt.decode(
+                token,
+                key=key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=self.issuer,
+                leeway=CLOCK_SKEW_SECONDS,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidTokenError(f"Invalid ID token: {e}")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidTokenError('ID token has an invalid "sub" claim')
+        claims["uid"] = subject
+        return claims
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims (plus ``uid``); raise InvalidTokenError."""
+        if not token:
+            raise InvalidTokenError("Empty ID token")
+        key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self.cache.get(key)
+        metrics.record_cache("id_tokens", claims is not None)
+        if claims is None:
+            claims = self._verify_signed(token)
+            self.cache.put(key, claims)
+        return dict(claims)
+
+
+_verifier: Optional[TokenVerifier] = None
+_verifier_lock = threading.Lock()
+
+
+def _project_id() -> Optional[str]:
+    import firebase_admin
+
+    from db import firestore_auth
+
+    firestore_auth.initialize()  # the default app
+    try:
+        project_id = firebase_admin.get_app().project_id
+    except ValueError:
+        project_id = None
+    return project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
+
+
+def get_verifier() -> Optional[TokenVerifier]:
+    """Process-wide verifier; None when tokens must go through the Admin SDK."""
+    global _verifier
+    if os.getenv("FIREBASE_AUTH_EMULATOR_HOST") or AUTH_BACKEND == "local":
+        return None
+    with _verifier_lock:
+        if _verifier is None:
+            project_id = _project_id()
+            if not project_id:
+                return None
+            keys = KeySet(fetch_google_certs)
+            keys.start_background_refresh()
+            _verifier = TokenVerifier(project_id, keys)
+        return _verifier
+
+
+def set_verifier(verifier: Optional[TokenVerifier]) -> None:
+    """Install a verifier (e.g. one backed by a local fake key set in tests)."""
+    global _verifier
+    with _verifier_lock:
+        _verifier = verifier
+
+
+def verify_id_token(token: str) -> Dict[str, Any]:
+    verifier = get_verifier()
+    if verifier is None:
+        from db.firestore_auth import auth
+
+        return auth.verify_id_token(token)
+    return verifier.verify(token)
@@ -0,0 +1,178 @@
+"""Per-business dashboard counters, sharded per business.
+
+Every change the counters track (item events, scans, transactions) is staged
+with ``firestore.Increment`` in the same write as the change itself. A busy
+drop-off business would make one counter document hot again, so each write
+picks one of ``BUSINESS_STATS_SHARDS`` documents under
+``business_stats/{business_id}/stats_shards`` at random (as services.points
+does for balances) and ``GET /businesses/{id}/stats`` sums them with a single
+query:
+
+- ``items_held`` / ``items_available``: items whose holder is the business
+  (maintained from item events, see services.item_events);
+- ``days.{YYYY-MM-DD}`` / ``weeks.{YYYY-Www}``: ``pickups`` (items leaving the
+  business) and ``dropoffs`` (items arriving), per UTC day and ISO week;
+- ``points_earned``: points credited to the business;
+- ``transactions`` / ``transactions_by_type``: scheduled transaction records.
+
+``scripts/repair_business_stats.py`` recomputes every business from the items,
+item_events, transactions and points_ledger collections into one shard and
+trims the day and week maps to ``BUSINESS_STATS_RETENTION_DAYS``.
+"""
+
+import os
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from google.cloud import firestore
+
+from services import aliases
+
+STATS_COLLECTION = "business_stats"
+# Item field: document id of the business holding the item, None for other holders
+OWNER_BUSINESS_FIELD = "owner_business_id"
+SHARDS_SUBCOLLECTION = "stats_shards"
+NUM_SHARDS = int(os.getenv("BUSINESS_STATS_SHARDS", "10"))
+RETENTION_DAYS = int(os.getenv("BUSINESS_STATS_RETENTION_DAYS", "90"))
+
+
+def day_key(when: date) -> str:
+    return when.strftime("%Y-%m-%d")
+
+
+def week_key(when: date) -> str:
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def shards(client, business_id: str):
+    """Counter shard collection of one business (sync or async client)."""
+    return client.collection(STATS_COLLECTION).document(business_id).collection(SHARDS_SUBCOLLECTION)
+
+
+def _add(total: Dict[str, Any], data: Dict[str, Any]) -> None:
+    for field, value in data.items():
+        if isinstance(value, dict):
+            _add(total.setdefault(field, {}), value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            total[field] = total.get(field, 0) + value
+
+
+def merge_shards(docs: Iterable[Any]) -> Dict[str, Any]:
+    """Sum counter shard documents (nested day/week/type maps included)."""
+    total: Dict[str, Any] = {}
+    for doc in docs:
+        _add(total, doc.to_dict() or {})
+    return total
+
+
+def business_holders(*holders: Optional[str]) -> Dict[str, str]:
+    """Map the given item holders (owner identifiers) that are businesses to
+    their business document id; resolved through the alias index cache."""
+    found = {}
+    for holder in holders:
+        if holder and holder not in found:
+            doc_id = aliases.resolve("businesses", holder)
+            if doc_id:
+                found[holder] = doc_id
+    return found
+
+
+async def business_holders_async(*holders: Optional[str]) -> Dict[str, str]:
+    """``business_holders`` for async handlers."""
+    found = {}
+    for holder in holders:
+        if holder and holder not in found:
+            doc_id = await aliases.resolve_async("businesses", holder)
+            if doc_id:
+                found[holder] = doc_id
+    return found
+
+
+def _stored_holders(item: Dict[str, Any], available_only: bool) -> Optional[Dict[str, str]]:
+    owner = item.get("owner_email")
+    if not owner:
+        return {}
+    if OWNER_BUSINESS_FIELD in item:
+        business_id = item[OWNER_BUSINESS_FIELD]
+        return {owner: business_id} if business_id else {}
+    if available_only and item.get("status") != "available":
+        return {}
+    # Written before items recorded their business; look the holder up
+    return None
+
+
+def item_holders(item: Optional[Dict[str, Any]], available_only: bool = False) -> Dict[str, str]:
+    """``business_holders`` for the holder of an item document, read from its
+    ``owner_business_id`` without a lookup. Older items are resolved through
+    the alias index; with ``available_only`` (the hand-over routes) only when
+    the item is available, as only businesses hold available items."""
+    item = item or {}
+    found = _stored_holders(item, available_only)
+    return found if found is not None else business_holders(item["owner_email"])
+
+
+async def item_holders_async(item: Optional[Dict[str, Any]], available_only: bool = False) -> Dict[str, str]:
+    """``item_holders`` for async handlers."""
+    item = item or {}
+    found = _stored_holders(item, available_only)
+    return found if found is not None else await business_holders_async(item["owner_email"])
+
+
+def stage(
+    batch,
+    client,
+    business_id: str,
+    held: int = 0,
+    available: int = 0,
+    pickups: int = 0,
+    dropoffs: int = 0,
+    points: int = 0,
+    transaction_type: Optional[str] = None,
+    transaction_delta: int = 0,
+    when: Optional[datetime] = None,
+) -> None:
+    """Stage counter changes for one business on ``batch`` (WriteBatch or
+    Transaction of ``client``, sync or async). Zero deltas are skipped."""
+    data: Dict[str, Any] = {}
+    for field, value in (("items_held", held), ("items_available", available), ("points_earned", points)):
+        if value:
+            data[field] = firestore.Increment(value)
+    when = when or datetime.utcnow()
+    period = {name: firestore.Increment(value) for name, value in (("pickups", pickups), ("dropoffs", dropoffs)) if value}
+    if period:
+        data["days"] = {day_key(when): period}
+        data["weeks"] = {week_key(when): dict(period)}
+    if transaction_type and transaction_delta:
+        data["transactions"] = firestore.Increment(transaction_delta)
+        data["transactions_by_type"] = {transaction_type: firestore.Increment(transaction_delta)}
+    if data:
+        data["business_id"] = business_id
+        batch.set(shards(client, business_id).document(str(random.randrange(NUM_SHARDS))), data, merge=True)
+
+
+def _series(buckets: Dict[str, Dict[str, int]], keys: Iterable[str], key_name: str) -> List[Dict[str, Any]]:
+    return [
+        {key_name: key, "pickups": int(buckets.get(key, {}).get("pickups", 0)), "dropoffs": int(buckets.get(key, {}).get("dropoffs", 0))}
+        for key in keys
+    ]
+
+
+def summarize(business_id: str, data: Optional[Dict[str, Any]], days: int, weeks: int) -> Dict[str, Any]:
+    """API shape of a stats document: totals plus the last ``days`` days and
+    ``weeks`` ISO weeks (oldest first, zero-filled)."""
+    data = data or {}
+    today = datetime.utcnow().date()
+    day_keys = [day_key(today - timedelta(days=n)) for n in range(days - 1, -1, -1)]
+    week_keys = list(dict.fromkeys(week_key(today - timedelta(weeks=n)) for n in range(weeks - 1, -1, -1)))
+    return {
+        "business_id": business_id,
+        "items_held": int(data.get("items_held", 0)),
+        "items_available": int(data.get("items_available", 0)),
+        "points_earned": int(data.get("points_earned", 0)),
+        "transactions": int(data.get("transactions", 0)),
+        "transactions_by_type": data.get("transactions_by_type", {}),
+        "daily": _series(data.get("days", {}), day_keys, "day"),
+        "weekly": _series(data.get("weeks", {}), week_keys, "week"),
+    }
@@ -0,0 +1,292 @@
+"""Bulk import of retailer catalogs from CSV or JSONL.
+
+Rows are read from a local copy of the upload and validated one chunk at a
+time, so memory stays flat for large catalogs. Parsing, validation and ZIP
+reads are blocking work, so each chunk's share runs on a worker thread and
+the event loop only awaits it. Each chunk of up to
+``CHUNK_SIZE`` products is committed as one WriteBatch together with the
+import's progress document (``retailer_imports/{import_id}``), which makes the
+progress marker exact: a retried import with the same ``import_id`` skips
+every row up to ``rows_committed`` and continues from there. Item ids are
+derived from (import_id, row number), so even a chunk that is re-run after a
+lost response overwrites the same documents instead of duplicating them.
+
+Images come either from an ``image_url`` column (Cloudinary fetches the URL
+itself) or from an ``image`` column naming a file in an uploaded ZIP. Uploads
+of a chunk run concurrently, at most ``IMAGE_CONCURRENCY`` at a time, on the
+Cloudinary upload pool; a failed image does not fail its row.
+
+A catalog longer than ``MAX_ROWS`` is imported up to the limit and the import
+ends with status "truncated".
+"""
+
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from db.cloudinary_client import upload_file
+from db.firestore_client import adb
+from models.retailer import CatalogRow
+
+IMPORT_COLLECTION = "retailer_imports"
+ITEMS_COLLECTION = "retailer_items"
+# Firestore allows at most 500 writes per batch; one is the progress document
+CHUNK_SIZE = 499
+IMAGE_CONCURRENCY = int(os.getenv("CATALOG_IMAGE_CONCURRENCY", "8"))
+MAX_ROWS = int(os.getenv("CATALOG_IMPORT_MAX_ROWS", "50000"))
+
+FORMATS = ("csv", "jsonl")
+
+_ID_NAMESPACE = uuid.UUID("8f6f7f53-1d43-4c0e-9a55-0e4d3c2b1a90")
+
+
+class ImportConflict(Exception):
+    """The import id belongs to another retailer or store."""
+
+
+def detect_format(filename: Optional[str], requested: Optional[str]) -> str:
+    if requested:
+        return requested
+    if filename and filename.lower().endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+def item_id(import_id: str, row_number: int) -> str:
+    """Stable qr_code_id of a row, so re-running a chunk is idempotent."""
+    return str(uuid.uuid5(_ID_NAMESPACE, f"{import_id}:{row_number}"))
+
+
+def _clean(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty cells (CSV) and surrounding whitespace before validation."""
+    cleaned = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        if value is not None:
+            cleaned[key.strip()] = value
+    return cleaned
+
+
+def iter_rows(source: BinaryIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row number, raw dict or parse error), row numbers starting at 1."""
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for number, raw in enumerate(csv.DictReader(text), start=1):
+            yield number, raw
+        return
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            raw = json.loads(line)
+            yield number, raw if isinstance(raw, dict) else ValueError("Line is not a JSON object")
+        except ValueError as e:
+            yield number, e
+
+
+def _read_rows(rows: Iterator[Tuple[int, Any]], count: int) -> List[Tuple[int, Any]]:
+    """Next ``count`` parsed rows (fewer at the end of the file)."""
+    return list(itertools.islice(rows, count))
+
+
+def _validate(raw: Any) -> Tuple[Optional[CatalogRow], Optional[str]]:
+    if isinstance(raw, Exception):
+        return None, f"Unreadable row: {raw}"
+    try:
+        return CatalogRow(**_clean(raw)), None
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+async def _upload_image(row: CatalogRow, images: Optional[zipfile.ZipFile], public_id: str, semaphore: asyncio.Semaphore) -> Tuple[Optional[str], Optional[str]]:
+    """Returns (image_url, error)."""
+    if row.image_url is None and not row.image:
+        return None, None
+    try:
+        if row.image:
+            if images is None:
+                raise ValueError("No images ZIP uploaded")
+            source = await asyncio.to_thread(images.read, row.image)
+        else:
+            # Cloudinary downloads remote URLs itself
+            source = str(row.image_url)
+        async with semaphore:
+            result = await upload_file(source, public_id, folder=ITEMS_COLLECTION)
+        url = result.get("secure_url")
+        if not url:
+            raise RuntimeError("Cloudinary upload returned no secure_url")
+        return url, None
+    except KeyError:
+        return None, f"Image {row.image!r} not found in ZIP"
+    except Exception as e:
+        return None, f"Image upload failed: {e}"
+
+
+async def start(import_id: str, retailer_email: str, store_id: Optional[str], filename: Optional[str]) -> Dict[str, Any]:
+    """Create or reopen the progress document of an import."""
+    ref = adb.collection(IMPORT_COLLECTION).document(import_id)
+    snap = await ref.get()
+    now = datetime.utcnow().isoformat() + "Z"
+    if snap.exists:
+        state = snap.to_dict() or {}
+        if state.get("retailer_email") != retailer_email or state.get("store_id") != store_id:
+            raise ImportConflict(f"Import {import_id} belongs to another retailer or store")
+        state.update(status="running", updated_at=now)
+        await ref.update({"status": "running", "updated_at": now})
+        return state
+    state = {
+        "import_id": import_id,
+        "retailer_email": retailer_email,
+        "store_id": store_id,
+        "filename": filename,
+        "status": "running",
+        "rows_committed": 0,
+        "created": 0,
+        "invalid": 0,
+        "image_errors": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await ref.set(state)
+    return state
+
+
+async def _commit_chunk(
+    state: Dict[str, Any],
+    chunk: List[Tuple[int, Any]],
+    images: Optional[zipfile.ZipFile],
+    semaphore: asyncio.Semaphore,
+) -> List[Dict[str, Any]]:
+    import_id = state["import_id"]
+    results: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, CatalogRow]] = []
+    checked = await asyncio.to_thread(lambda: [(number, *_validate(raw)) for number, raw in chunk])
+    for number, row, error in checked:
+        if error:
+            results.append({"row": number, "status": "invalid", "error": error})
+        else:
+            valid.append((number, row))
+
+    uploads = await asyncio.gather(
+        *(_upload_image(row, images, item_id(import_id, number), semaphore) for number, row in valid)
+    )
+
+    batch = adb.batch()
+    image_errors = 0
+    for (number, row), (image_url, image_error) in zip(valid, uploads):
+        qr_code_id = item_id(import_id, number)
+        item_data = {
+            "name": row.name,
+            "description": row.description,
+            "qr_code_id": qr_code_id,
+            "owner_email": state["retailer_email"],
+            "status": "available",
+            "image_url": image_url,
+            "created_by": "retailer",
+            "import_id": import_id,
+        }
+        if row.sku:
+            item_data["sku"] = row.sku
+        if state.get("store_id"):
+            item_data["store_id"] = state["store_id"]
+        if image_error:
+            item_data["image_status"] = "failed"
+            image_errors += 1
+        batch.set(adb.collection(ITEMS_COLLECTION).document(qr_code_id), item_data)
+        result = {"row": number, "status": "created", "qr_code_id": qr_code_id}
+        if image_error:
+            result["image_error"] = image_error
+        results.append(result)
+
+    progress = {
+        "rows_committed": chunk[-1][0],
+        "created": state["created"] + len(valid),
+        "invalid": state["invalid"] + len(chunk) - len(valid),
+        "image_errors": state["image_errors"] + image_errors,
+        "updated_at": datetime.utcnow().isoformat() + "Z",
+    }
+    batch.set(adb.collection(IMPORT_COLLECTION).document(import_id), progress, merge=True)
+    await batch.commit()
+    state.update(progress)
+    results.sort(key=lambda r: r["row"])
+    return results
+
+
+async def run(
+    state: Dict[str, Any],
+    source: BinaryIO,
+    fmt: str,
+    images: Optional[BinaryIO] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Import the rows of ``source``, yielding one result per row
+    (created / invalid / skipped) and a final summary."""
+    ref = adb.collection(IMPORT_COLLECTION).document(state["import_id"])
+    resume_after = int(state.get("rows_committed") or 0)
+    semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+    archive = None
+    rows = 0
+    try:
+        if images is not None:
+            archive = await asyncio.to_thread(zipfile.ZipFile, images)
+        parsed = iter_rows(source, fmt)
+        over_limit = None
+        while over_limit is None:
+            read = await asyncio.to_thread(_read_rows, parsed, CHUNK_SIZE)
+            if not read:
+                break
+            chunk: List[Tuple[int, Any]] = []
+            for number, raw in read:
+                rows = number
+                if number > MAX_ROWS:
+                    over_limit = {"row": number, "status": "invalid", "error": f"Import is limited to {MAX_ROWS} rows"}
+                    break
+                if number <= resume_after:
+                    yield {"row": number, "status": "skipped"}
+                    continue
+                chunk.append((number, raw))
+            if chunk:
+                for result in await _commit_chunk(state, chunk, archive, semaphore):
+                    yield result
+        if over_limit is not None:
+            yield over_limit
+        state["status"] = "truncated" if over_limit is not None else "completed"
+    except Exception as e:
+        state["status"] = "failed"
+        state["error"] = str(e)
+        yield {"status": "failed", "error": str(e), "rows_committed": state.get("rows_committed", 0)}
+    finally:
+        if archive is not None:
+            archive.close()
+        if state["status"] == "running":
+            # The client went away mid-import; resume with the same import id
+            state["status"] = "interrupted"
+        update = {"status": state["status"], "updated_at": datetime.utcnow().isoformat() + "Z"}
+        if state.get("error"):
+            update["error"] = state["error"]
+        await ref.update(update)
+
+    yield {
+        "import_id": state["import_id"],
+        "status": state["status"],
+        "rows": rows,
+        "rows_committed": state.get("rows_committed", 0),
+        "created": state.get("created", 0),
+        "invalid": state.get("invalid", 0),
+        "image_errors": state.get("image_errors", 0),
+    }
@@ -0,0 +1,70 @@
+"""Geo math shared by the routers and background jobs."""
+
+from math import radians, sin, cos, asin, sqrt
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.195
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points (in kilometers)."""
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(1.0, a)))
+
+
+def haversine_km_many(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distances in kilometers from one origin to N points in a single NumPy pass."""
+    lat0 = np.radians(lat)
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lats - lat0
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat0) * np.cos(lats) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def k_smallest(distances: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest distances, nearest first.
+
+    Uses argpartition so only the selected k are sorted, instead of the full array.
+    """
+    n = len(distances)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        idx = np.argpartition(distances, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(distances[idx], kind="stable")]
+
+
+def encode_geohash(lat: float, lng: float, precision: int = 9) -> str:
+    """Encode coordinates as a geohash string of the given length."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
@@ -0,0 +1,207 @@
+"""Shared geocoding with a two-level cache.
+
+Lookups go through an in-process LRU first, then a persistent SQLite store, and
+only then to Nominatim. Both levels key on a normalized form of the address and
+remember misses (negative caching) for a shorter TTL, so repeat addresses never
+leave the process and a restarted worker comes up warm.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+from services import metrics
+from services.geo import encode_geohash
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", os.path.join(BASE_DIR, ".cache", "geocode.sqlite3"))
+CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+NEGATIVE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL_SECONDS", str(24 * 3600)))
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "10"))
+
+# (coords or None for a remembered miss, absolute expiry timestamp)
+_Entry = Tuple[Optional[Dict[str, float]], float]
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def _get_geocoder():
+    """The Nominatim client; geopy is imported on the first cache miss."""
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                from geopy.geocoders import Nominatim
+
+                _geocoder = Nominatim(user_agent="newhacks2025-backend")
+    return _geocoder
+
+
+def normalize_address(address: str) -> str:
+    """Canonical cache key for an address: case-folded, single-spaced, without
+    stray punctuation around separators."""
+    key = (address or "").casefold()
+    key = re.sub(r"\s*,\s*", ", ", key)
+    key = re.sub(r"[^\w\s,#/-]", "", key)
+    key = re.sub(r"\s+", " ", key)
+    return key.strip(" ,")
+
+
+class _LRU:
+    """Small thread-safe LRU of cache entries."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _SQLiteStore:
+    """Persistent geocode results shared by every worker on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " key TEXT PRIMARY KEY, lat REAL, lng REAL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[_Entry]:
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT lat, lng, expires_at FROM geocode WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Geocode cache read failed: %s", e)
+            return None
+        if not row or row[2] <= time.time():
+            return None
+        coords = None if row[0] is None else {"lat": row[0], "lng": row[1]}
+        return coords, row[2]
+
+    def put(self, key: str, entry: _Entry) -> None:
+        coords, expires_at = entry
+        lat = coords["lat"] if coords else None
+        lng = coords["lng"] if coords else None
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode (key, lat, lng, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, lat, lng, expires_at),
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Geocode cache write failed: %s", e)
+
+
+_memory = _LRU(CACHE_SIZE)
+_store = _SQLiteStore(CACHE_PATH)
+
+
+def _lookup(address: str) -> Tuple[Optional[Dict[str, float]], bool]:
+    """Query Nominatim. Returns (coords, definitive); transient errors are not
+    definitive and must not be negatively cached."""
+    try:
+        loc = _get_geocoder().geocode(address, timeout=GEOCODE_TIMEOUT)
+    except Exception as e:
+        logger.warning("Geocoding failed for %r: %s", address, e)
+        return None, False
+    if not loc:
+        return None, True
+    return {"lat": loc.latitude, "lng": loc.longitude}, True
+
+
+def geocode_address(address: str) -> Optional[Dict[str, float]]:
+    """Return {"lat", "lng"} for an address, or None if it cannot be geocoded."""
+    key = normalize_address(address)
+    if not key:
+        return None
+
+    entry = _memory.get(key)
+    if entry is None:
+        entry = _store.get(key)
+        if entry is not None:
+            _memory.put(key, entry)
+    metrics.record_cache("geocode", entry is not None)
+    if entry is not None:
+        return dict(entry[0]) if entry[0] else None
+
+    with metrics.backend_call("geocoder", "nominatim"):
+        coords, definitive = _lookup(address)
+    if not definitive:
+        return None
+    ttl = TTL_SECONDS if coords else NEGATIVE_TTL_SECONDS
+    entry = (coords, time.time() + ttl)
+    _memory.put(key, entry)
+    _store.put(key, entry)
+    return dict(coords) if coords else None
+
+
+def location_fields(address: str) -> Dict[str, Any]:
+    """Fields persisted on business/retailer documents so the nearby endpoints
+    never geocode an owner at request time.
+
+    ``geocoded_address`` records which address the coordinates belong to, so a
+    changed address can be detected and re-geocoded. Returns an empty dict when
+    the address cannot be geocoded.
+    """
+    coords = geocode_address(address)
+    if not coords:
+        return {}
+    return {
+        "lat": coords["lat"],
+        "lng": coords["lng"],
+        "geohash": encode_geohash(coords["lat"], coords["lng"]),
+        "geocoded_address": normalize_address(address),
+    }
+
+
+def needs_geocoding(data: Dict[str, Any]) -> bool:
+    """True when a document has an address but no coordinates for it."""
+    address = data.get("address")
+    if not address:
+        return False
+    if data.get("lat") is None or data.get("lng") is None:
+        return True
+    return data.get("geocoded_address") != normalize_address(address)
@@ -0,0 +1,195 @@
+"""Append-only item lifecycle events and the views maintained from them.
+
+Every state change of an item (create, pickup, dropoff, scan, status change,
+owner edit, delete) appends an ``item_events`` document in the same batch or transaction as the
+item update, together with ``firestore.Increment`` updates of three
+materialized views (and of services.business_stats for business holders), so
+dashboards read one precomputed document instead of scanning history:
+
+- ``item_stats/{qr_code_id}``: event counts per type, ``circulation_count``
+  (hand-overs into use: pickups and scans) and the current holder/status;
+- ``item_inventory/{holder}``: items currently held by an owner identifier
+  (the item's ``owner_email``, e.g. a business), and how many are available;
+- ``item_throughput_daily/{YYYY-MM-DD}_{shard}``: events per type per UTC
+  day. Every event in the system lands on the current day, so each write picks
+  one of ``ITEM_THROUGHPUT_SHARDS`` documents at random (as services.points
+  does for hot balances) and ``daily_throughput`` sums the shards of each day.
+
+Views only ever receive increments, so concurrent events cannot overwrite each
+other. ``scripts/rebuild_item_views.py`` recomputes them from the event log
+and the items collection (e.g. after backfilling items older than the log).
+"""
+
+import os
+import random
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+from google.cloud import firestore
+
+from services import business_stats
+
+EVENTS_COLLECTION = "item_events"
+STATS_COLLECTION = "item_stats"
+INVENTORY_COLLECTION = "item_inventory"
+THROUGHPUT_COLLECTION = "item_throughput_daily"
+THROUGHPUT_SHARDS = int(os.getenv("ITEM_THROUGHPUT_SHARDS", "10"))
+
+CREATED = "created"
+PICKUP = "pickup"
+DROPOFF = "dropoff"
+SCAN = "scan"
+# Status change without a hand-over (PATCH /items/status)
+STATUS = "status"
+# Owner reassigned by an item edit (PATCH /items)
+TRANSFER = "transfer"
+# Item removed; the event has no holder and status DELETED_STATUS
+DELETED = "deleted"
+DELETED_STATUS = "deleted"
+EVENT_TYPES = (CREATED, PICKUP, DROPOFF, SCAN, STATUS, TRANSFER, DELETED)
+# Events that put an item into someone's hands (one circulation each)
+CIRCULATION_EVENTS = (PICKUP, SCAN)
+# Events that bring an item to its new holder
+ARRIVAL_EVENTS = (CREATED, DROPOFF)
+
+# Counter field per event type in item_stats and item_throughput_daily
+COUNT_FIELDS = {
+    CREATED: "created", PICKUP: "pickups", DROPOFF: "dropoffs", SCAN: "scans",
+    STATUS: "status_changes", TRANSFER: "transfers", DELETED: "deletions",
+}
+
+
+def holder_key(holder: str) -> str:
+    """Inventory document id for an owner identifier (escaped to a valid id)."""
+    return quote(holder, safe="@.+-_")
+
+
+def throughput_doc_id(day: str, shard: int) -> str:
+    return f"{day}_{shard}"
+
+
+def daily_throughput(shards: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Sum throughput shard documents (ordered by ``day``) into one row per day."""
+    days: Dict[str, Dict[str, Any]] = {}
+    for doc in shards:
+        data = doc.to_dict() or {}
+        row = days.setdefault(data.get("day"), {"day": data.get("day"), "events": 0})
+        for field, value in data.items():
+            if field not in ("day", "shard") and isinstance(value, int):
+                row[field] = row.get(field, 0) + value
+    return list(days.values())
+
+
+def _inventory_deltas(previous: Optional[Dict[str, Any]], holder: Optional[str], status: Optional[str]) -> Dict[str, Dict[str, int]]:
+    """Per-holder changes of the ``items``/``available`` counts for one event."""
+    deltas: Dict[str, Dict[str, int]] = {}
+    for owner, owner_status, sign in (
+        ((previous or {}).get("owner_email"), (previous or {}).get("status"), -1),
+        (holder, status, 1),
+    ):
+        if not owner:
+            continue
+        delta = deltas.setdefault(owner, {"items": 0, "available": 0})
+        delta["items"] += sign
+        if owner_status == "available":
+            delta["available"] += sign
+    return deltas
+
+
+def business_deltas(
+    event_type: str,
+    previous: Optional[Dict[str, Any]],
+    holder: Optional[str],
+    status: Optional[str],
+    businesses: Dict[str, str],
+) -> Dict[str, Counter]:
+    """Dashboard counter changes (held, available, pickups, dropoffs) per
+    business id for one event; ``businesses`` maps holders that are businesses
+    to their document id."""
+    per_business: Dict[str, Counter] = {}
+    for owner, delta in _inventory_deltas(previous, holder, status).items():
+        business_id = businesses.get(owner)
+        if business_id:
+            counts = per_business.setdefault(business_id, Counter())
+            counts["held"] += delta["items"]
+            counts["available"] += delta["available"]
+    from_business = businesses.get((previous or {}).get("owner_email"))
+    to_business = businesses.get(holder)
+    if from_business != to_business:
+        if event_type in CIRCULATION_EVENTS and from_business:
+            per_business.setdefault(from_business, Counter())["pickups"] += 1
+        if event_type in ARRIVAL_EVENTS and to_business:
+            per_business.setdefault(to_business, Counter())["dropoffs"] += 1
+    return per_business
+
+
+def record(
+    batch,
+    client,
+    event_type: str,
+    qr_code_id: str,
+    holder: Optional[str],
+    status: str,
+    previous: Optional[Dict[str, Any]] = None,
+    actor: Optional[str] = None,
+    businesses: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Stage an event and its view updates on ``batch`` (a WriteBatch or
+    Transaction of ``client``, sync or async).
+
+    ``holder``/``status`` are the item's ``owner_email``/``status`` after the
+    event, ``previous`` the item document before it (None for new items; pass
+    the existing document when an item id is written again, so its old holder
+    is decremented).
+    ``businesses`` maps the holders that are businesses to their document id
+    (see ``business_stats.business_holders``) so their dashboard counters are
+    updated too. Returns the event document.
+    """
+    now = datetime.utcnow()
+    day = now.strftime("%Y-%m-%d")
+    event = {
+        "qr_code_id": qr_code_id,
+        "type": event_type,
+        "from_holder": (previous or {}).get("owner_email"),
+        "to_holder": holder,
+        "from_status": (previous or {}).get("status"),
+        "status": status,
+        "actor": actor,
+        "day": day,
+        "created_at": now.isoformat() + "Z",
+    }
+    batch.set(client.collection(EVENTS_COLLECTION).document(), event)
+
+    count_field = COUNT_FIELDS[event_type]
+    stats = {
+        "qr_code_id": qr_code_id,
+        "events": firestore.Increment(1),
+        count_field: firestore.Increment(1),
+        "holder": holder,
+        "status": status,
+        "last_event": event_type,
+        "last_event_at": event["created_at"],
+    }
+    if event_type in CIRCULATION_EVENTS:
+        stats["circulation_count"] = firestore.Increment(1)
+    batch.set(client.collection(STATS_COLLECTION).document(qr_code_id), stats, merge=True)
+
+    # Move the item between holders' inventories (and in/out of "available")
+    for owner, delta in _inventory_deltas(previous, holder, status).items():
+        changed = {field: firestore.Increment(value) for field, value in delta.items() if value}
+        if changed:
+            changed["holder"] = owner
+            batch.set(client.collection(INVENTORY_COLLECTION).document(holder_key(owner)), changed, merge=True)
+
+    shard = random.randrange(THROUGHPUT_SHARDS)
+    batch.set(
+        client.collection(THROUGHPUT_COLLECTION).document(throughput_doc_id(day, shard)),
+        {"day": day, "shard": shard, "events": firestore.Increment(1), count_field: firestore.Increment(1)},
+        merge=True,
+    )
+
+    for business_id, counts in business_deltas(event_type, previous, holder, status, businesses or {}).items():
+        business_stats.stage(batch, client, business_id, when=now, **counts)
+    return event
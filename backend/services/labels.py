@@ -0,0 +1,188 @@
+"""Print-ready QR label sheets rendered on a process pool.
+
+QR and label rendering is CPU-bound PIL work that holds the GIL, so bulk jobs
+are split into page-sized chunks and fanned out to a ``ProcessPoolExecutor``;
+throughput scales with the number of worker processes (``LABEL_WORKERS``,
+default: one per core). Workers are started with the ``spawn`` method so they
+never inherit the parent's Firestore/gRPC state, and this module imports
+nothing heavier than qrcode/PIL, and those only once a label is rendered.
+
+Two artifacts are supported:
+
+- ``pdf``: one multi-page Letter sheet (``LABEL_COLUMNS`` x ``LABEL_ROWS`` per page)
+- ``zip``: one PNG per label, streamed as each chunk finishes
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Sequence, Tuple
+
+from services.qr import render_image
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageDraw
+
+LABEL_WORKERS = int(os.getenv("LABEL_WORKERS", "0")) or (os.cpu_count() or 1)
+LABEL_COLUMNS = int(os.getenv("LABEL_COLUMNS", "3"))
+LABEL_ROWS = int(os.getenv("LABEL_ROWS", "5"))
+LABELS_PER_PAGE = LABEL_COLUMNS * LABEL_ROWS
+
+# US Letter at 150 DPI
+PAGE_DPI = 150
+PAGE_SIZE = (int(8.5 * PAGE_DPI), int(11 * PAGE_DPI))
+PAGE_MARGIN = PAGE_DPI // 4
+LABEL_SIZE = (
+    (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // LABEL_COLUMNS,
+    (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // LABEL_ROWS,
+)
+CAPTION_HEIGHT = 44
+
+# (qr_code_id, caption)
+Label = Tuple[str, str]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        # Pillow without FreeType only ships the fixed bitmap font
+        return ImageFont.load_default()
+
+
+def _fit(draw: "ImageDraw.ImageDraw", text: str, font, width: int) -> str:
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def render_label(qr_code_id: str, caption: str) -> "Image.Image":
+    """One label: the item's QR code (same payload as the QR image route)
+    above its caption and id."""
+    from PIL import Image, ImageDraw
+
+    width, height = LABEL_SIZE
+    label = Image.new("L", LABEL_SIZE, 255)
+    side = min(width, height - CAPTION_HEIGHT)
+    code = render_image({"qr_code_id": qr_code_id}, border=2).convert("L")
+    code = code.resize((side, side), Image.NEAREST)
+    label.paste(code, ((width - side) // 2, 0))
+
+    draw = ImageDraw.Draw(label)
+    name_font, id_font = _font(18), _font(12)
+    y = side + 2
+    for text, font in ((caption, name_font), (qr_code_id, id_font)):
+        text = _fit(draw, text, font, width - 8)
+        draw.text(((width - draw.textlength(text, font=font)) / 2, y), text, fill=0, font=font)
+        y += 22
+    return label
+
+
+def _png(img: "Image.Image") -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=False)
+    return buf.getvalue()
+
+
+def render_page(labels: Sequence[Label]) -> bytes:
+    """Worker task: lay out up to LABELS_PER_PAGE labels on one page (PNG)."""
+    from PIL import Image
+
+    page = Image.new("L", PAGE_SIZE, 255)
+    for i, (qr_code_id, caption) in enumerate(labels):
+        row, col = divmod(i, LABEL_COLUMNS)
+        page.paste(render_label(qr_code_id, caption),
+                   (PAGE_MARGIN + col * LABEL_SIZE[0], PAGE_MARGIN + row * LABEL_SIZE[1]))
+    # Threshold to 1-bit: pages compress ~20x smaller in the PDF and print crisply
+    return _png(page.point(lambda v: 255 if v >= 128 else 0, "1"))
+
+
+def render_pngs(labels: Sequence[Label]) -> List[bytes]:
+    """Worker task: render each label as its own PNG."""
+    return [_png(render_label(qr_code_id, caption)) for qr_code_id, caption in labels]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=LABEL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _chunks(labels: Sequence[Label]) -> List[Sequence[Label]]:
+    return [labels[i:i + LABELS_PER_PAGE] for i in range(0, len(labels), LABELS_PER_PAGE)]
+
+
+def _submit(fn, labels: Sequence[Label]) -> List["asyncio.Future"]:
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    return [loop.run_in_executor(pool, fn, chunk) for chunk in _chunks(labels)]
+
+
+def _assemble_pdf(pages: List[bytes]) -> bytes:
+    from PIL import Image
+
+    images = [Image.open(io.BytesIO(page)) for page in pages]
+    buf = io.BytesIO()
+    images[0].save(buf, format="PDF", save_all=True, append_images=images[1:], resolution=PAGE_DPI)
+    return buf.getvalue()
+
+
+async def label_sheet_pdf(labels: Sequence[Label]) -> bytes:
+    """Render every page in parallel, then merge them into one PDF."""
+    pages = await asyncio.gather(*_submit(render_page, labels))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _assemble_pdf, list(pages))
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink that hands buffered bytes back to the stream."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf.extend(b)
+        return len(b)
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+async def label_zip_stream(labels: Sequence[Label]) -> AsyncIterator[bytes]:
+    """Yield a ZIP of ``<qr_code_id>.png`` files, chunk by chunk in input order,
+    while later chunks are still rendering."""
+    futures = _submit(render_pngs, labels)
+    sink = _Drain()
+    # PNGs are already compressed; storing them keeps the zip step cheap
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for chunk, future in zip(_chunks(labels), futures):
+            for (qr_code_id, _), png in zip(chunk, await future):
+                archive.writestr(f"{qr_code_id}.png", png)
+            yield sink.take()
+    yield sink.take()
@@ -0,0 +1,104 @@
+"""Application start-up, readiness and shutdown.
+
+Importing ``main`` only wires routes: the Firestore clients and the Firebase
+Admin app are ``db.lazy.Lazy`` stand-ins, and geopy, qrcode, PIL, passlib and
+the Cloudinary SDK are imported on first use. The app's lifespan calls
+``start()``, which builds the clients in a background thread
+(``STARTUP_WARMUP``, on by default), so the port is bound immediately and
+the first requests do not pay for credentials and channel set-up.
+
+``/healthz`` only says the process is up; ``/readyz`` answers 503 while the
+warm-up is still building a component of ``readiness()``. A failed warm-up
+is logged and reported there (503 too) until the component is built on its
+first use. Readiness looks at the clients themselves, so it holds wherever
+they get built: an app run without its lifespan, or with the warm-up off,
+builds them on first use and is ready.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from db import cloudinary_client, firestore_auth, firestore_client
+from services import labels
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_started_at: Optional[float] = None
+_warmup: Optional[threading.Thread] = None
+# component -> last warm-up error
+_errors: Dict[str, str] = {}
+
+
+def _warm_auth() -> None:
+    firestore_auth.initialize()
+    # Starts the signing certificate refresh, so the first login does not wait for it
+    from services import auth_tokens
+
+    auth_tokens.get_verifier()
+
+
+# component -> (warm-up, already built?)
+COMPONENTS: Dict[str, Tuple[Callable[[], None], Callable[[], bool]]] = {
+    "firestore": (firestore_client.initialize, firestore_client.initialized),
+    "auth": (_warm_auth, firestore_auth.initialized),
+}
+
+
+def warm_up() -> None:
+    """Build every component now; errors are recorded, not raised."""
+    for name, (initialize, _) in COMPONENTS.items():
+        began = time.perf_counter()
+        try:
+            initialize()
+        except Exception as e:
+            logger.error("Warm-up of %s failed: %s", name, e)
+            with _lock:
+                _errors[name] = f"{type(e).__name__}: {e}"
+            continue
+        with _lock:
+            _errors.pop(name, None)
+        logger.info("Warm-up of %s took %.0f ms", name, (time.perf_counter() - began) * 1000)
+
+
+def start() -> None:
+    """Called once from the app's lifespan, before it serves requests."""
+    global _started_at, _warmup
+    with _lock:
+        if _started_at is not None:
+            return
+        _started_at = time.time()
+        if STARTUP_WARMUP:
+            _warmup = threading.Thread(target=warm_up, name="startup-warmup", daemon=True)
+            _warmup.start()
+
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    """(ready, per-component state): "ok", "pending", "deferred" or the error."""
+    checks: Dict[str, Any] = {}
+    with _lock:
+        warming = _warmup is not None and _warmup.is_alive()
+        for name, (_, built) in COMPONENTS.items():
+            if built():
+                checks[name] = "ok"
+            elif name in _errors:
+                checks[name] = _errors[name]
+            elif warming:
+                checks[name] = "pending"
+            else:
+                # Built by the first request that needs it
+                checks[name] = "deferred"
+    ready = all(state in ("ok", "deferred") for state in checks.values())
+    return ready, checks
+
+
+async def shutdown() -> None:
+    """Called from the app's lifespan after the last request."""
+    await firestore_client.close()
+    cloudinary_client.shutdown()
+    labels.shutdown()
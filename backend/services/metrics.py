@@ -0,0 +1,562 @@
+"""Per-request instrumentation: route latency, backend calls and cache hit rates.
+
+``MetricsMiddleware`` times every request and opens a per-request scope (a
+context variable, inherited by the threadpool running sync routes) that the
+backend wrappers add to:
+
+- Firestore: ``instrument`` wraps the ``db``/``adb`` client objects the app
+  hands out (see db/firestore_client.py) in proxies that time the read/write
+  methods and hand out proxies of the references, queries, batches and
+  transactions they create; the library classes are left untouched, and
+  calls the library makes internally are not counted;
+- the Nominatim geocoder (``backend_call`` in services.geocoding) and
+  Cloudinary uploads (``timed`` on db.cloudinary_client.upload_file);
+- cache lookups via ``record_cache`` (geocode, identity aliases, ID tokens).
+
+``add_listener`` hooks into the same wrappers (services.query_profiler uses
+it to log every call with its call site in development).
+
+When the response starts, the scope so far is sent as a ``Server-Timing``
+header (``firestore;dur=12.4;desc="3 calls", ..., total;dur=15.1``); when the
+request ends it is folded into process-wide histograms; the per-request
+histograms observe 0 for a known backend the request did not call. ``GET /metrics``
+renders them in the Prometheus text format. Durations of concurrent calls are
+summed, so a request's backend time can exceed its wall time. Metrics are kept
+per process; every worker exposes its own.
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+
+# Backends seen by the wrappers; each request observes all of them
+_backends = set()
+
+
+# ----------------------------
+# Metric types (Prometheus text exposition)
+# ----------------------------
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [per-bucket counts..., sum, count]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with _lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, row in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(row[-2])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {row[-1]}"
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"),
+)
+BACKEND_CALL_DURATION = Histogram(
+    "backend_call_duration_seconds", "Latency of individual backend calls.", ("backend", "operation"),
+)
+BACKEND_CALL_ERRORS = Counter(
+    "backend_call_errors_total", "Backend calls that raised.", ("backend", "operation"),
+)
+REQUEST_BACKEND_CALLS = Histogram(
+    "http_request_backend_calls", "Backend calls made while serving one request.", ("route", "backend"), COUNT_BUCKETS,
+)
+REQUEST_BACKEND_SECONDS = Histogram(
+    "http_request_backend_seconds", "Summed backend call time of one request.", ("route", "backend"),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result (hit or miss).", ("cache", "result"),
+)
+
+_METRICS = (REQUEST_DURATION, BACKEND_CALL_DURATION, BACKEND_CALL_ERRORS, REQUEST_BACKEND_CALLS, REQUEST_BACKEND_SECONDS, CACHE_REQUESTS)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text format, plus a derived cache_hit_ratio gauge."""
+    lines = []
+    with _lock:
+        for metric in _METRICS:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        caches: Dict[str, Dict[str, float]] = {}
+        for (cache, result), value in CACHE_REQUESTS.values.items():
+            caches.setdefault(cache, {})[result] = value
+    lines.append("# HELP cache_hit_ratio Hits over lookups since start-up.")
+    lines.append("# TYPE cache_hit_ratio gauge")
+    for cache, counts in sorted(caches.items()):
+        total = counts.get("hit", 0) + counts.get("miss", 0)
+        lines.append(f'cache_hit_ratio{{cache="{_escape(cache)}"}} {_number(counts.get("hit", 0) / total if total else 0.0)}')
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------
+# Per-request scope
+# ----------------------------
+class RequestScope:
+    """Backend calls and cache lookups of one request (mutated from any thread)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls: Dict[str, list] = {}  # backend -> [count, seconds]
+        self.caches: Dict[str, list] = {}  # cache -> [hits, lookups]
+        self._lock = threading.Lock()
+
+    def add_call(self, backend: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.calls.setdefault(backend, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_cache(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            entry = self.caches.setdefault(cache, [0, 0])
+            entry[0] += int(hit)
+            entry[1] += 1
+
+    def server_timing(self) -> str:
+        with self._lock:
+            parts = [
+                f'{backend};dur={seconds * 1000:.1f};desc="{count} call{"" if count == 1 else "s"}"'
+                for backend, (count, seconds) in sorted(self.calls.items())
+            ]
+            parts += [f'{cache}-cache;desc="{hits}/{lookups} hits"' for cache, (hits, lookups) in sorted(self.caches.items())]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_scope: contextvars.ContextVar[Optional[RequestScope]] = contextvars.ContextVar("metrics_scope", default=None)
+# Set while a wrapped call runs, so calls it makes internally are not counted again
+_in_call: contextvars.ContextVar[bool] = contextvars.ContextVar("metrics_in_call", default=False)
+
+
+_listeners: List[Callable[[str, str, Any], Optional[Callable[[float], None]]]] = []
+
+
+def add_listener(listener: Callable[[str, str, Any], Optional[Callable[[float], None]]]) -> None:
+    """Call ``listener(backend, operation, target)`` as each (outermost) backend
+    call starts, ``target`` being the wrapped method's ``self`` if any. It may
+    return a callable that receives the call's duration in seconds."""
+    _listeners.append(listener)
+
+
+def _start(backend: str, operation: str, target: Any) -> Optional[List[Callable[[float], None]]]:
+    if not _listeners:
+        return None
+    return [done for done in (listener(backend, operation, target) for listener in _listeners) if done] or None
+
+
+def _register(backend: str) -> None:
+    if backend not in _backends:
+        with _lock:
+            _backends.add(backend)
+
+
+def _record(
+    backend: str,
+    operation: str,
+    seconds: float,
+    scope: Optional[RequestScope],
+    failed: bool = False,
+    done: Optional[List[Callable[[float], None]]] = None,
+) -> None:
+    BACKEND_CALL_DURATION.observe(seconds, backend, operation)
+    if failed:
+        BACKEND_CALL_ERRORS.inc(backend, operation)
+    if scope is not None:
+        scope.add_call(backend, seconds)
+    for callback in done or ():
+        callback(seconds)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    if not METRICS_ENABLED:
+        return
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+    scope = _scope.get()
+    if scope is not None:
+        scope.add_cache(cache, hit)
+
+
+@contextmanager
+def backend_call(backend: str, operation: str, target: Any = None):
+    """Time the enclosed block as one call to ``backend``."""
+    if not METRICS_ENABLED or _in_call.get():
+        yield
+        return
+    _register(backend)
+    done = _start(backend, operation, target)
+    token = _in_call.set(True)
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _in_call.reset(token)
+        _record(backend, operation, time.perf_counter() - started, _scope.get(), failed, done)
+
+
+# ----------------------------
+# Wrappers
+# ----------------------------
+class _TimedIterator:
+    """Counts a streamed result as one call, timed across its ``next`` calls."""
+
+    def __init__(self, inner, backend: str, operation: str, elapsed: float, scope: Optional[RequestScope], done=None):
+        self._inner = inner
+        self._backend = backend
+        self._operation = operation
+        self._elapsed = elapsed
+        self._scope = scope
+        self._callbacks = done
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = _in_call.set(True)
+        started = time.perf_counter()
+        try:
+            return next(self._inner)
+        except StopIteration:
+            self._finish()
+            raise
+        except BaseException:
+            self._finish(failed=True)
+            raise
+        finally:
+            self._elapsed += time.perf_counter() - started
+            _in_call.reset(token)
+
+    def _finish(self, failed: bool = False) -> None:
+        if not self._done:
+            self._done = True
+            _record(self._backend, self._operation, self._elapsed, self._scope, failed, self._callbacks)
+
+    def __del__(self):
+        self._finish()
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class _TimedAsyncIterator(_TimedIterator):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        token = _in_call.set(True)
+        started = time.perf_counter()
+        try:
+            return await self._inner.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        except BaseException:
+            self._finish(failed=True)
+            raise
+        finally:
+            self._elapsed += time.perf_counter() - started
+            _in_call.reset(token)
+
+
+async def _timed_await(coroutine, backend: str, operation: str, done) -> Any:
+    token = _in_call.set(True)
+    started = time.perf_counter()
+    failed = False
+    try:
+        return await coroutine
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _in_call.reset(token)
+        _record(backend, operation, time.perf_counter() - started, _scope.get(), failed, done)
+
+
+def timed(backend: str, operation: Optional[str] = None) -> Callable:
+    """Decorator recording each call of a function (sync, async, or returning
+    a sync/async iterator) as a call to ``backend``."""
+
+    _register(backend)
+
+    def decorate(fn: Callable) -> Callable:
+        op = operation or fn.__name__
+        if getattr(fn, "_metrics_wrapped", False):
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            def coroutine_wrapper(*args, **kwargs):
+                if not METRICS_ENABLED or _in_call.get():
+                    return fn(*args, **kwargs)
+                # Listeners see the call where the coroutine is created, so the
+                # caller is still on the stack even when it runs in a gather()
+                done = _start(backend, op, args[0] if args else None)
+                return _timed_await(fn(*args, **kwargs), backend, op, done)
+
+            coroutine_wrapper._metrics_wrapped = True
+            return coroutine_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED or _in_call.get():
+                return fn(*args, **kwargs)
+            done = _start(backend, op, args[0] if args else None)
+            token = _in_call.set(True)
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                _record(backend, op, time.perf_counter() - started, _scope.get(), True, done)
+                raise
+            finally:
+                _in_call.reset(token)
+            elapsed = time.perf_counter() - started
+            if hasattr(result, "__anext__"):
+                return _TimedAsyncIterator(result, backend, op, elapsed, _scope.get(), done)
+            if hasattr(result, "__next__"):
+                return _TimedIterator(result, backend, op, elapsed, _scope.get(), done)
+            _record(backend, op, elapsed, _scope.get(), done=done)
+            return result
+
+        wrapper._metrics_wrapped = True
+        return wrapper
+
+    return decorate
+
+
+class _Spec:
+    """Which methods of which client object kinds are timed, for one backend.
+    A kind is a class name without its ``Async`` prefix, matched along the MRO."""
+
+    def __init__(self, methods: Dict[str, Iterable[str]], backend: str):
+        self.methods = {kind: frozenset(names) for kind, names in methods.items()}
+        self.backend = backend
+        # type -> {method: operation label}, or None for types that are not wrapped
+        self._labels: Dict[type, Optional[Dict[str, str]]] = {}
+        # Keyed by the class attribute itself, so a method replaced later is wrapped afresh
+        self._timed: Dict[Tuple[Any, str], Callable] = {}
+        _register(backend)
+
+    def labels(self, cls: type) -> Optional[Dict[str, str]]:
+        try:
+            return self._labels[cls]
+        except KeyError:
+            pass
+        labels = None
+        prefix = "Async" if cls.__name__.startswith("Async") else ""
+        for base in cls.__mro__:
+            kind = base.__name__[5:] if base.__name__.startswith("Async") else base.__name__
+            if kind in self.methods:
+                labels = labels or {}
+                for name in self.methods[kind]:
+                    labels.setdefault(name, f"{prefix}{kind}.{name}")
+        self._labels[cls] = labels
+        return labels
+
+    def timed_method(self, cls: type, name: str) -> Optional[Callable]:
+        label = (self.labels(cls) or {}).get(name)
+        if label is None:
+            return None
+        method = getattr(cls, name)
+        key = (method, label)
+        fn = self._timed.get(key)
+        if fn is None:
+            fn = self._timed[key] = timed(self.backend, label)(method)
+        return fn
+
+    def wrap(self, value: Any) -> Any:
+        if value is None or isinstance(value, (str, int, float, bytes)) or self.labels(type(value)) is None:
+            return value
+        return _Instrumented(value, self)
+
+
+def _unwrap(value: Any) -> Any:
+    """The client object behind a proxy, also inside lists, tuples and generators
+    (e.g. the references given to ``get_all`` or an ``in`` filter)."""
+    if type(value) is _Instrumented:
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (list, tuple)) and any(type(v) is _Instrumented for v in value):
+        return type(value)(_unwrap(v) for v in value)
+    if isinstance(value, types.GeneratorType):
+        return (_unwrap(v) for v in value)
+    return value
+
+
+class _Instrumented:
+    """Proxy of a client, reference, query, batch or transaction. Timed methods
+    run through ``timed``; other methods and attributes pass through, and the
+    client objects they return are wrapped in turn. Arguments are unwrapped,
+    so the library only ever sees its own objects."""
+
+    __slots__ = ("_target", "_spec")
+
+    def __init__(self, target: Any, spec: _Spec):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_spec", spec)
+
+    def __getattr__(self, name: str) -> Any:
+        target = object.__getattribute__(self, "_target")
+        spec = object.__getattribute__(self, "_spec")
+        value = getattr(target, name)
+        if not callable(value) or isinstance(value, type):
+            return spec.wrap(value)
+        fn = spec.timed_method(type(target), name)
+        if fn is not None:
+            def call(*args, **kwargs):
+                return fn(target, *(_unwrap(a) for a in args), **{k: _unwrap(v) for k, v in kwargs.items()})
+        else:
+            def call(*args, **kwargs):
+                return spec.wrap(value(*(_unwrap(a) for a in args), **{k: _unwrap(v) for k, v in kwargs.items()}))
+        return call
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(object.__getattribute__(self, "_target"), name, value)
+
+    def __bool__(self) -> bool:
+        return bool(object.__getattribute__(self, "_target"))
+
+    def __len__(self) -> int:
+        return len(object.__getattribute__(self, "_target"))
+
+    def __eq__(self, other: Any) -> bool:
+        return object.__getattribute__(self, "_target") == _unwrap(other)
+
+    def __hash__(self) -> int:
+        return hash(object.__getattribute__(self, "_target"))
+
+    def __repr__(self) -> str:
+        return f"<instrumented {object.__getattribute__(self, '_target')!r}>"
+
+
+def instrument(target: Any, methods: Dict[str, Iterable[str]], backend: str) -> Any:
+    """Instrumented view of a client object. ``methods`` maps kinds (class
+    names, ``Async`` prefix dropped) to the methods that reach ``backend``;
+    the operation label is ``Kind.method``. The target itself is not changed,
+    and with metrics disabled it is returned as is."""
+    if not METRICS_ENABLED:
+        return target
+    return _Spec(methods, backend).wrap(target)
+
+
+# ----------------------------
+# Middleware
+# ----------------------------
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram, per-request backend call
+    histograms and the Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestScope()
+        token = _scope.set(request)
+        status = {"code": 500}
+        finished = {"at": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", request.server_timing().encode("latin-1")))
+                    message = dict(message, headers=headers)
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished["at"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _scope.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            ended = finished["at"] or time.perf_counter()
+            REQUEST_DURATION.observe(ended - request.started, scope["method"], path, str(status["code"]))
+            # Backends the request did not call count as 0 calls, 0 seconds
+            for backend in _backends | request.calls.keys():
+                count, seconds = request.calls.get(backend, (0, 0.0))
+                REQUEST_BACKEND_CALLS.observe(count, path, backend)
+                REQUEST_BACKEND_SECONDS.observe(seconds, path, backend)
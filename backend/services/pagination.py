@@ -0,0 +1,74 @@
+"""Opaque cursors shared by the paginated endpoints.
+
+List bodies stay plain JSON arrays; when more results are available the cursor
+for the next page is returned in the ``X-Next-Cursor`` response header.
+"""
+
+import base64
+import json
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Query, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(value: Any) -> str:
+    raw = json.dumps(value, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class PageParams:
+    """Query parameters shared by the paginated list routes (use with Depends())."""
+
+    def __init__(
+        self,
+        page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+        unpaginated: bool = Query(False, description="Admin tooling: return every document in one response"),
+    ):
+        self.page_size = page_size
+        self.cursor = cursor
+        self.unpaginated = unpaginated
+
+
+def paginate(query, response: Response, page: PageParams, order_field: Optional[str] = None) -> List[Any]:
+    """Return one page of ``query`` ordered by document id, or by ``order_field``
+    then document id.
+
+    Pages are fetched with Firestore ``start_after``/``limit``; the cursor is the
+    last document id of the previous page (with ``order_field``, its value and
+    the document id). ``page.unpaginated`` returns the whole result set and is
+    meant for admin tooling only.
+    """
+    if order_field:
+        query = query.order_by(order_field)
+    if page.unpaginated:
+        return list(query.stream())
+    query = query.order_by("__name__").limit(page.page_size)
+    if page.cursor:
+        last = decode_cursor(page.cursor)
+        if order_field:
+            if not (isinstance(last, list) and len(last) == 2 and isinstance(last[1], str)):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.start_after({order_field: last[0], "__name__": last[1]})
+        else:
+            if not isinstance(last, str):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.start_after({"__name__": last})
+    docs = list(query.stream())
+    if len(docs) == page.page_size:
+        last_doc = docs[-1]
+        last = [(last_doc.to_dict() or {}).get(order_field), last_doc.id] if order_field else last_doc.id
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last)
+    return docs
@@ -0,0 +1,194 @@
+"""Points ledger: atomic balance changes with an append-only audit trail.
+
+Balances stay in the ``points`` field of the profile document (tourists,
+businesses, retailers), so existing reads keep working, but they are never
+written as read-modify-write again:
+
+- credits are ``firestore.Increment`` writes, applied server-side, so
+  concurrent credits cannot overwrite each other and need no prior read;
+- debits run in a transaction that checks the balance first, so a balance can
+  never be spent twice (100 parallel pickups debit exactly 100 times);
+- every change appends a ``points_ledger`` document in the same batch or
+  transaction as the balance write.
+
+Accounts in ``POINTS_SHARDED_COLLECTIONS`` (popular drop-off businesses by
+default) are hot: their credits go to one of ``POINTS_SHARDS`` counter
+documents under ``<profile>/points_shards`` instead of the profile itself, which
+spreads the write rate. Their balance is ``points`` plus the shards: routes
+that return a profile add the shard totals on read (``include_shards``, one
+collection group query per 30 profiles), and ``fold_shards`` moves shard
+totals back into ``points`` to keep those queries small.
+
+``add_credit`` only stages writes on a ``WriteBatch`` so callers can commit
+the points change together with their own writes (sync or async client).
+"""
+
+import os
+import random
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from google.cloud import firestore
+
+from db.firestore_client import db, transactional
+
+LEDGER_COLLECTION = "points_ledger"
+SHARDS_SUBCOLLECTION = "points_shards"
+NUM_SHARDS = int(os.getenv("POINTS_SHARDS", "10"))
+SHARDED_COLLECTIONS = frozenset(
+    c.strip() for c in os.getenv("POINTS_SHARDED_COLLECTIONS", "businesses").split(",") if c.strip()
+)
+# Firestore caps the number of values in an "in" filter
+_IN_QUERY_LIMIT = 30
+
+
+class InsufficientPoints(Exception):
+    def __init__(self, balance: int, required: int):
+        super().__init__(f"Not enough points: balance {balance}, required {required}")
+        self.balance = balance
+        self.required = required
+
+
+def _ledger_entry(collection: str, doc_id: str, delta: int, reason: str, ref: Optional[str], **extra: Any) -> Dict[str, Any]:
+    entry = {
+        "account": f"{collection}/{doc_id}",
+        "collection": collection,
+        "doc_id": doc_id,
+        "delta": delta,
+        "reason": reason,
+        "ref": ref,
+        "created_at": firestore.SERVER_TIMESTAMP,
+    }
+    entry.update(extra)
+    return entry
+
+
+def add_credit(batch, client, collection: str, doc_id: str, amount: int, reason: str, ref: Optional[str] = None) -> None:
+    """Stage ``amount`` points for ``collection/doc_id`` plus its ledger entry on
+    ``batch``; ``client`` is the (sync or async) client that owns the batch.
+    The profile document must exist."""
+    profile = client.collection(collection).document(doc_id)
+    if collection in SHARDED_COLLECTIONS:
+        shard = profile.collection(SHARDS_SUBCOLLECTION).document(str(random.randrange(NUM_SHARDS)))
+        batch.set(shard, {"points": firestore.Increment(amount), "account": f"{collection}/{doc_id}"}, merge=True)
+    else:
+        batch.update(profile, {"points": firestore.Increment(amount)})
+    batch.set(client.collection(LEDGER_COLLECTION).document(), _ledger_entry(collection, doc_id, amount, reason, ref))
+
+
+def _shard_total(profile, transaction=None) -> int:
+    shards = profile.collection(SHARDS_SUBCOLLECTION)
+    docs = shards.get(transaction=transaction) if transaction is not None else shards.stream()
+    return sum(int((doc.to_dict() or {}).get("points", 0) or 0) for doc in docs)
+
+
+def shard_totals(collection: str, doc_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Unfolded shard points per document id of a sharded collection.
+
+    With ``doc_ids`` this costs ceil(len / 30) collection group queries; without,
+    one stream of every shard (index builds and exports). Empty, with no
+    Firestore call, for collections that are not sharded.
+    """
+    totals: Dict[str, int] = defaultdict(int)
+    if collection not in SHARDED_COLLECTIONS:
+        return totals
+    shards = db.collection_group(SHARDS_SUBCOLLECTION)
+    if doc_ids is None:
+        queries = [shards]
+    else:
+        accounts = sorted({f"{collection}/{doc_id}" for doc_id in doc_ids})
+        queries = [
+            shards.where("account", "in", accounts[i:i + _IN_QUERY_LIMIT])
+            for i in range(0, len(accounts), _IN_QUERY_LIMIT)
+        ]
+    for query in queries:
+        for shard in query.stream():
+            profile = shard.reference.parent.parent
+            if profile is not None and profile.parent.id == collection:
+                totals[profile.id] += int((shard.to_dict() or {}).get("points", 0) or 0)
+    return totals
+
+
+def include_shards(collection: str, profiles: Dict[str, Dict[str, Any]], totals: Optional[Dict[str, int]] = None) -> None:
+    """Add unfolded shard points to the ``points`` field of profile dicts
+    (document id -> data), in place. ``totals`` defaults to a lookup of just
+    these profiles."""
+    if collection not in SHARDED_COLLECTIONS or not profiles:
+        return
+    if totals is None:
+        totals = shard_totals(collection, profiles)
+    for doc_id, data in profiles.items():
+        if data is not None and totals.get(doc_id):
+            data["points"] = int(data.get("points", 0) or 0) + totals[doc_id]
+
+
+def balance(collection: str, doc_id: str) -> int:
+    profile = db.collection(collection).document(doc_id)
+    snap = profile.get()
+    points = int((snap.to_dict() or {}).get("points", 0) or 0) if snap.exists else 0
+    if collection in SHARDED_COLLECTIONS:
+        points += _shard_total(profile)
+    return points
+
+
+def debit(
+    collection: str,
+    doc_id: str,
+    amount: int,
+    reason: str,
+    ref: Optional[str] = None,
+    also: Optional[Callable[[Any], None]] = None,
+) -> int:
+    """Spend ``amount`` points if the balance allows it; returns the new balance.
+
+    Runs in a transaction, so concurrent debits are serialized by Firestore and
+    retried instead of overdrawing. ``also(transaction)`` runs once the balance
+    is checked and before the debit is staged, so it may still read through
+    the transaction (e.g. the item being claimed) and raise to abort, and it may
+    stage further writes that commit atomically with the debit.
+    Raises LookupError for a missing account and InsufficientPoints.
+    """
+    profile = db.collection(collection).document(doc_id)
+
+    @transactional
+    def _run(transaction):
+        snap = profile.get(transaction=transaction)
+        if not snap.exists:
+            raise LookupError(f"{collection}/{doc_id} not found")
+        current = int((snap.to_dict() or {}).get("points", 0) or 0)
+        if collection in SHARDED_COLLECTIONS:
+            current += _shard_total(profile, transaction)
+        if current < amount:
+            raise InsufficientPoints(current, amount)
+        # Firestore transactions read everything before the first write
+        if also is not None:
+            also(transaction)
+        transaction.update(profile, {"points": firestore.Increment(-amount)})
+        transaction.set(
+            db.collection(LEDGER_COLLECTION).document(),
+            _ledger_entry(collection, doc_id, -amount, reason, ref, balance_after=current - amount),
+        )
+        return current - amount
+
+    return _run(db.transaction())
+
+
+def fold_shards(collection: str, doc_id: str) -> int:
+    """Move a sharded account's shard totals into its ``points`` field, so list
+    and nearby views show the full balance. Returns the points moved."""
+    profile = db.collection(collection).document(doc_id)
+    shards = profile.collection(SHARDS_SUBCOLLECTION)
+
+    @transactional
+    def _run(transaction):
+        moved = 0
+        for shard in shards.get(transaction=transaction):
+            value = int((shard.to_dict() or {}).get("points", 0) or 0)
+            if value:
+                transaction.update(shard.reference, {"points": firestore.Increment(-value)})
+                moved += value
+        if moved:
+            transaction.update(profile, {"points": firestore.Increment(moved)})
+        return moved
+
+    return _run(db.transaction())
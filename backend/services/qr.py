@@ -0,0 +1,173 @@
+"""Shared QR code rendering with a content-addressed cache.
+
+A QR image depends only on its payload, so rendered PNGs are keyed by the
+SHA-256 of the canonical payload JSON. The digest doubles as the HTTP ETag.
+Lookups hit an in-process LRU first, then (when ``QR_CACHE_DIR`` is set) a
+directory of ``<digest>.png`` files shared by every worker on the host, and
+only then render with qrcode/PIL.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "1024"))
+# Optional persistent store; unset keeps the cache in memory only
+CACHE_DIR = os.getenv("QR_CACHE_DIR") or None
+
+PNG_MEDIA_TYPE = "image/png"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Digest prefix carried in versioned image URLs
+VERSION_LENGTH = 16
+
+
+def canonical_payload(payload: Dict[str, Any]) -> str:
+    """JSON text encoded in the QR code. Keys are sorted so equal payloads
+    always produce the same image and digest."""
+    return json.dumps(payload, sort_keys=True)
+
+
+def payload_digest(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_payload(payload).encode()).hexdigest()
+
+
+def render_image(payload: Dict[str, Any], box_size: int = 10, border: int = 5):
+    """Render the QR code for ``payload`` as a PIL image (uncached, CPU-bound)."""
+    import qrcode  # deferred: only needed on a cache miss
+
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(canonical_payload(payload))
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").get_image()
+
+
+def render_png(payload: Dict[str, Any]) -> bytes:
+    """Render a QR code PNG for ``payload`` (uncached, CPU-bound)."""
+    img = render_image(payload)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class _LRU:
+    """Small thread-safe LRU of rendered PNGs."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._data.get(key)
+            if png is not None:
+                self._data.move_to_end(key)
+            return png
+
+    def put(self, key: str, png: bytes) -> None:
+        with self._lock:
+            self._data[key] = png
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _FileStore:
+    """Content-addressed PNG files; entries never go stale."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + ".png")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._file(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("QR cache read failed: %s", e)
+            return None
+
+    def put(self, key: str, png: bytes) -> None:
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            os.replace(tmp, self._file(key))
+        except OSError as e:
+            logger.warning("QR cache write failed: %s", e)
+
+
+_memory = _LRU(CACHE_SIZE)
+_store = _FileStore(CACHE_DIR) if CACHE_DIR else None
+
+
+def qr_png(payload: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Return ``(png_bytes, digest)`` for ``payload``, rendering at most once per
+    payload per process (once per host with a persistent store)."""
+    key = payload_digest(payload)
+    png = _memory.get(key)
+    if png is not None:
+        return png, key
+    if _store is not None:
+        png = _store.get(key)
+    if png is None:
+        png = render_png(payload)
+        if _store is not None:
+            _store.put(key, png)
+    _memory.put(key, png)
+    return png, key
+
+
+def qr_base64(payload: Dict[str, Any]) -> Optional[str]:
+    """Base64 PNG for clients that still embed the image in JSON.
+    CPU-bound on a cache miss; call through run_in_threadpool from async handlers."""
+    try:
+        png, _ = qr_png(payload)
+        return base64.b64encode(png).decode()
+    except Exception as e:
+        print("QR code generation failed:", e)
+        return None
+
+
+def qr_url(path: str, payload: Dict[str, Any]) -> str:
+    """Versioned image URL: ``?v=`` pins the payload digest, which lets the
+    image route mark the response immutable."""
+    return f"{path}?v={payload_digest(payload)[:VERSION_LENGTH]}"
+
+
+def png_response(request: Request, payload: Dict[str, Any], version: Optional[str] = None) -> Response:
+    """Serve the QR PNG for ``payload`` with a strong ETag.
+
+    When ``version`` matches the payload digest the URL itself is content
+    addressed, so it is cached as immutable; otherwise clients revalidate and
+    get a 304 while the payload is unchanged.
+    """
+    png, digest = qr_png(payload)
+    etag = f'"{digest}"'
+    immutable = version == digest[:VERSION_LENGTH]
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type=PNG_MEDIA_TYPE, headers=headers)
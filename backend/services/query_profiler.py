@@ -0,0 +1,307 @@
+"""Development profiler for backend fan-out (N+1 queries).
+
+With ``QUERY_PROFILING=true`` every backend call that services.metrics sees
+(Firestore client methods, Nominatim lookups, Cloudinary uploads) is recorded
+for the request that made it, together with its call site in this code base
+and a *shape*: the operation plus the collection path with document ids
+replaced by ``*`` and the filtered fields, but none of the values, e.g.
+
+    firestore Query.stream businesses[email ==]
+    firestore DocumentReference.get items/*
+
+A shape repeated ``QUERY_PROFILING_REPEAT_THRESHOLD`` or more times within one
+request is reported as an N+1 suspect (logged as a warning). Per-endpoint
+aggregates are served by ``GET /debug/query-profile`` (``format=text`` for a
+readable table) and reset by ``DELETE /debug/query-profile``; the
+``testing.query_budget`` pytest plugin checks them against declared budgets.
+
+Recording walks the stack on every call, so keep it off in production. It
+relies on the metrics wrappers, so METRICS_ENABLED must stay on.
+"""
+
+import contextvars
+import logging
+import os
+import sys
+import threading
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILING = os.getenv("QUERY_PROFILING", "false").lower() in ("1", "true", "yes")
+REPEAT_THRESHOLD = int(os.getenv("QUERY_PROFILING_REPEAT_THRESHOLD", "3"))
+HISTORY_SIZE = int(os.getenv("QUERY_PROFILING_HISTORY", "1000"))
+STACK_DEPTH = 3
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames in these files are plumbing, never the call site
+_SKIP_FILES = frozenset(
+    os.path.join(BASE_DIR, path)
+    for path in ("services/metrics.py", "services/query_profiler.py", "db/local_store.py", "db/firestore_client.py")
+)
+
+
+# ----------------------------
+# Shapes and call sites
+# ----------------------------
+def _template(parts) -> str:
+    """Collection path with document ids replaced: ("items", "abc") -> "items/*"."""
+    return "/".join(part if i % 2 == 0 else "*" for i, part in enumerate(parts))
+
+
+def _filters(query: Any) -> List[str]:
+    found = []
+    for entry in getattr(query, "_filters", None) or ():
+        # Local backend: (field, op, value)
+        found.append(f"{entry[0]} {entry[1]}")
+    for entry in getattr(query, "_field_filters", None) or ():
+        # google-cloud-firestore: FieldFilter / UnaryFilter / CompositeFilter protos
+        field = getattr(getattr(entry, "field", None), "field_path", None)
+        op = getattr(getattr(entry, "op", None), "name", None)
+        found.append(f"{field} {op}" if field else type(entry).__name__)
+    return sorted(found)
+
+
+def describe(target: Any) -> str:
+    """Path template (and filtered fields) of a client object; "" for clients and batches."""
+    # Local async facades wrap the sync object
+    for attr in ("_ref", "_query"):
+        inner = getattr(target, attr, None)
+        if inner is not None and not callable(inner):
+            target = inner
+            break
+    # google references and local queries have _path, a google query's
+    # collection is its parent reference, a local document only has path
+    raw = getattr(target, "_path", None)
+    if raw is None:
+        raw = getattr(getattr(target, "_parent", None), "_path", None)
+    if raw is None:
+        raw = getattr(target, "path", None)
+    if not raw:
+        return ""
+    parts = raw.split("/") if isinstance(raw, str) else list(raw)
+    template = _template(parts)
+    if getattr(target, "_all_descendants", False):
+        template = "**/" + parts[-1]
+    filters = _filters(target)
+    return f"{template}[{', '.join(filters)}]" if filters else template
+
+
+def call_site() -> List[str]:
+    """Innermost frames of this code base, outside the client plumbing."""
+    sites = []
+    frame = sys._getframe(2)
+    while frame is not None and len(sites) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(BASE_DIR) and filename not in _SKIP_FILES and "site-packages" not in filename:
+            sites.append(f"{os.path.relpath(filename, BASE_DIR)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return sites
+
+
+# ----------------------------
+# Per-request profiles
+# ----------------------------
+class Profile:
+    """Backend calls of one request (or of a ``capture`` block)."""
+
+    def __init__(self, endpoint: str = "(none)"):
+        self.endpoint = endpoint
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def counts(self) -> Dict[str, int]:
+        return dict(Counter(call["backend"] for call in self.calls))
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> List[Dict[str, Any]]:
+        """Shapes issued at least ``threshold`` times, most repeated first."""
+        by_shape: Dict[str, List[Dict[str, Any]]] = {}
+        for call in self.calls:
+            by_shape.setdefault(call["shape"], []).append(call)
+        found = []
+        for shape, calls in by_shape.items():
+            if len(calls) >= threshold:
+                sites = Counter(call["site"][0] if call["site"] else "(unknown)" for call in calls)
+                found.append({"shape": shape, "count": len(calls), "sites": [site for site, _ in sites.most_common()]})
+        return sorted(found, key=lambda entry: -entry["count"])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "calls": len(self.calls),
+            "by_backend": self.counts(),
+            "repeated": self.repeated(),
+            "log": [dict(call) for call in self.calls],
+        }
+
+
+_current: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("query_profile", default=None)
+_lock = threading.Lock()
+# Finished profiles, newest last, and their running sequence number
+_history: Deque[Profile] = deque(maxlen=HISTORY_SIZE)
+_finished = 0
+_endpoints: Dict[str, Dict[str, Any]] = {}
+
+
+def _listener(backend: str, operation: str, target: Any) -> Optional[Callable[[float], None]]:
+    profile = _current.get()
+    if profile is None:
+        return None
+    where = describe(target) if backend == "firestore" else ""
+    call = {
+        "backend": backend,
+        "operation": operation,
+        "shape": " ".join(part for part in (backend, operation, where) if part),
+        "site": call_site(),
+        "ms": None,
+    }
+    profile.add(call)
+
+    def done(seconds: float) -> None:
+        call["ms"] = round(seconds * 1000, 3)
+
+    return done
+
+
+def _aggregate(profile: Profile) -> None:
+    global _finished
+    repeated = profile.repeated()
+    with _lock:
+        _history.append(profile)
+        _finished += 1
+        stats = _endpoints.setdefault(profile.endpoint, {"requests": 0, "calls": 0, "max_calls": 0, "by_backend": {}, "repeated": {}})
+        stats["requests"] += 1
+        stats["calls"] += len(profile.calls)
+        stats["max_calls"] = max(stats["max_calls"], len(profile.calls))
+        for backend, count in profile.counts().items():
+            stats["by_backend"][backend] = max(stats["by_backend"].get(backend, 0), count)
+        for entry in repeated:
+            seen = stats["repeated"].setdefault(entry["shape"], {"requests": 0, "max_count": 0, "sites": []})
+            seen["requests"] += 1
+            seen["max_count"] = max(seen["max_count"], entry["count"])
+            seen["sites"] = list(dict.fromkeys(seen["sites"] + entry["sites"]))
+    for entry in repeated:
+        logger.warning("N+1 suspect in %s: %s issued %d times (%s)", profile.endpoint, entry["shape"], entry["count"], ", ".join(entry["sites"]))
+
+
+def finished_count() -> int:
+    """Number of profiles finished so far; pass to ``profiles_since``."""
+    with _lock:
+        return _finished
+
+
+def profiles_since(count: int) -> List[Profile]:
+    """Profiles finished after ``finished_count()`` returned ``count``."""
+    with _lock:
+        new = _finished - count
+        return list(_history)[-new:] if new > 0 else []
+
+
+def report() -> Dict[str, Any]:
+    """Per-endpoint aggregates, most backend calls per request first."""
+    with _lock:
+        endpoints = []
+        for endpoint, stats in _endpoints.items():
+            endpoints.append({
+                "endpoint": endpoint,
+                "requests": stats["requests"],
+                "mean_calls": round(stats["calls"] / stats["requests"], 2),
+                "max_calls": stats["max_calls"],
+                "max_by_backend": dict(stats["by_backend"]),
+                "repeated": [dict(shape=shape, **seen) for shape, seen in sorted(stats["repeated"].items(), key=lambda kv: -kv[1]["max_count"])],
+            })
+    endpoints.sort(key=lambda entry: -entry["mean_calls"])
+    return {"repeat_threshold": REPEAT_THRESHOLD, "endpoints": endpoints}
+
+
+def format_report(data: Optional[Dict[str, Any]] = None) -> str:
+    data = data or report()
+    lines = [f"{'endpoint':<52} {'requests':>8} {'mean':>7} {'max':>5}  max by backend"]
+    for entry in data["endpoints"]:
+        backends = ", ".join(f"{name}={count}" for name, count in sorted(entry["max_by_backend"].items()))
+        lines.append(f"{entry['endpoint']:<52} {entry['requests']:>8} {entry['mean_calls']:>7} {entry['max_calls']:>5}  {backends}")
+        for seen in entry["repeated"]:
+            lines.append(f"    N+1 suspect: {seen['shape']} up to {seen['max_count']}x in {seen['requests']} request(s)")
+            for site in seen["sites"]:
+                lines.append(f"        at {site}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _history.clear()
+        _endpoints.clear()
+
+
+class capture:
+    """Record the backend calls of a block outside a request (scripts, tests)::
+
+        with query_profiler.capture("backfill") as profile:
+            ...
+        profile.repeated()
+    """
+
+    def __init__(self, endpoint: str = "(capture)"):
+        self.profile = Profile(endpoint)
+        self._token = None
+
+    def __enter__(self) -> Profile:
+        enable()
+        self._token = _current.set(self.profile)
+        return self.profile
+
+    def __exit__(self, *exc) -> bool:
+        _current.reset(self._token)
+        _aggregate(self.profile)
+        return False
+
+
+_enabled = False
+
+
+def enable() -> None:
+    """Start listening to backend calls (idempotent)."""
+    global _enabled
+    with _lock:
+        if not _enabled:
+            metrics.add_listener(_listener)
+            _enabled = True
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware opening a profile per request and reporting it when the
+    request ends; the response carries the call count so far in X-Query-Count."""
+
+    def __init__(self, app):
+        self.app = app
+        enable()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile()
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(len(profile.calls)).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            profile.endpoint = f"{scope['method']} {route}"
+            _aggregate(profile)
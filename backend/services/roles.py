@@ -0,0 +1,55 @@
+"""Role custom claims: where a user's profile document lives.
+
+Every account carries two Firebase custom claims, set at registration (and by
+``scripts/migrate_role_claims.py`` for older accounts):
+
+- ``role``: "business", "retailer" or "tourist"
+- ``profile_path``: the canonical profile document, e.g. ``businesses/<uid>``
+
+They ride along in every ID token, so ``/login/profile`` can answer from the
+verified token alone or with a single document read, instead of probing the
+three profile collections.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from db.firestore_auth import auth
+
+logger = logging.getLogger(__name__)
+
+ROLE_CLAIM = "role"
+PROFILE_PATH_CLAIM = "profile_path"
+ROLES = ("business", "retailer", "tourist")
+
+# Profile collection per role
+ROLE_COLLECTIONS = {"business": "businesses", "retailer": "retailers", "tourist": "tourists"}
+
+
+def profile_path(role: str, doc_id: str) -> str:
+    return f"{ROLE_COLLECTIONS[role]}/{doc_id}"
+
+
+def role_from_claims(claims: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """``{"role", "profile_path"}`` from decoded token claims, or None if the
+    token predates the claims."""
+    role = claims.get(ROLE_CLAIM)
+    path = claims.get(PROFILE_PATH_CLAIM)
+    if role in ROLES and isinstance(path, str) and path:
+        return {"role": role, "profile_path": path}
+    return None
+
+
+def set_role_claims(uid: str, role: str, doc_id: str, existing: Optional[Dict[str, Any]] = None) -> bool:
+    """Store the role claims on the Firebase user, keeping any other custom
+    claims in ``existing``. Best effort: returns False (and logs) on failure,
+    since get_profile still falls back to probing the collections."""
+    claims = dict(existing or {})
+    claims[ROLE_CLAIM] = role
+    claims[PROFILE_PATH_CLAIM] = profile_path(role, doc_id)
+    try:
+        auth.set_custom_user_claims(uid, claims)
+        return True
+    except Exception as e:
+        logger.warning("Could not set role claims for %s: %s", uid, e)
+        return False
@@ -0,0 +1,388 @@
+"""In-memory spatial index behind the /nearby endpoints.
+
+Points are bucketed into fixed lat/lng grid cells (about 5 km at the default
+cell size). A k-nearest query searches rings of cells outward from the origin
+and stops once no unvisited cell can hold anything closer than the current
+k-th result, so only nearby candidates are touched. Distances for each ring are
+computed in one NumPy pass over per-cell coordinate arrays. Radius queries stop at the
+first ring that lies entirely outside the radius.
+
+Three live indexes are kept: ``businesses`` and ``retailers`` (keyed by
+document id) and ``items`` (keyed by qr_code_id, located at the owning
+business). Each is loaded from Firestore on first use, updated in place by the
+write paths through the ``index_*``/``remove_*`` hooks, and rebuilt after
+SPATIAL_INDEX_MAX_AGE_SECONDS so writes made by other workers show up. Rebuilds
+run on a background thread while the previous index keeps serving; hook writes
+made during a rebuild are replayed onto the new index before it is swapped in.
+Longitude wrap-around at the antimeridian is not handled.
+"""
+
+import logging
+import os
+import threading
+import time
+from math import asin, cos, floor, radians, sin, sqrt
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from db.firestore_client import db
+from services import points
+from services.geo import EARTH_RADIUS_KM, KM_PER_DEGREE_LAT, haversine_km_many, k_smallest
+from services.pagination import decode_cursor, encode_cursor
+
+CELL_DEG = float(os.getenv("SPATIAL_INDEX_CELL_DEG", "0.05"))
+MAX_AGE_SECONDS = float(os.getenv("SPATIAL_INDEX_MAX_AGE_SECONDS", "300"))
+# Wait before retrying a failed background rebuild
+REBUILD_RETRY_SECONDS = 30.0
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+
+class Hit(NamedTuple):
+    distance_km: float
+    key: str
+    payload: Dict[str, Any]
+
+
+class SpatialIndex:
+    """Grid index supporting k-nearest and radius queries."""
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self._points: Dict[str, Tuple[float, float, Dict[str, Any]]] = {}
+        self._cells: Dict[Cell, Dict[str, Tuple[float, float]]] = {}
+        # (keys, lats, lngs) per cell, rebuilt lazily after the cell changes
+        self._arrays: Dict[Cell, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # Bounding box of occupied cells; only grows until the index is rebuilt
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return floor(lat / self.cell_deg), floor(lng / self.cell_deg)
+
+    def upsert(self, key: str, lat: float, lng: float, payload: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self.remove(key)
+            lat, lng = float(lat), float(lng)
+            cell = self._cell(lat, lng)
+            self._points[key] = (lat, lng, payload or {})
+            self._cells.setdefault(cell, {})[key] = (lat, lng)
+            self._arrays.pop(cell, None)
+            i, j = cell
+            if self._bounds is None:
+                self._bounds = (i, i, j, j)
+            else:
+                min_i, max_i, min_j, max_j = self._bounds
+                self._bounds = (min(min_i, i), max(max_i, i), min(min_j, j), max(max_j, j))
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            existing = self._points.pop(key, None)
+            if existing is None:
+                return
+            cell = self._cell(existing[0], existing[1])
+            self._arrays.pop(cell, None)
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[cell]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        point = self._points.get(key)
+        return point[2] if point else None
+
+    def _cell_arrays(self, cell: Cell) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(cell)
+        if arrays is None:
+            bucket = self._cells.get(cell)
+            if not bucket:
+                return None
+            keys = np.array(list(bucket), dtype=object)
+            coords = np.array(list(bucket.values()), dtype=np.float64)
+            arrays = (keys, coords[:, 0], coords[:, 1])
+            self._arrays[cell] = arrays
+        return arrays
+
+    def _ring(self, ci: int, cj: int, r: int) -> Iterator[Cell]:
+        """Cells at Chebyshev distance exactly r from (ci, cj)."""
+        if r == 0:
+            yield ci, cj
+            return
+        if 8 * r > len(self._cells):
+            # Sparse grid: cheaper to filter the occupied cells than walk the perimeter
+            for i, j in list(self._cells):
+                if max(abs(i - ci), abs(j - cj)) == r:
+                    yield i, j
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield ci - r, j
+            yield ci + r, j
+        for i in range(ci - r + 1, ci + r):
+            yield i, cj - r
+            yield i, cj + r
+
+    def _outside_bound_km(self, lat: float, lng: float, ci: int, cj: int, r: int) -> float:
+        """Lower bound on the distance from the origin to any point outside the
+        block of cells within ring r."""
+        south, north = (ci - r) * self.cell_deg, (ci + r + 1) * self.cell_deg
+        west, east = (cj - r) * self.cell_deg, (cj + r + 1) * self.cell_deg
+        lat_km = min(lat - south, north - lat) * KM_PER_DEGREE_LAT
+        # Points in the same latitude band but beyond the east/west edge
+        cos_band = cos(radians(min(90.0, max(abs(south), abs(north)))))
+        dlng = radians(min(lng - west, east - lng))
+        h = sqrt(max(0.0, cos(radians(lat)) * cos_band)) * sin(dlng / 2)
+        lng_km = 2 * EARTH_RADIUS_KM * asin(min(1.0, h))
+        return min(lat_km, lng_km)
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        radius_km: Optional[float] = None,
+        after: Optional[Sequence[Any]] = None,
+    ) -> List[Hit]:
+        """Return up to k hits ordered by (distance, key).
+
+        ``after`` is the (distance_km, key) of the last hit of a previous page;
+        only hits strictly after it are returned.
+        """
+        if k <= 0:
+            return []
+        after_key = (float(after[0]), str(after[1])) if after else None
+        with self._lock:
+            if not self._points or self._bounds is None:
+                return []
+            ci, cj = self._cell(lat, lng)
+            min_i, max_i, min_j, max_j = self._bounds
+            max_r = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj, 0)
+
+            best_keys = np.empty(0, dtype=object)
+            best_d = np.empty(0, dtype=np.float64)
+            for r in range(max_r + 1):
+                ring = [a for a in (self._cell_arrays(c) for c in self._ring(ci, cj, r)) if a is not None]
+                if ring:
+                    keys = np.concatenate([a[0] for a in ring])
+                    d = haversine_km_many(lat, lng, np.concatenate([a[1] for a in ring]), np.concatenate([a[2] for a in ring]))
+                    mask = np.ones(len(d), dtype=bool)
+                    if radius_km is not None:
+                        mask &= d <= radius_km
+                    if after_key is not None:
+                        mask &= (d > after_key[0]) | ((d == after_key[0]) & (keys > after_key[1]))
+                    best_keys = np.concatenate([best_keys, keys[mask]])
+                    best_d = np.concatenate([best_d, d[mask]])
+                    if len(best_d) > k:
+                        # Keep the k nearest (plus ties, so key order stays exact for cursors)
+                        kth = best_d[k_smallest(best_d, k)[-1]]
+                        keep = best_d <= kth
+                        best_keys, best_d = best_keys[keep], best_d[keep]
+
+                bound = self._outside_bound_km(lat, lng, ci, cj, r)
+                if radius_km is not None and bound > radius_km:
+                    break
+                if len(best_d) >= k and best_d.max() <= bound:
+                    break
+
+            best = sorted(zip(best_d.tolist(), best_keys.tolist()))[:k]
+            return [Hit(d, key, self._points[key][2]) for d, key in best]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Hit]:
+        """All hits within radius_km, nearest first."""
+        return self.nearest(lat, lng, len(self._points), radius_km=radius_km)
+
+
+def hit_cursor(hit: Hit) -> str:
+    """Cursor for the page that starts after ``hit``."""
+    return encode_cursor([hit.distance_km, hit.key])
+
+
+def parse_hit_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+    if not cursor:
+        return None
+    value = decode_cursor(cursor)
+    try:
+        distance_km, key = value
+        return float(distance_km), str(key)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ----------------------------
+# Live indexes loaded from Firestore
+# ----------------------------
+def _has_coords(data: Optional[Dict[str, Any]]) -> bool:
+    return bool(data) and data.get("lat") is not None and data.get("lng") is not None
+
+
+def _owner_payload(doc_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not _has_coords(data) or not data.get("name") or not data.get("email") or not data.get("address"):
+        return None
+    return {
+        "id": doc_id,
+        "name": data["name"],
+        "email": data["email"],
+        "address": data["address"],
+        "points": data.get("points", 0),
+    }
+
+
+def _load_owners(collection: str, index: SpatialIndex) -> None:
+    # Balances of sharded accounts include their unfolded shards
+    totals = points.shard_totals(collection)
+    for doc in db.collection(collection).stream():
+        data = doc.to_dict() or {}
+        points.include_shards(collection, {doc.id: data}, totals)
+        payload = _owner_payload(doc.id, data)
+        if payload:
+            index.upsert(doc.id, data["lat"], data["lng"], payload)
+
+
+def _load_items(index: SpatialIndex) -> None:
+    owners = {}
+    for doc in db.collection("businesses").stream():
+        data = doc.to_dict() or {}
+        if data.get("email") and _has_coords(data):
+            owners[data["email"]] = data
+    for doc in db.collection("items").stream():
+        raw = doc.to_dict() or {}
+        owner = owners.get(raw.get("owner_email"))
+        if owner:
+            index.upsert(doc.id, owner["lat"], owner["lng"], {"owner_email": raw["owner_email"]})
+
+
+class _LiveIndex:
+    def __init__(self, name: str, loader: Callable[[SpatialIndex], None]):
+        self._name = name
+        self._loader = loader
+        self._index: Optional[SpatialIndex] = None
+        self._loaded_at = 0.0
+        # Guards _index and _pending; _build_lock allows one build at a time
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Hook writes made while a build runs (None when no build is running)
+        self._pending: Optional[List[Callable[[SpatialIndex], None]]] = None
+        # Bumped by invalidate(); a build that overlapped one is stale at once
+        self._generation = 0
+        self._refresher: Optional[threading.Thread] = None
+
+    def _build(self) -> None:
+        with self._lock:
+            self._pending = []
+            generation = self._generation
+        fresh = SpatialIndex()
+        try:
+            self._loader(fresh)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            # The loader may have read a document before a concurrent write to it
+            for fn in self._pending:
+                fn(fresh)
+            self._pending = None
+            self._index = fresh
+            self._loaded_at = time.time() if self._generation == generation else 0.0
+
+    def _refresh(self) -> None:
+        with self._build_lock:
+            # Runs again when invalidated during the build
+            while time.time() - self._loaded_at > MAX_AGE_SECONDS:
+                try:
+                    self._build()
+                except Exception as e:
+                    # Keep serving the previous index
+                    logger.warning("Rebuilding the %s spatial index failed: %s", self._name, e)
+                    self._loaded_at = time.time() - MAX_AGE_SECONDS + REBUILD_RETRY_SECONDS
+                    return
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh, name=f"spatial-index-{self._name}", daemon=True)
+            self._refresher.start()
+
+    def get(self) -> SpatialIndex:
+        index = self._index
+        if index is None:
+            # Nothing to serve yet: the first load runs in the request
+            with self._build_lock:
+                if self._index is None:
+                    self._build()
+            return self._index
+        if time.time() - self._loaded_at > MAX_AGE_SECONDS:
+            self._refresh_in_background()
+        return index
+
+    def apply(self, fn: Callable[[SpatialIndex], None]) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(fn)
+            # An unloaded index will read the write from Firestore when it loads
+            if self._index is not None:
+                fn(self._index)
+
+    def invalidate(self) -> None:
+        """Rebuild in the background; the current index serves until then."""
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = 0.0
+        if self._index is not None:
+            self._refresh_in_background()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until a running background rebuild has finished (scripts, tests)."""
+        refresher = self._refresher
+        if refresher is not None:
+            refresher.join(timeout)
+
+
+_indexes: Dict[str, _LiveIndex] = {
+    "businesses": _LiveIndex("businesses", lambda index: _load_owners("businesses", index)),
+    "retailers": _LiveIndex("retailers", lambda index: _load_owners("retailers", index)),
+    "items": _LiveIndex("items", _load_items),
+}
+
+
+def get_index(name: str) -> SpatialIndex:
+    return _indexes[name].get()
+
+
+def invalidate(name: str) -> None:
+    _indexes[name].invalidate()
+
+
+def index_owner(collection: str, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """Record a business/retailer write; owners without coordinates are dropped."""
+    payload = _owner_payload(doc_id, data or {})
+    if payload:
+        _indexes[collection].apply(lambda index: index.upsert(doc_id, data["lat"], data["lng"], payload))
+    else:
+        remove_owner(collection, doc_id)
+
+
+def remove_owner(collection: str, doc_id: str) -> None:
+    _indexes[collection].apply(lambda index: index.remove(doc_id))
+
+
+def index_item(item_id: str, owner: Optional[Dict[str, Any]]) -> None:
+    """Record an item write. ``owner`` is the owning business document, or None
+    when the item is held by someone without a location (tourist, retailer)."""
+    if owner and owner.get("email") and _has_coords(owner):
+        payload = {"owner_email": owner["email"]}
+        _indexes["items"].apply(lambda index: index.upsert(item_id, owner["lat"], owner["lng"], payload))
+    else:
+        remove_item(item_id)
+
+
+def remove_item(item_id: str) -> None:
+    _indexes["items"].apply(lambda index: index.remove(item_id))
@@ -0,0 +1,50 @@
+"""Fields that make business transactions queryable server-side.
+
+``GET /businesses/transactions`` filters on ``actor_uid`` and orders by
+``scheduled_time`` in Firestore (composite index in ``firestore.indexes.json``),
+so every transaction document carries both fields, ``None`` when unknown:
+
+- ``actor_uid`` is the uid of the business account the transaction belongs to
+  (its ``name`` is that account's display name);
+- ``scheduled_time`` is the ISO datetime built from ``date`` and ``time``.
+
+``scripts/backfill_transaction_fields.py`` adds them to older documents.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+COLLECTION = "transactions"
+ACTOR_FIELD = "actor_uid"
+SCHEDULED_FIELD = "scheduled_time"
+
+
+def business_uid(doc_id: str, data: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Firebase uid of a business account; legacy documents are keyed by email
+    and have no uid field until the backfill script records it."""
+    uid = (data or {}).get("uid")
+    if uid:
+        return uid
+    return doc_id if "@" not in doc_id else None
+
+
+def scheduled_time(date_str: Optional[str], time_str: Optional[str]) -> Optional[str]:
+    """ISO datetime for a transaction date ("YYYY-MM-DD") and time ("HH:MM")."""
+    if not date_str or not time_str:
+        return None
+    try:
+        try:
+            dt = datetime.fromisoformat(f"{date_str}T{time_str}")
+        except Exception:
+            dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+        return dt.isoformat()
+    except Exception:
+        return None
+
+
+def query_fields(business_id: str, business: Optional[Dict[str, Any]], date_str: Optional[str], time_str: Optional[str]) -> Dict[str, Any]:
+    """``actor_uid`` and ``scheduled_time`` for a new transaction document."""
+    return {
+        ACTOR_FIELD: business_uid(business_id, business),
+        SCHEDULED_FIELD: scheduled_time(date_str, time_str),
+    }
@@ -0,0 +1,74 @@
+"""Local stand-ins for the external services, shared by the tests and
+scripts/benchmark.py.
+
+``configure_environment`` must run before the app (or any db/services module)
+is imported: it selects the local storage backend and local auth. After the
+import, ``install_fakes`` replaces the Nominatim lookup with deterministic
+coordinates and Cloudinary uploads with a no-op, so nothing touches the
+network. ``reset_state`` empties the in-memory store and the in-process caches
+between tests.
+"""
+
+import hashlib
+import os
+import time
+from typing import Dict
+
+# Bounding box of the fake geocoder (greater Toronto)
+LAT_RANGE = (43.55, 43.85)
+LNG_RANGE = (-79.65, -79.20)
+
+
+def configure_environment(storage: str, workdir: str) -> None:
+    os.environ["STORAGE_BACKEND"] = storage
+    os.environ["STORAGE_SQLITE_PATH"] = os.path.join(workdir, "storage.sqlite3")
+    os.environ["AUTH_BACKEND"] = "local"
+    os.environ["GEOCODE_CACHE_PATH"] = os.path.join(workdir, "geocode.sqlite3")
+    os.environ.setdefault("CLOUDINARY_UPLOAD_RETRIES", "0")
+
+
+def fake_coords(address: str) -> Dict[str, float]:
+    """Deterministic coordinates for an address, inside LAT_RANGE x LNG_RANGE."""
+    digest = hashlib.sha256(address.strip().lower().encode()).digest()
+    u = int.from_bytes(digest[:4], "big") / 2**32
+    v = int.from_bytes(digest[4:8], "big") / 2**32
+    return {
+        "lat": LAT_RANGE[0] + u * (LAT_RANGE[1] - LAT_RANGE[0]),
+        "lng": LNG_RANGE[0] + v * (LNG_RANGE[1] - LNG_RANGE[0]),
+    }
+
+
+def install_fakes(upload_latency_ms: float = 0.0) -> None:
+    from db import cloudinary_client
+    from services import geocoding
+
+    def lookup(address):
+        return fake_coords(address), True
+
+    def upload_file_sync(file_content, public_id, folder="items"):
+        if upload_latency_ms:
+            time.sleep(upload_latency_ms / 1000)
+        return {"public_id": f"{folder}/{public_id}", "secure_url": f"https://res.cloudinary.invalid/{folder}/{public_id}.png"}
+
+    geocoding._lookup = lookup
+    cloudinary_client.upload_file_sync = upload_file_sync
+
+
+def reset_state() -> None:
+    """Empty the in-memory store and local users, and forget cached aliases
+    and loaded spatial indexes (STORAGE_BACKEND=memory only)."""
+    from db import firestore_auth, firestore_client
+    from services import aliases, spatial_index
+
+    store = firestore_client.db.resolve()._store
+    with store.lock:
+        store._docs.clear()
+    users = firestore_auth.auth.resolve()
+    with users._lock:
+        users._users.clear()
+    aliases._cache.clear()
+    for live in spatial_index._indexes.values():
+        live.wait()
+        with live._lock:
+            live._index = None
+            live._loaded_at = 0.0
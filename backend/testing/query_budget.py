@@ -0,0 +1,119 @@
+"""pytest plugin: fail a test when an endpoint it calls exceeds its query budget.
+
+Load it from the backend directory with::
+
+    python -m pytest -p testing.query_budget [--query-budgets PATH] [--query-report PATH]
+
+It turns on services.query_profiler (QUERY_PROFILING) before the app is
+imported, then checks every request a test makes against the budget of its
+endpoint, declared in query_budgets.json as ``"METHOD /route/template"``
+(or ``"*"`` for every endpoint) mapped to limits per request:
+
+- ``firestore`` / ``geocoder`` / ``cloudinary``: maximum calls to that backend;
+- ``max_repeats``: how often one query shape may be issued (N+1 guard).
+
+The budgets hold for cold caches, so they stay valid in a fresh process. A
+test can tighten or loosen them with a marker (closest marker wins)::
+
+    @pytest.mark.query_budget(firestore=2)                       # every endpoint it calls
+    @pytest.mark.query_budget("GET /items/nearby", max_repeats=1)  # one endpoint
+
+``--query-report`` writes the per-endpoint profile of the whole session as
+JSON and prints it at the end of the run.
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGETS = os.path.join(BASE_DIR, "query_budgets.json")
+MARKER = "query_budget"
+
+_BUDGETS = pytest.StashKey[Dict[str, Dict[str, int]]]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("query_budget", "Firestore query budgets")
+    group.addoption("--query-budgets", default=DEFAULT_BUDGETS, help="JSON file of per-endpoint budgets (default: query_budgets.json)")
+    group.addoption("--query-report", default=None, help="Write the per-endpoint query profile of the session to this JSON file")
+
+
+def pytest_configure(config):
+    os.environ["QUERY_PROFILING"] = "true"
+    from services import query_profiler
+
+    query_profiler.QUERY_PROFILING = True
+    query_profiler.enable()
+    config.addinivalue_line("markers", f"{MARKER}(endpoint=None, **limits): override the query budget of the endpoints a test calls")
+    path = config.getoption("query_budgets")
+    budgets: Dict[str, Dict[str, int]] = {}
+    if path and os.path.isfile(path):
+        with open(path) as f:
+            budgets = json.load(f)
+    elif path != DEFAULT_BUDGETS:
+        raise pytest.UsageError(f"Query budget file not found: {path}")
+    config.stash[_BUDGETS] = budgets
+
+
+def _limits(item, endpoint: str) -> Dict[str, int]:
+    budgets = item.config.stash[_BUDGETS]
+    limits = dict(budgets.get("*", {}))
+    limits.update(budgets.get(endpoint, {}))
+    # iter_markers yields the closest marker first; apply it last so it wins
+    for marker in reversed(list(item.iter_markers(MARKER))):
+        target = marker.args[0] if marker.args else marker.kwargs.get("endpoint")
+        if target in (None, endpoint):
+            limits.update({key: value for key, value in marker.kwargs.items() if key != "endpoint"})
+    return limits
+
+
+def violations(item, profiles) -> List[str]:
+    found = []
+    for profile in profiles:
+        limits = _limits(item, profile.endpoint)
+        counts = profile.counts()
+        for backend, cap in limits.items():
+            if backend == "max_repeats" or cap is None:
+                continue
+            if counts.get(backend, 0) > cap:
+                calls = [call for call in profile.calls if call["backend"] == backend]
+                lines = [f"{profile.endpoint}: {len(calls)} {backend} calls, budget {cap}"]
+                lines += [f"    {call['shape']}  at {call['site'][0] if call['site'] else '(unknown)'}" for call in calls]
+                found.append("\n".join(lines))
+        cap = limits.get("max_repeats")
+        if cap is not None:
+            for entry in profile.repeated(threshold=cap + 1):
+                found.append(
+                    f"{profile.endpoint}: N+1 suspect, {entry['shape']} issued {entry['count']} times "
+                    f"(max_repeats {cap}) at {', '.join(entry['sites'])}"
+                )
+    return found
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    from services import query_profiler
+
+    start = query_profiler.finished_count()
+    result = yield
+    problems = violations(item, query_profiler.profiles_since(start))
+    if problems:
+        pytest.fail("Query budget exceeded:\n" + "\n".join(problems), pytrace=False)
+    return result
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    path = config.getoption("query_report")
+    if not path:
+        return
+    from services import query_profiler
+
+    data: Dict[str, Any] = query_profiler.report()
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    terminalreporter.write_sep("-", "query profile per endpoint")
+    terminalreporter.write(query_profiler.format_report(data))
+    terminalreporter.write_line(f"written to {path}")
@@ -0,0 +1,83 @@
+"""Test set-up: the app runs on the in-memory storage backend with local auth
+and the stand-ins of testing.fakes, so the suite needs no network or
+credentials. Every request is checked against query_budgets.json by the
+testing.query_budget plugin. Run from the backend directory::
+
+    python -m pytest
+"""
+
+import tempfile
+
+from testing import fakes
+
+# Before anything imports the app, db or services modules
+fakes.configure_environment("memory", tempfile.mkdtemp(prefix="backend-tests-"))
+
+import pytest
+
+pytest_plugins = ["testing.query_budget"]
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+
+    fakes.install_fakes()
+    return main.app
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    fakes.reset_state()
+    yield
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    # One lifespan for the session: shutdown stops the upload and label pools
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(app):
+    from db.firestore_client import db
+
+    return db
+
+
+@pytest.fixture
+def register_business(client):
+    """Register a business through the API; returns its document."""
+
+    def register(n: int = 0, address: str = None):
+        email = f"business{n}@example.com"
+        resp = client.post("/businesses/register", json={
+            "email": email,
+            "password": "secret12",
+            "business_name": f"Business {n}",
+            "address": address or f"{n} Test Street, Toronto",
+        })
+        assert resp.status_code == 200, resp.text
+        from db.firestore_client import db
+
+        return db.collection("businesses").document(resp.json()["uid"]).get().to_dict()
+
+    return register
+
+
+@pytest.fixture
+def tourist(db):
+    """Tourist profile keyed by email, as the pickup and dropoff routes expect."""
+
+    def create(email: str = "tourist@example.com", points: int = 10):
+        data = {"email": email, "name": email.split("@")[0], "points": points}
+        db.collection("tourists").document(email).set(data)
+        from services import aliases
+
+        aliases.register_aliases("tourists", email, data)
+        return data
+
+    return create
@@ -0,0 +1,44 @@
+"""Identity alias resolution: legacy probing and aliases outliving their document."""
+
+from services import aliases
+
+
+def test_probe_tries_the_raw_identifier_before_the_decoded_one(db):
+    # Legacy documents without aliases, one keyed by a literally encoded id
+    db.collection("businesses").document("50%25off").set({"email": "deals@example.com"})
+    db.collection("businesses").document("b-1").set({"email": "a+b@example.com"})
+
+    assert aliases.resolve("businesses", "50%25off") == "50%25off"
+    assert aliases.resolve("businesses", "a%2Bb%40example.com") == "b-1"
+
+
+def test_transaction_writes_404_once_the_business_is_gone(client, db, register_business):
+    business = register_business()
+    tx = {"transaction_type": "Pickup", "date": "2026-01-05", "time": "10:00"}
+    assert client.post("/businesses/transactions", params={"identifier": business["email"]}, json=tx).status_code == 201
+
+    # Deleted without unregistering its aliases (e.g. by another worker whose
+    # cache still holds them): the alias must not resurrect the document
+    db.collection("businesses").document(business["uid"]).delete()
+    resp = client.post("/businesses/transactions", params={"identifier": business["email"]}, json=tx)
+
+    assert resp.status_code == 404
+    assert not db.collection(aliases.ALIAS_COLLECTION).document(aliases.alias_key("businesses", business["email"])).get().exists
+    assert aliases.resolve("businesses", business["email"]) is None
+
+
+def test_item_create_ignores_a_stale_donor_or_owner_alias(client, db, register_business, tourist):
+    business = register_business()
+    donor = tourist("donor@example.com")
+    owner = tourist("owner@example.com")
+    db.collection("tourists").document(donor["email"]).delete()
+    db.collection("tourists").document(owner["email"]).delete()
+
+    donated = client.post("/items/create", data={"name": "Mug", "description": "Blue", "owner_email": business["email"], "donor_email": donor["email"]})
+
+    assert donated.status_code == 200, donated.text
+    assert db.collection("items").document(donated.json()["qr_code_id"]).get().exists
+    assert list(db.collection("points_ledger").stream()) == []
+    assert aliases.resolve("tourists", donor["email"]) is None
+    resp = client.post("/items/create", data={"name": "Cup", "description": "Red", "owner_email": owner["email"]})
+    assert resp.status_code == 404
@@ -0,0 +1,161 @@
+"""ID token verification against a local fake key set (no Google round trip)."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from services import auth_tokens
+
+PROJECT_ID = "demo-project"
+
+
+class FakeCerts:
+    """Certificate source for KeySet: kid -> PEM, plus a fetch counter."""
+
+    def __init__(self):
+        self.keys = {}
+        self.certs = {}
+        self.fetches = 0
+
+    def add_key(self, kid: str):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+        now = datetime.now(timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        self.keys[kid] = key
+        self.certs[kid] = cert.public_bytes(serialization.Encoding.PEM).decode()
+
+    def remove_key(self, kid: str):
+        self.certs.pop(kid)
+
+    def __call__(self):
+        self.fetches += 1
+        return dict(self.certs), 3600.0
+
+    def sign(self, kid: str, **overrides) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": auth_tokens.ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+            "aud": PROJECT_ID,
+            "sub": "user-1",
+            "iat": now,
+            "exp": now + 3600,
+            "email": "user@example.com",
+        }
+        claims.update(overrides)
+        return jwt.encode(claims, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def certs():
+    source = FakeCerts()
+    source.add_key("key-1")
+    return source
+
+
+@pytest.fixture
+def verifier(certs):
+    return auth_tokens.TokenVerifier(PROJECT_ID, auth_tokens.KeySet(certs))
+
+
+def test_valid_token_is_verified_once_and_cached(certs, verifier, monkeypatch):
+    token = certs.sign("key-1")
+
+    claims = verifier.verify(token)
+
+    assert claims["uid"] == "user-1"
+    assert claims["email"] == "user@example.com"
+    # The second call is answered from the cache: no signature check, no fetch
+    monkeypatch.setattr(auth_tokens.jwt, "decode", pytest.fail)
+    assert verifier.verify(token)["uid"] == "user-1"
+    assert certs.fetches == 1
+
+
+def test_expired_token_is_rejected(certs, verifier):
+    now = int(time.time())
+    token = certs.sign("key-1", iat=now - 7200, exp=now - 3600)
+
+    with pytest.raises(auth_tokens.InvalidTokenError, match="expired"):
+        verifier.verify(token)
+
+
+def test_cached_claims_expire_with_the_token(certs, verifier, monkeypatch):
+    token = certs.sign("key-1", exp=int(time.time()) + 60)
+    verifier.verify(token)
+    decode = auth_tokens.jwt.decode
+    decoded = []
+    monkeypatch.setattr(auth_tokens.jwt, "decode", lambda *args, **kwargs: decoded.append(1) or decode(*args, **kwargs))
+
+    verifier.verify(token)
+    assert decoded == []
+
+    # Past the token's exp the cache entry is dropped and the token re-verified
+    later = time.time() + 120
+    monkeypatch.setattr(auth_tokens.time, "time", lambda: later)
+    verifier.verify(token)
+    assert decoded == [1]
+
+
+@pytest.mark.parametrize("claim, value, message", [
+    ("aud", "other-project", "Audience"),
+    ("iss", "https://securetoken.google.com/other-project", "issuer"),
+    ("sub", "", "sub"),
+])
+def test_wrong_audience_issuer_or_subject_is_rejected(certs, verifier, claim, value, message):
+    token = certs.sign("key-1", **{claim: value})
+
+    with pytest.raises(auth_tokens.InvalidTokenError, match=message):
+        verifier.verify(token)
+
+
+def test_token_signed_by_another_key_is_rejected(certs, verifier):
+    forger = FakeCerts()
+    forger.add_key("key-1")
+
+    with pytest.raises(auth_tokens.InvalidTokenError):
+        verifier.verify(forger.sign("key-1"))
+
+
+def test_key_rotation_fetches_the_new_key(certs, verifier, monkeypatch):
+    verifier.verify(certs.sign("key-1"))
+    certs.add_key("key-2")
+    certs.remove_key("key-1")
+    token = certs.sign("key-2")
+
+    # An unknown key id refetches at most once per CERT_MIN_REFRESH_SECONDS
+    with pytest.raises(auth_tokens.InvalidTokenError, match="unknown key"):
+        verifier.verify(token)
+    assert certs.fetches == 1
+
+    monkeypatch.setattr(auth_tokens, "CERT_MIN_REFRESH_SECONDS", 0)
+    assert verifier.verify(token)["uid"] == "user-1"
+    assert certs.fetches == 2
+    # Tokens of the retired key are no longer accepted once uncached
+    verifier.cache.clear()
+    with pytest.raises(auth_tokens.InvalidTokenError, match="unknown key"):
+        verifier.verify(certs.sign("key-1"))
+
+
+def test_unsigned_or_malformed_tokens_are_rejected(verifier):
+    with pytest.raises(auth_tokens.InvalidTokenError):
+        verifier.verify("")
+    with pytest.raises(auth_tokens.InvalidTokenError, match="Malformed"):
+        verifier.verify("not-a-jwt")
+    unsigned = jwt.encode({"sub": "user-1", "aud": PROJECT_ID}, key=None, algorithm="none")
+    with pytest.raises(auth_tokens.InvalidTokenError, match="RS256"):
+        verifier.verify(unsigned)
@@ -0,0 +1,24 @@
+"""Catalog import limits."""
+
+import json
+
+from services import catalog_import
+
+
+def test_import_over_max_rows_ends_truncated(client, db, monkeypatch):
+    db.collection("retailers").document("shop@example.com").set({"name": "Shop", "email": "shop@example.com"})
+    monkeypatch.setattr(catalog_import, "MAX_ROWS", 3)
+    csv = "name,description\n" + "".join(f"Item {n},Desc\n" for n in range(5))
+
+    resp = client.post(
+        "/retailers/items/import",
+        data={"retailer_email": "shop@example.com"},
+        files={"file": ("catalog.csv", csv.encode(), "text/csv")},
+    )
+
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    summary = lines[-1]
+    assert (summary["status"], summary["created"], summary["rows_committed"]) == ("truncated", 3, 3)
+    assert lines[-2] == {"row": 4, "status": "invalid", "error": "Import is limited to 3 rows"}
+    assert client.get(f"/retailers/items/import/{summary['import_id']}").json()["status"] == "truncated"
+    assert len(list(db.collection(catalog_import.ITEMS_COLLECTION).stream())) == 3
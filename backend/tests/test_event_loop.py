@@ -0,0 +1,123 @@
+"""Async handlers must not block the event loop.
+
+Every storage access of the local backend, geocoder lookup, Cloudinary
+upload and catalog parsing step is wrapped to record calls made on a thread
+with a running event loop. The async client runs store access on worker threads and sync handlers run
+in Starlette's threadpool, so any recorded call is a sync client call (or
+other blocking I/O) made directly in an ``async def`` handler.
+"""
+
+import asyncio
+import functools
+import os
+import traceback
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames that are never the offending call site
+PLUMBING = tuple(os.path.join(BASE_DIR, path) for path in ("db/", "services/metrics.py", "tests/"))
+
+PNG_1PX = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+@pytest.fixture
+def loop_calls(app, monkeypatch):
+    """Blocking calls made on the event loop thread, with where they came from."""
+    from db import cloudinary_client, firestore_client
+    from services import catalog_import, geocoding
+
+    calls = []
+
+    def guard(owner, name):
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                site = [
+                    f"{os.path.relpath(frame.filename, BASE_DIR)}:{frame.lineno} {frame.name}"
+                    for frame in traceback.extract_stack()[:-1]
+                    if frame.filename.startswith(BASE_DIR) and not frame.filename.startswith(PLUMBING)
+                ]
+                calls.append(f"{name} at {site[-1] if site else '(unknown)'}")
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(owner, name, wrapper)
+
+    store = firestore_client.db.resolve()._store
+    for method in ("get", "put", "delete", "scan"):
+        guard(store, method)
+    guard(geocoding, "_lookup")
+    guard(cloudinary_client, "upload_file_sync")
+    # Catalog parsing and validation are CPU-bound
+    guard(catalog_import, "_read_rows")
+    guard(catalog_import, "_validate")
+    return calls
+
+
+@pytest.fixture
+def retailer(db, app):
+    from db.firestore_auth import auth
+
+    user = auth.create_user(email="shop@example.com", password="secret12")
+    data = {"name": "Shop", "email": "shop@example.com", "address": "5 Test Street, Toronto", "uid": user.uid, "points": 0}
+    db.collection("retailers").document("shop@example.com").set(data)
+    return data
+
+
+def test_create_and_update_item(client, register_business, tourist, loop_calls):
+    business = register_business()
+    tourist()
+
+    created = client.post(
+        "/items/create",
+        data={"name": "Mug", "description": "Blue", "owner_email": business["email"], "donor_email": "tourist@example.com"},
+        files={"file": ("mug.png", PNG_1PX, "image/png")},
+    )
+    assert created.status_code == 200, created.text
+    qr_code_id = created.json()["qr_code_id"]
+    deferred = client.post(
+        "/items/create",
+        data={"name": "Cup", "description": "Red", "owner_email": business["email"], "defer_upload": "true"},
+        files={"file": ("cup.png", PNG_1PX, "image/png")},
+    )
+    assert deferred.status_code == 200, deferred.text
+    updated = client.patch(
+        "/items/",
+        data={"qr_code_id": qr_code_id, "description": "Green", "owner_email": business["email"]},
+        files={"file": ("mug.png", PNG_1PX, "image/png")},
+    )
+    assert updated.status_code == 200, updated.text
+
+    assert loop_calls == []
+
+
+def test_retailer_routes(client, retailer, loop_calls):
+    headers = {"Authorization": f"Bearer local:{retailer['uid']}"}
+
+    profile = client.post("/retailers/profiles", data={"name": "Main", "description": "Store"}, headers=headers)
+    assert profile.status_code == 200, profile.text
+    item = client.post(
+        "/retailers/create_item",
+        data={"name": "Lamp", "description": "Desk", "retailer_email": retailer["email"], "store_id": profile.json()["store_id"]},
+        files={"file": ("lamp.png", PNG_1PX, "image/png")},
+    )
+    assert item.status_code == 200, item.text
+    bulk = client.post("/retailers/items/bulk", json={"retailer_email": retailer["email"], "items": [{"name": "A"}, {"name": "B"}], "format": "zip"})
+    assert bulk.status_code == 200, bulk.text
+    imported = client.post(
+        "/retailers/items/import",
+        data={"retailer_email": retailer["email"]},
+        files={"file": ("catalog.csv", b"name,description\nChair,Oak\nTable,Pine\n", "text/csv")},
+    )
+    assert imported.status_code == 200, imported.text
+
+    assert loop_calls == []
@@ -0,0 +1,97 @@
+"""Geocode cache: normalized keys, warm restarts, TTLs and negative caching.
+
+The Nominatim lookup is replaced by a counting stand-in, so every assertion
+on its calls says how often an address would have left the process.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services import geocoding
+
+KNOWN = {"1 main st, toronto": {"lat": 43.7, "lng": -79.4}}
+
+
+class FakeNominatim:
+    """Stand-in for ``geocoding._lookup``: KNOWN addresses resolve, addresses in
+    ``failing`` raise a transient error, and every call is recorded."""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+
+    def __call__(self, address):
+        self.calls.append(address)
+        if address in self.failing:
+            return None, False
+        return KNOWN.get(geocoding.normalize_address(address)), True
+
+
+@pytest.fixture
+def nominatim(tmp_path, monkeypatch):
+    fake = FakeNominatim()
+    monkeypatch.setattr(geocoding, "_lookup", fake)
+    monkeypatch.setattr(geocoding, "_memory", geocoding._LRU(16))
+    monkeypatch.setattr(geocoding, "_store", geocoding._SQLiteStore(str(tmp_path / "geocode.sqlite3")))
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    # The module's view of time only, not the time module itself
+    monkeypatch.setattr(geocoding, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def _restart(monkeypatch):
+    """A fresh worker: empty memory cache, new connection to the same store."""
+    monkeypatch.setattr(geocoding, "_memory", geocoding._LRU(16))
+    monkeypatch.setattr(geocoding, "_store", geocoding._SQLiteStore(geocoding._store.path))
+
+
+def test_spellings_of_one_address_share_a_lookup(nominatim):
+    assert geocoding.geocode_address("1 Main St, Toronto") == KNOWN["1 main st, toronto"]
+    assert geocoding.geocode_address("  1 MAIN st ,Toronto. ") == KNOWN["1 main st, toronto"]
+
+    assert nominatim.calls == ["1 Main St, Toronto"]
+
+
+def test_restarted_worker_is_warm(nominatim, monkeypatch):
+    geocoding.geocode_address("1 Main St, Toronto")
+    geocoding.geocode_address("Nowhere Lane")
+
+    _restart(monkeypatch)
+
+    assert geocoding.geocode_address("1 main st, toronto") == KNOWN["1 main st, toronto"]
+    assert geocoding.geocode_address("nowhere lane") is None
+    assert len(nominatim.calls) == 2
+
+
+def test_entries_expire_after_their_ttl(nominatim, clock, monkeypatch):
+    geocoding.geocode_address("1 Main St, Toronto")
+    geocoding.geocode_address("Nowhere Lane")
+
+    clock[0] += geocoding.NEGATIVE_TTL_SECONDS + 1
+    geocoding.geocode_address("1 Main St, Toronto")
+    geocoding.geocode_address("Nowhere Lane")
+    assert nominatim.calls == ["1 Main St, Toronto", "Nowhere Lane", "Nowhere Lane"]
+
+    # Expired in the persistent store too
+    clock[0] += geocoding.TTL_SECONDS
+    _restart(monkeypatch)
+    geocoding.geocode_address("1 Main St, Toronto")
+    assert nominatim.calls[3:] == ["1 Main St, Toronto"]
+
+
+def test_misses_are_cached_but_failures_are_not(nominatim):
+    assert geocoding.geocode_address("Nowhere Lane") is None
+    assert geocoding.geocode_address("Nowhere Lane") is None
+    assert nominatim.calls == ["Nowhere Lane"]
+
+    nominatim.failing.add("2 Main St, Toronto")
+    assert geocoding.geocode_address("2 Main St, Toronto") is None
+    nominatim.failing.clear()
+    geocoding.geocode_address("2 Main St, Toronto")
+    assert nominatim.calls.count("2 Main St, Toronto") == 2
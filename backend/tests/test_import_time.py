@@ -0,0 +1,9 @@
+"""Importing the app stays fast and lazy: scripts/check_import_time.py as a test."""
+
+from scripts import check_import_time
+
+
+def test_import_main_is_fast_and_lazy():
+    best_ms, _, failures = check_import_time.check(runs=3)
+
+    assert failures == [], f"import main: {best_ms:.0f} ms\n" + "\n".join(failures)
@@ -0,0 +1,137 @@
+"""Every write that changes an item's holder or existence keeps the views in step."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from services import business_stats, item_events
+
+
+def _held(client, business):
+    inventory = client.get(f"/items/inventory/{business['email']}").json()["items"]
+    stats = client.get(f"/businesses/{business['uid']}/stats").json()["items_held"]
+    assert inventory == stats, (inventory, stats)
+    return inventory
+
+
+def _create(client, business, qr_code_id=None):
+    data = {"name": "Mug", "description": "Blue", "owner_email": business["email"]}
+    if qr_code_id:
+        data["qr_code_id"] = qr_code_id
+    resp = client.post("/items/create", data=data)
+    assert resp.status_code == 200, resp.text
+    return resp.json()["qr_code_id"]
+
+
+def test_owner_edit_recreate_and_delete_move_the_item(client, register_business):
+    first, second = register_business(1), register_business(2)
+    headers = {"Authorization": f"Bearer local:{first['uid']}"}
+
+    qr_code_id = _create(client, first)
+    assert (_held(client, first), _held(client, second)) == (1, 0)
+
+    edit = client.patch("/items/", data={"qr_code_id": qr_code_id, "description": "Green", "owner_email": second["email"]})
+    assert edit.status_code == 200, edit.text
+    assert (_held(client, first), _held(client, second)) == (0, 1)
+
+    # Creating an existing id again replaces the item rather than counting it twice
+    _create(client, second, qr_code_id)
+    assert _held(client, second) == 1
+
+    assert client.delete(f"/items/item/{qr_code_id}", headers=headers).status_code == 200
+    assert (_held(client, first), _held(client, second)) == (0, 0)
+    types = [event["type"] for event in client.get(f"/items/{qr_code_id}/events").json()]
+    assert types == ["created", "transfer", "created", "deleted"]
+    assert client.get(f"/items/{qr_code_id}/stats").json()["status"] == "deleted"
+
+
+def test_pickup_records_the_holder_it_read_in_the_transaction(client, register_business, tourist):
+    business = register_business()
+    tourist()
+    qr_code_id = _create(client, business)
+    client.patch("/items/status", json={"qr_code_id": qr_code_id, "status": "available"})
+
+    resp = client.post(f"/items/pickup/{qr_code_id}/tourist@example.com")
+
+    assert "error" not in resp.json()
+    assert _held(client, business) == 0
+    pickup = client.get(f"/items/{qr_code_id}/events").json()[-1]
+    assert (pickup["from_holder"], pickup["from_status"], pickup["to_holder"]) == (business["email"], "available", "tourist@example.com")
+
+
+def _parallel_pickups(client, db, business, count):
+    batch = db.batch()
+    for n in range(count):
+        batch.set(db.collection("items").document(f"item-{n}"), {"qr_code_id": f"item-{n}", "owner_email": business["email"], "status": "available"})
+    batch.commit()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda n: client.post(f"/items/pickup/item-{n}/tourist@example.com").json(), range(count)))
+    assert [r for r in results if "error" in r] == []
+
+
+def test_throughput_counts_spread_over_shards_and_sum_on_read(client, db, register_business, tourist):
+    business = register_business()
+    tourist(points=500)
+
+    _parallel_pickups(client, db, business, 50)
+
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    shards = list(db.collection(item_events.THROUGHPUT_COLLECTION).where("day", "==", today).stream())
+    assert len(shards) > 1
+    [row] = client.get("/items/throughput", params={"start": today}).json()
+    assert (row["day"], row["pickups"], row["events"]) == (today, 50, 50)
+
+
+def test_business_stats_spread_over_shards_and_sum_on_read(client, db, register_business, tourist):
+    business = register_business()
+    tourist(points=500)
+    credits = db.batch()
+    for _ in range(5):
+        business_stats.stage(credits, db, business["uid"], points=1)
+    credits.commit()
+
+    _parallel_pickups(client, db, business, 50)
+
+    assert len(list(business_stats.shards(db, business["uid"]).stream())) > 1
+    stats = client.get(f"/businesses/{business['uid']}/stats", params={"days": 1}).json()
+    assert (stats["points_earned"], stats["daily"][-1]["pickups"]) == (5, 50)
+
+
+def test_throughput_pages_by_day(client, db):
+    batch = db.batch()
+    for day in ("2026-01-01", "2026-01-02", "2026-01-03"):
+        for shard in range(3):
+            ref = db.collection(item_events.THROUGHPUT_COLLECTION).document(item_events.throughput_doc_id(day, shard))
+            batch.set(ref, {"day": day, "shard": shard, "events": 1, "scans": 1})
+    batch.commit()
+
+    rows, cursor = [], None
+    while True:
+        resp = client.get("/items/throughput", params={"page_size": 2, **({"cursor": cursor} if cursor else {})})
+        rows += resp.json()
+        cursor = resp.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert rows == [{"day": day, "events": 3, "scans": 3} for day in ("2026-01-01", "2026-01-02", "2026-01-03")]
+
+
+def test_hand_overs_read_the_business_holder_from_the_item(client, register_business, tourist, monkeypatch):
+    business = register_business()
+    tourist()
+    qr_code_id = _create(client, business)
+    client.patch("/items/status", json={"qr_code_id": qr_code_id, "status": "available"})
+    from services import aliases
+
+    lookups = []
+    monkeypatch.setattr(aliases, "resolve", lambda collection, identifier: lookups.append(identifier))
+    pickup = client.post(f"/items/pickup/{qr_code_id}/tourist@example.com").json()
+    dropoff = client.post(f"/items/dropoff/{qr_code_id}/{business['uid']}").json()
+    monkeypatch.undo()
+
+    assert "error" not in pickup and "error" not in dropoff
+    assert lookups == []
+    stats = client.get(f"/businesses/{business['uid']}/stats").json()
+    assert (stats["items_held"], stats["items_available"]) == (1, 1)
+    # Creating the item counts as its first dropoff
+    assert (stats["daily"][-1]["pickups"], stats["daily"][-1]["dropoffs"]) == (1, 2)
@@ -0,0 +1,41 @@
+"""Readiness follows the clients, whether or not the lifespan ran."""
+
+import threading
+
+import pytest
+
+from services import lifecycle
+
+
+@pytest.fixture
+def unstarted(monkeypatch):
+    monkeypatch.setattr(lifecycle, "_started_at", None)
+    monkeypatch.setattr(lifecycle, "_warmup", None)
+
+
+def test_ready_without_the_lifespan(app, unstarted):
+    from fastapi.testclient import TestClient
+
+    # Not used as a context manager, so the lifespan does not run
+    resp = TestClient(app).get("/readyz")
+
+    assert resp.status_code == 200, resp.text
+    assert set(resp.json()["checks"].values()) <= {"ok", "deferred"}
+
+
+def test_not_ready_while_warming_up_or_after_a_failed_warm_up(unstarted, monkeypatch):
+    built = {"cache": False}
+    monkeypatch.setattr(lifecycle, "COMPONENTS", {"cache": (lambda: None, lambda: built["cache"])})
+    release = threading.Event()
+    warmup = threading.Thread(target=release.wait, daemon=True)
+    warmup.start()
+    monkeypatch.setattr(lifecycle, "_warmup", warmup)
+
+    assert lifecycle.readiness() == (False, {"cache": "pending"})
+    release.set()
+    warmup.join()
+    assert lifecycle.readiness() == (True, {"cache": "deferred"})
+    monkeypatch.setitem(lifecycle._errors, "cache", "RuntimeError: no credentials")
+    assert lifecycle.readiness() == (False, {"cache": "RuntimeError: no credentials"})
+    built["cache"] = True
+    assert lifecycle.readiness() == (True, {"cache": "ok"})
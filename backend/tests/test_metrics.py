@@ -0,0 +1,29 @@
+"""Per-request backend metrics."""
+
+from services import metrics, spatial_index
+
+
+def _zero_calls(route, backend):
+    """Requests to ``route`` observed with 0 calls to ``backend`` (the le="0" bucket)."""
+    row = metrics.REQUEST_BACKEND_CALLS.values.get((route, backend))
+    return row[0] if row else 0
+
+
+def test_request_without_firestore_calls_observes_zero(client, register_business):
+    register_business()
+    spatial_index.get_index("businesses")
+    before = _zero_calls("/businesses/nearby", "firestore")
+
+    resp = client.get("/businesses/nearby", params={"address": "1 Test Street, Toronto"})
+
+    assert resp.status_code == 200
+    assert _zero_calls("/businesses/nearby", "firestore") == before + 1
+
+
+def test_client_classes_are_not_patched(db):
+    from db import local_store
+
+    assert not getattr(local_store.DocumentReference.get, "_metrics_wrapped", False)
+    assert not getattr(local_store.WriteBatch.commit, "_metrics_wrapped", False)
+    # The app's client is an instrumented view of the library client
+    assert "instrumented" in repr(db.collection("items").document("x"))
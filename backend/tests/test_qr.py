@@ -0,0 +1,72 @@
+"""QR image routes: content-addressed ETags, immutable versioned URLs, 304s
+and the shared file store."""
+
+import pytest
+
+from services import qr
+
+
+def _create(client, business):
+    resp = client.post("/items/create", data={"name": "Mug", "description": "Blue", "owner_email": business["email"]})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_versioned_item_qr_is_immutable_and_revalidates(client, register_business):
+    created = _create(client, register_business())
+
+    resp = client.get(created["qr_code_url"])
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == qr.PNG_MEDIA_TYPE
+    assert resp.content.startswith(b"\x89PNG")
+    assert resp.headers["cache-control"] == qr.IMMUTABLE_CACHE_CONTROL
+    etag = resp.headers["etag"]
+    assert created["qr_code_url"].endswith("?v=" + etag.strip('"')[:qr.VERSION_LENGTH])
+    for if_none_match in (etag, f'W/"stale", {etag}', "*"):
+        again = client.get(created["qr_code_url"], headers={"If-None-Match": if_none_match})
+        assert again.status_code == 304, if_none_match
+        assert again.content == b""
+        assert again.headers["etag"] == etag
+
+
+def test_unversioned_or_stale_url_must_revalidate(client, register_business):
+    first, second = register_business(1), register_business(2)
+    created = _create(client, first)
+    path = f"/items/{created['qr_code_id']}/qr.png"
+
+    resp = client.get(path, params={"v": "0" * qr.VERSION_LENGTH})
+    assert resp.headers["cache-control"] == qr.REVALIDATE_CACHE_CONTROL
+    etag = resp.headers["etag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    # The payload carries the owner, so a new owner means a new image and ETag
+    edit = client.patch("/items/", data={"qr_code_id": created["qr_code_id"], "description": "Blue", "owner_email": second["email"]})
+    assert edit.status_code == 200, edit.text
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_retail_item_qr(client):
+    url = qr.qr_url("/retailers/item/retail-1/qr.png", {"qr_code_id": "retail-1"})
+
+    resp = client.get(url)
+
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == qr.IMMUTABLE_CACHE_CONTROL
+    assert client.get(url, headers={"If-None-Match": resp.headers["etag"]}).status_code == 304
+    assert client.get("/items/missing/qr.png").status_code == 404
+
+
+def test_file_store_is_shared_across_processes(tmp_path, monkeypatch):
+    payload = {"qr_code_id": "stored-1"}
+    monkeypatch.setattr(qr, "_store", qr._FileStore(str(tmp_path)))
+    monkeypatch.setattr(qr, "_memory", qr._LRU(8))
+    png, digest = qr.qr_png(payload)
+    assert (tmp_path / f"{digest}.png").read_bytes() == png
+
+    # A fresh process (empty memory cache) reads the file instead of rendering
+    monkeypatch.setattr(qr, "_memory", qr._LRU(8))
+    monkeypatch.setattr(qr, "render_png", pytest.fail)
+    assert qr.qr_png(payload) == (png, digest)
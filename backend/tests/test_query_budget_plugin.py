@@ -0,0 +1,74 @@
+"""The testing.query_budget plugin, run on a throwaway test file with pytester."""
+
+import json
+
+import pytest
+
+pytest_plugins = ["pytester"]
+
+TESTS = """
+import pytest
+
+from services import metrics, query_profiler
+
+
+def request(endpoint, firestore=0, repeats=1):
+    with query_profiler.capture(endpoint):
+        for n in range(firestore):
+            shape = "same" if n < repeats else f"other-{n}"
+            with metrics.backend_call("firestore", f"Query.stream {shape}"):
+                pass
+
+
+def test_within_budget():
+    request("GET /budgeted", firestore=2)
+
+
+def test_over_budget():
+    request("GET /budgeted", firestore=3)
+
+
+@pytest.mark.query_budget("GET /budgeted", firestore=3)
+def test_marker_raises_the_budget():
+    request("GET /budgeted", firestore=3)
+
+
+@pytest.mark.query_budget(max_repeats=1)
+def test_repeated_query():
+    request("GET /budgeted", firestore=2, repeats=2)
+"""
+
+
+@pytest.fixture
+def run(pytester):
+    pytester.makefile(".json", budgets=json.dumps({"GET /budgeted": {"firestore": 2}}))
+    pytester.makepyfile(test_budgeted=TESTS)
+
+    def run_tests(*args):
+        return pytester.runpytest("-p", "testing.query_budget", "--query-budgets", "budgets.json", *args)
+
+    return run_tests
+
+
+def test_requests_within_budget_pass(run):
+    result = run("-k", "within_budget or marker_raises")
+
+    result.assert_outcomes(passed=2)
+
+
+def test_request_over_budget_fails_with_the_call_sites(run):
+    result = run("-k", "over_budget or repeated_query")
+
+    result.assert_outcomes(failed=2)
+    result.stdout.fnmatch_lines([
+        "*GET /budgeted: 3 firestore calls, budget 2",
+        "*GET /budgeted: N+1 suspect, firestore Query.stream same issued 2 times (max_repeats 1)*",
+    ])
+
+
+def test_missing_budget_file_is_a_usage_error(pytester):
+    pytester.makepyfile(test_empty="def test_nothing():\n    pass\n")
+
+    result = pytester.runpytest("-p", "testing.query_budget", "--query-budgets", "missing.json")
+
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
@@ -0,0 +1,81 @@
+"""Firestore calls per request of the endpoints whose fan-out was removed.
+
+The limits themselves live in query_budgets.json and are enforced on every
+request by the testing.query_budget plugin; these tests drive the endpoints
+with enough data that an N+1 regression would blow them.
+"""
+
+import pytest
+
+from services import spatial_index
+
+ORIGIN = {"lat": 43.7, "lng": -79.4}
+
+
+def _seed_items(db, businesses, per_business):
+    batch = db.batch()
+    for business in businesses:
+        for n in range(per_business):
+            qr_code_id = f"{business['uid']}-item-{n}"
+            batch.set(db.collection("items").document(qr_code_id), {
+                "name": f"Item {n}",
+                "description": "Test item",
+                "qr_code_id": qr_code_id,
+                "owner_email": business["email"],
+                "status": "available",
+            })
+    batch.commit()
+
+
+def _query_count(resp) -> int:
+    return int(resp.headers["x-query-count"])
+
+
+def test_items_nearby_resolves_owners_in_bulk(client, db, register_business):
+    businesses = [register_business(n) for n in range(35)]
+    _seed_items(db, businesses, 2)
+
+    resp = client.get("/items/nearby", params={**ORIGIN, "limit": 60})
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 60
+    assert {item["owner_name"] for item in resp.json()} <= {b["name"] for b in businesses}
+    # Index load (2 streams), one get_all, and ceil(35 owners / 30) owner queries
+    assert _query_count(resp) <= 5
+
+
+@pytest.mark.query_budget("GET /items/nearby", firestore=2, max_repeats=1)
+def test_items_nearby_warm_index(client, db, register_business):
+    businesses = [register_business(n) for n in range(5)]
+    _seed_items(db, businesses, 10)
+    spatial_index.get_index("items")
+
+    resp = client.get("/items/nearby", params={**ORIGIN, "limit": 20})
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 20
+    next_page = client.get("/items/nearby", params={**ORIGIN, "limit": 20, "cursor": resp.headers["x-next-cursor"]})
+    assert not {i["id"] for i in resp.json()} & {i["id"] for i in next_page.json()}
+
+
+@pytest.mark.query_budget("GET /businesses/nearby", firestore=0)
+def test_businesses_nearby_reads_only_the_index(client, register_business):
+    for n in range(10):
+        register_business(n)
+    spatial_index.get_index("businesses")
+
+    resp = client.get("/businesses/nearby", params={"address": "1 Test Street, Toronto", "limit": 5})
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 5
+
+
+# The profile document plus its unfolded point shards; no probing
+@pytest.mark.query_budget("GET /login/profile", firestore=2)
+def test_profile_with_role_claims_reads_only_the_profile(client, register_business):
+    business = register_business()
+
+    resp = client.get("/login/profile", headers={"Authorization": f"Bearer local:{business['uid']}"})
+
+    assert resp.status_code == 200
+    assert resp.json()["role"] == "business"
@@ -0,0 +1,51 @@
+"""Bulk retailer item creation: ordered commits and idempotent retries."""
+
+import pytest
+
+
+@pytest.fixture
+def retailer(db):
+    data = {"name": "Shop", "email": "shop@example.com", "address": "5 Test Street, Toronto", "points": 0}
+    db.collection("retailers").document(data["email"]).set(data)
+    return data
+
+
+def _item_ids(db):
+    return {doc.id for doc in db.collection("retailer_items").stream()}
+
+
+def test_retry_with_idempotency_key_does_not_duplicate(client, db, retailer):
+    payload = {"retailer_email": retailer["email"], "items": [{"name": "A"}, {"name": "B"}, {"name": "C"}], "format": "zip", "idempotency_key": "order-17"}
+
+    first = client.post("/retailers/items/bulk", json=payload)
+    second = client.post("/retailers/items/bulk", json=payload)
+
+    assert first.status_code == second.status_code == 200
+    assert len(_item_ids(db)) == 3
+    other = client.post("/retailers/items/bulk", json={**payload, "idempotency_key": "order-18"})
+    assert other.status_code == 200
+    assert len(_item_ids(db)) == 6
+
+
+def test_failed_batch_reports_the_items_written(client, db, retailer, monkeypatch):
+    from db import local_store
+
+    commit = local_store.WriteBatch.commit
+    commits = []
+
+    def failing_second_commit(self):
+        commits.append(len(self))
+        if len(commits) == 2:
+            raise RuntimeError("backend unavailable")
+        return commit(self)
+
+    monkeypatch.setattr(local_store.WriteBatch, "commit", failing_second_commit)
+    items = [{"name": f"Item {n}"} for n in range(700)]
+
+    resp = client.post("/retailers/items/bulk", json={"retailer_email": retailer["email"], "items": items, "idempotency_key": "big"})
+
+    assert resp.status_code == 500
+    detail = resp.json()["detail"]
+    assert len(detail["created"]) == 500
+    assert set(detail["created"]) == _item_ids(db)
+    assert commits == [500, 200]
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react'
-import { getBusinessTransactions, getHeldItemsByEmail, updateItemStatus, deleteBusinessTransaction } from '../utils/FastAPIClient'
+import { getBusinessStats, getBusinessTransactions, getHeldItemsByEmail, updateItemStatus, deleteBusinessTransaction } from '../utils/FastAPIClient'
 import { useAuth } from '../contexts/AuthContext'
 
 function ListingCard({ l }) {
@@ -22,6 +22,29 @@ function ListingCard({ l }) {
   )
 }
 
+// Precomputed counters from /businesses/{id}/stats (one read, nothing aggregated here)
+function StatsBar({ stats }) {
+  const thisWeek = stats?.weekly?.[stats.weekly.length - 1] || {}
+  const tiles = [
+    ['Items held', stats?.items_held],
+    ['Available', stats?.items_available],
+    ['Pickups this week', thisWeek.pickups],
+    ['Dropoffs this week', thisWeek.dropoffs],
+    ['Scheduled', stats?.transactions],
+    ['Points earned', stats?.points_earned],
+  ]
+  return (
+    <div className="grid grid-cols-3 md:grid-cols-6 gap-3 mb-4">
+      {tiles.map(([label, value]) => (
+        <div key={label} className="border rounded p-3 bg-white shadow-sm">
+          <div className="text-xs text-gray-500">{label}</div>
+          <div className="text-lg font-semibold">{value ?? '—'}</div>
+        </div>
+      ))}
+    </div>
+  )
+}
+
 function TransactionRow({ t, onConfirmDropoff, onConfirmPickup }) {
   const scheduled = t?.scheduled_time ? new Date(t.scheduled_time) : null
   const createdBy = t?.created_by_name || t?.created_by_email || t?.name || 'Unknown'
@@ -58,6 +81,7 @@ function TransactionRow({ t, onConfirmDropoff, onConfirmPickup }) {
 export default function BusinessDashboard() {
   const [listings, setListings] = useState([])
   const [transactions, setTransactions] = useState([])
+  const [stats, setStats] = useState(null)
   const [loading, setLoading] = useState(true)
   const [toast, setToast] = useState("")
   const { getIdToken, user, loading: authLoading } = useAuth()
@@ -82,9 +106,10 @@ useEffect(() => {
       const idToken = await getIdToken()
       console.log('Fetched ID token:', idToken)
 
-      const [ls, tx] = await Promise.all([
+      const [ls, tx, st] = await Promise.all([
         getHeldItemsByEmail(user.email || ''),
         getBusinessTransactions(user.uid || 'loc-main', idToken),
+        getBusinessStats(user.uid || 'loc-main').catch(() => null),
       ])
 
       if (!mounted) return;
@@ -93,6 +118,7 @@ useEffect(() => {
       const onlyAvailable = Array.isArray(ls) ? ls.filter((it) => (it?.status || '').toLowerCase() === 'available') : []
       setListings(onlyAvailable);
       setTransactions(tx || []);
+      setStats(st);
     } catch (e) {
       console.error("Failed to load business dashboard", e);
     } finally {
@@ -108,78 +134,83 @@ useEffect(() => {
 
 
   return (
-    <div className="flex gap-6 h-[70vh]">
-      <div className="w-1/2 overflow-auto">
-        <h2 className="text-lg font-medium mb-3">Your Listings</h2>
-        <div className="space-y-3">
-          {loading ? <div className="text-gray-500">Loading listings…</div> : (
-            listings.map((l) => <ListingCard key={l.qr_code_id || l.id || l.name} l={l} />)
-          )}
+    <div>
+      <StatsBar stats={stats} />
+      <div className="flex gap-6 h-[70vh]">
+        <div className="w-1/2 overflow-auto">
+          <h2 className="text-lg font-medium mb-3">Your Listings</h2>
+          <div className="space-y-3">
+            {loading ? <div className="text-gray-500">Loading listings…</div> : (
+              listings.map((l) => <ListingCard key={l.qr_code_id || l.id || l.name} l={l} />)
+            )}
+          </div>
         </div>
-      </div>
 
-      <div className="w-1/2 overflow-auto">
-        <h2 className="text-lg font-medium mb-3">Scheduled Pickups & Dropoffs (at your location)</h2>
-        <div className="bg-white rounded border shadow-sm p-2">
-          {toast ? (
-            <div className="mb-2 rounded bg-emerald-50 text-emerald-800 border border-emerald-200 px-3 py-2 text-sm">
-              {toast}
-            </div>
-          ) : null}
-          {loading ? <div className="text-gray-500">Loading transactions…</div> : (
-            transactions.length === 0 ? <div className="text-gray-500 p-4">No upcoming activity.</div> : (
-              transactions.map((t) => (
-                <TransactionRow
-                  key={t.id}
-                  t={t}
-                  onConfirmDropoff={async (tx) => {
-                    try {
-                      const idToken = await getIdToken()
-                      // 1) Set item status to 'available'
-                      await updateItemStatus(tx.qr_code_id, 'available')
-                      // 2) Delete the transaction
-                      await deleteBusinessTransaction({ identifier: user.uid || '', transactionId: tx.id, idToken })
-                      // 3) Update UI state: remove tx and refresh available listings
-                      setTransactions((prev) => prev.filter((p) => p.id !== tx.id))
+        <div className="w-1/2 overflow-auto">
+          <h2 className="text-lg font-medium mb-3">Scheduled Pickups & Dropoffs (at your location)</h2>
+          <div className="bg-white rounded border shadow-sm p-2">
+            {toast ? (
+              <div className="mb-2 rounded bg-emerald-50 text-emerald-800 border border-emerald-200 px-3 py-2 text-sm">
+                {toast}
+              </div>
+            ) : null}
+            {loading ? <div className="text-gray-500">Loading transactions…</div> : (
+              transactions.length === 0 ? <div className="text-gray-500 p-4">No upcoming activity.</div> : (
+                transactions.map((t) => (
+                  <TransactionRow
+                    key={t.id}
+                    t={t}
+                    onConfirmDropoff={async (tx) => {
                       try {
-                        const ls = await getHeldItemsByEmail(user.email || '')
-                        const onlyAvailable = Array.isArray(ls) ? ls.filter((it) => (it?.status || '').toLowerCase() === 'available') : []
-                        setListings(onlyAvailable)
-                      } catch {}
-                      // 4) Show success toast
-                      setToast('Dropoff confirmed')
-                      setTimeout(() => setToast(''), 3000)
-                    } catch (e) {
-                      console.error('Confirm dropoff failed', e)
-                      alert(e?.response?.data?.detail || e?.message || 'Failed to confirm dropoff')
-                    }
-                  }}
-                  onConfirmPickup={async (tx) => {
-                    try {
-                      const idToken = await getIdToken()
-                      // 1) Set item status to 'unavailable'
-                      await updateItemStatus(tx.qr_code_id, 'unavailable')
-                      // 2) Delete the transaction
-                      await deleteBusinessTransaction({ identifier: user.uid || '', transactionId: tx.id, idToken })
-                      // 3) Update UI state: remove tx and refresh available listings (item should disappear)
-                      setTransactions((prev) => prev.filter((p) => p.id !== tx.id))
+                        const idToken = await getIdToken()
+                        // 1) Set item status to 'available'
+                        await updateItemStatus(tx.qr_code_id, 'available')
+                        // 2) Delete the transaction
+                        await deleteBusinessTransaction({ identifier: user.uid || '', transactionId: tx.id, idToken })
+                        // 3) Update UI state: remove tx and refresh available listings
+                        setTransactions((prev) => prev.filter((p) => p.id !== tx.id))
+                        try {
+                          const ls = await getHeldItemsByEmail(user.email || '')
+                          const onlyAvailable = Array.isArray(ls) ? ls.filter((it) => (it?.status || '').toLowerCase() === 'available') : []
+                          setListings(onlyAvailable)
+                          setStats(await getBusinessStats(user.uid || ''))
+                        } catch {}
+                        // 4) Show success toast
+                        setToast('Dropoff confirmed')
+                        setTimeout(() => setToast(''), 3000)
+                      } catch (e) {
+                        console.error('Confirm dropoff failed', e)
+                        alert(e?.response?.data?.detail || e?.message || 'Failed to confirm dropoff')
+                      }
+                    }}
+                    onConfirmPickup={async (tx) => {
                       try {
-                        const ls = await getHeldItemsByEmail(user.email || '')
-                        const onlyAvailable = Array.isArray(ls) ? ls.filter((it) => (it?.status || '').toLowerCase() === 'available') : []
-                        setListings(onlyAvailable)
-                      } catch {}
-                      // 4) Show success toast
-                      setToast('Pickup confirmed')
-                      setTimeout(() => setToast(''), 3000)
-                    } catch (e) {
-                      console.error('Confirm pickup failed', e)
-                      alert(e?.response?.data?.detail || e?.message || 'Failed to confirm pickup')
-                    }
-                  }}
-                />
-              ))
-            )
-          )}
+                        const idToken = await getIdToken()
+                        // 1) Set item status to 'unavailable'
+                        await updateItemStatus(tx.qr_code_id, 'unavailable')
+                        // 2) Delete the transaction
+                        await deleteBusinessTransaction({ identifier: user.uid || '', transactionId: tx.id, idToken })
+                        // 3) Update UI state: remove tx and refresh available listings (item should disappear)
+                        setTransactions((prev) => prev.filter((p) => p.id !== tx.id))
+                        try {
+                          const ls = await getHeldItemsByEmail(user.email || '')
+                          const onlyAvailable = Array.isArray(ls) ? ls.filter((it) => (it?.status || '').toLowerCase() === 'available') : []
+                          setListings(onlyAvailable)
+                          setStats(await getBusinessStats(user.uid || ''))
+                        } catch {}
+                        // 4) Show success toast
+                        setToast('Pickup confirmed')
+                        setTimeout(() => setToast(''), 3000)
+                      } catch (e) {
+                        console.error('Confirm pickup failed', e)
+                        alert(e?.response?.data?.detail || e?.message || 'Failed to confirm pickup')
+                      }
+                    }}
+                  />
+                ))
+              )
+            )}
+          </div>
         </div>
       </div>
     </div>
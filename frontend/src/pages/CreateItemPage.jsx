@@ -1,5 +1,5 @@
 import React, { useState } from "react"
-import { createItem } from "../utils/FastAPIClient"
+import { createItem, qrImageSrc } from "../utils/FastAPIClient"
 
 export default function CreateItemPage() {
   const [form, setForm] = useState({
@@ -88,9 +88,9 @@ export default function CreateItemPage() {
         <div className="mt-6 text-center">
           <h2 className="text-lg font-semibold mb-2">✅ Item Created!</h2>
           <p>QR Code ID: {result.qr_code_id}</p>
-          {result.qr_code_base64 && (
+          {result.qr_code_url && (
             <img
-              src={`data:image/png;base64,${result.qr_code_base64}`}
+              src={qrImageSrc(result.qr_code_url)}
               alt="QR Code"
               className="mx-auto mt-4 w-40 h-40"
             />
@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from 'react'
 import { useLocation, useNavigate, useParams } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
-import { createRetailerItem, getRetailProfile } from '../utils/FastAPIClient'
+import { createRetailerItem, getRetailProfile, qrImageSrc, downloadQrPng } from '../utils/FastAPIClient'
 
 export default function CreateRetailItemPage() {
   const { storeId } = useParams()
@@ -100,18 +100,15 @@ export default function CreateRetailItemPage() {
 
   // Confirmation helpers
   const handleDownloadQR = () => {
-    if (!result?.qr_code_base64) return
-    const link = document.createElement('a')
-    link.href = `data:image/png;base64,${result.qr_code_base64}`
-    link.download = `${result.qr_code_id || 'item-qr'}.png`
-    link.click()
+    if (!result?.qr_code_url) return
+    downloadQrPng(result.qr_code_url, `${result.qr_code_id || 'item-qr'}.png`)
   }
 
   const handlePrintQR = () => {
-    if (!result?.qr_code_base64) return
+    if (!result?.qr_code_url) return
     const w = window.open('', '_blank', 'width=400,height=500')
     if (!w) return
-    const imgSrc = `data:image/png;base64,${result.qr_code_base64}`
+    const imgSrc = qrImageSrc(result.qr_code_url)
     w.document.write(`<!doctype html><html><head><title>Print QR</title></head><body style="display:flex;align-items:center;justify-content:center;height:100vh;margin:0;">
       <div style="text-align:center;font-family:system-ui, -apple-system, Segoe UI, Roboto, Arial;">
         <img src="${imgSrc}" style="width:256px;height:256px;object-fit:contain;" />
@@ -162,9 +159,9 @@ export default function CreateRetailItemPage() {
           <div className="bg-white border rounded p-6 space-y-4 text-center">
             <div className="text-sm text-gray-600">QR Code ID</div>
             <div className="text-lg font-mono">{result.qr_code_id}</div>
-            {result.qr_code_base64 ? (
+            {result.qr_code_url ? (
               <img
-                src={`data:image/png;base64,${result.qr_code_base64}`}
+                src={qrImageSrc(result.qr_code_url)}
                 alt="QR Code"
                 className="mx-auto w-48 h-48"
               />
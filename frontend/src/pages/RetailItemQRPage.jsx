@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react'
 import { useNavigate, useParams } from 'react-router-dom'
-import { getRetailItemByQr } from '../utils/FastAPIClient'
+import { getRetailItemByQr, qrImageSrc, downloadQrPng } from '../utils/FastAPIClient'
 
 export default function RetailItemQRPage() {
   const { qrId } = useParams()
@@ -26,18 +26,15 @@ export default function RetailItemQRPage() {
   }, [qrId])
 
   const handleDownloadQR = () => {
-    if (!data?.qr_code_base64) return
-    const link = document.createElement('a')
-    link.href = `data:image/png;base64,${data.qr_code_base64}`
-    link.download = `${data.qr_code_id || 'item-qr'}.png`
-    link.click()
+    if (!data?.qr_code_url) return
+    downloadQrPng(data.qr_code_url, `${data.qr_code_id || 'item-qr'}.png`)
   }
 
   const handlePrintQR = () => {
-    if (!data?.qr_code_base64) return
+    if (!data?.qr_code_url) return
     const w = window.open('', '_blank', 'width=400,height=500')
     if (!w) return
-    const imgSrc = `data:image/png;base64,${data.qr_code_base64}`
+    const imgSrc = qrImageSrc(data.qr_code_url)
     w.document.write(`<!doctype html><html><head><title>Print QR</title></head><body style="display:flex;align-items:center;justify-content:center;height:100vh;margin:0;">
       <div style="text-align:center;font-family:system-ui, -apple-system, Segoe UI, Roboto, Arial;">
         <img src="${imgSrc}" style="width:256px;height:256px;object-fit:contain;" />
@@ -65,8 +62,8 @@ export default function RetailItemQRPage() {
       <div className="bg-white border rounded p-6 space-y-4 text-center">
         <div className="text-sm text-gray-600">QR Code ID</div>
         <div className="text-lg font-mono">{data?.qr_code_id}</div>
-        {data?.qr_code_base64 ? (
-          <img src={`data:image/png;base64,${data.qr_code_base64}`} alt="QR Code" className="mx-auto w-48 h-48" />
+        {data?.qr_code_url ? (
+          <img src={qrImageSrc(data.qr_code_url)} alt="QR Code" className="mx-auto w-48 h-48" />
         ) : (
           <div className="text-gray-500">QR code image not available.</div>
         )}
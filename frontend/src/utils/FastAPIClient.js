@@ -6,6 +6,33 @@ export const api = axios.create({
   headers: { 'Content-Type': 'application/json' }
 })
 
+// List endpoints are paginated: follow the X-Next-Cursor header until exhausted
+async function getAllPages(url, params = {}, config = {}) {
+  const results = []
+  let cursor = null
+  do {
+    const { data, headers } = await api.get(url, { ...config, params: cursor ? { ...params, cursor } : params })
+    if (Array.isArray(data)) results.push(...data)
+    cursor = headers?.['x-next-cursor'] || null
+  } while (cursor)
+  return results
+}
+
+// QR images are served as PNGs by the API (qr_code_url is relative to it)
+export function qrImageSrc(path) {
+  return path ? `${api.defaults.baseURL}${path}` : null
+}
+
+export async function downloadQrPng(path, filename) {
+  const { data } = await api.get(path, { responseType: 'blob' })
+  const href = URL.createObjectURL(data)
+  const link = document.createElement('a')
+  link.href = href
+  link.download = filename
+  link.click()
+  URL.revokeObjectURL(href)
+}
+
 export async function getListings() {
   const { data } = await api.get('/listings')
   return data
@@ -38,11 +65,16 @@ export async function getBusinessTransactions(uid) {
   // Accept optional idToken via second argument in case caller wants to pass auth header
   const args = Array.from(arguments)
   const idToken = args.length > 1 ? args[1] : null
-  const config = { params: { identifier: uid } }
+  const config = {}
   if (idToken) {
     config.headers = { Authorization: `Bearer ${idToken}` }
   }
-  const { data } = await api.get('/businesses/transactions', config)
+  return getAllPages('/businesses/transactions', { identifier: uid }, config)
+}
+
+// Dashboard aggregates (items held, pickups/dropoffs per day and week, points) in one request
+export async function getBusinessStats(identifier, { days = 14, weeks = 8 } = {}) {
+  const { data } = await api.get(`/businesses/${encodeURIComponent(identifier)}/stats`, { params: { days, weeks } })
   return data
 }
 
@@ -150,8 +182,7 @@ export async function getProfileWithToken(idToken) {
 // Retail profiles
 export async function getRetailProfilesByEmail(email) {
   if (!email) return []
-  const { data } = await api.get('/retailers/profiles', { params: { email } })
-  return Array.isArray(data) ? data : []
+  return getAllPages('/retailers/profiles', { email })
 }
 
 export async function createRetailProfile({ name, description, file }, idToken) {
@@ -205,8 +236,7 @@ export async function createRetailerItem({ name, description, retailer_email, fi
 
 export async function getRetailProfileItems(storeId) {
   if (!storeId) return []
-  const { data } = await api.get(`/retailers/profile/${encodeURIComponent(storeId)}/items`)
-  return Array.isArray(data) ? data : []
+  return getAllPages(`/retailers/profile/${encodeURIComponent(storeId)}/items`)
 }
 
 export default api